@@ -0,0 +1,264 @@
+import argparse
+import itertools
+import multiprocessing
+import threading
+import time
+from queue import Empty
+from sample_bus import SampleBus
+from telemetry import TelemetryPlan
+
+BUS_NAME = "prevac_heat3"
+BUS_CHANNELS = ["temperature", "uc", "ic", "ue", "ie"]
+# Reads of the standalone process: temperature from Tc1, filament voltage and current
+DEFAULT_READS = {"temperature": ("r_temperature_from_thermocouple", ("Tc1",)),
+                 "uc": ("r_actual_value_Uc", (1,)),
+                 "ic": ("r_actual_value_Ic", (1,))}
+
+def run_acquisition(address, bus_name, commands, results, reads, intervals, retry_window,
+                    urgent=None, urgent_event=None):
+    """
+    Body of the acquisition process: owns the HEAT3 connection, reads the signals
+    of the read table on their own intervals into the sample bus and executes the
+    commands of the parent between reads. Values are published in the units of
+    the archive: temperatures in K, Ie in mA.
+
+    Urgent commands (see AcquisitionProcess.call_urgent) are looked for before every
+    read and every queued command, and run ahead of both.
+    """
+    # Imported here so the parent does not need the driver to start the process
+    from prevacv2TCP import prevacV2TCP
+    from supervisor import ConnectionSupervisor
+
+    heat3 = prevacV2TCP(*address)
+    link = ConnectionSupervisor(heat3, name="HEAT3-PS", probe=heat3.r_serial_number,
+                                on_reconnect=heat3.register_new_host, retry_window=retry_window)
+    bus = SampleBus(bus_name)
+    plan = TelemetryPlan(intervals)
+    connected = link.connect()
+    results.put((None, connected))
+    if not connected:
+        bus.close()
+        return
+
+    def serve_urgent():
+        while urgent_event is not None and urgent_event.is_set():
+            urgent_event.clear()
+            while not urgent.empty():
+                request_id, calls = urgent.get()
+                outcome = []
+                for name, args in calls:
+                    try:
+                        outcome.append(link.call(getattr(heat3, name), *args))
+                    except Exception as e:
+                        outcome.append(e)
+                results.put((request_id, outcome))
+
+    running = True
+    while running:
+        serve_urgent()
+        now = time.monotonic()
+        due = plan.due(now, list(reads))
+        if due:
+            requests = [reads[signal] for signal in due]
+            try:
+                if len(requests) > 1:
+                    values = link.call(heat3.read_many, requests)
+                else:
+                    values = [link.call(getattr(heat3, requests[0][0]), *requests[0][1])]
+                for signal, value in zip(due, values):
+                    if value is not None:
+                        bus.publish(signal, value * 1000 if signal == "ie" else value, plan.deadline[signal])
+            except ConnectionError as e:
+                print(f"Error reading from HEAT3-PS: {e}")
+
+        # Wait for commands until the next read is due
+        timeout = plan.wait_time(time.monotonic(), list(reads))
+        while running:
+            try:
+                request_id, name, args, kwargs = commands.get(timeout=timeout)
+            except Empty:
+                break
+            serve_urgent()
+            if name == "__wake__":
+                pass   # Only sent to get serve_urgent() called
+            elif name == "__stop__":
+                running = False
+            elif name == "__reads__":
+                reads, intervals = args
+                plan = TelemetryPlan(intervals)
+            else:
+                try:
+                    result = link.call(getattr(heat3, name), *args, **kwargs)
+                except Exception as e:
+                    result = e   # Raised again in the parent
+                if request_id is not None:
+                    results.put((request_id, result))
+            timeout = 0
+
+    print(f"HEAT3-PS sampling:\n{plan.report()}")
+    link.close()
+    bus.close()
+
+class AcquisitionProcess:
+    def __init__(self, ip_address, port=502, bus_name=BUS_NAME, retry_window=10.0,
+                 capacity=4096, start_timeout=15.0):
+        """
+        HEAT3 acquisition in a separate process, so Tk and Matplotlib in the GUI
+        process cannot delay the reads. Samples go through a SampleBus; commands
+        go through a queue and are executed between reads.
+
+        Has the call/connect/close interface of ConnectionSupervisor, so it can
+        take the place of the HEAT3 supervisor in the command thread.
+
+        :param bus_name: Shared memory name readers attach to
+        :param capacity: Samples kept in the bus ring
+        :param start_timeout: Seconds to wait for the process to connect
+        """
+        self.address = (ip_address, port)
+        self.bus_name = bus_name
+        self.retry_window = retry_window
+        self.capacity = capacity
+        self.start_timeout = start_timeout
+        self.bus = None
+        self.process = None
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.ids = itertools.count()
+        self.reads = dict(DEFAULT_READS)
+        self.intervals = {}
+        # Spawn, as on Windows, so the child does not inherit Tk state
+        self.context = multiprocessing.get_context("spawn")
+        self.commands = self.context.Queue()
+        self.results = self.context.Queue()
+        # SimpleQueue writes synchronously, so an urgent call is readable once the event is set
+        self.urgent = self.context.SimpleQueue()
+        self.urgent_event = self.context.Event()
+
+    def connect(self):
+        """Create the bus, start the process and wait until it is connected."""
+        self.bus = SampleBus(self.bus_name, BUS_CHANNELS, self.capacity, create=True)
+        self.process = self.context.Process(
+            target=run_acquisition, daemon=True,
+            args=(self.address, self.bus_name, self.commands, self.results,
+                  self.reads, self.intervals, self.retry_window, self.urgent, self.urgent_event))
+        self.process.start()
+        try:
+            _, connected = self.results.get(timeout=self.start_timeout)
+        except Empty:
+            connected = False
+        if not connected:
+            self.close()
+            return False
+        threading.Thread(target=self._dispatch, daemon=True).start()
+        return True
+
+    def set_reads(self, reads, intervals=None):
+        """Replace the read table {signal: (driver method name, args)} and the intervals."""
+        self.reads = dict(reads)
+        self.intervals = dict(intervals or {})
+        self.commands.put((None, "__reads__", (self.reads, self.intervals), {}))
+
+    def call(self, func, *args, **kwargs):
+        """Execute a driver method (or its name) in the acquisition process and return its result."""
+        name = func if isinstance(func, str) else func.__name__
+        request_id = next(self.ids)
+        response = _Response()
+        with self.pending_lock:
+            self.pending[request_id] = response
+        self.commands.put((request_id, name, args, kwargs))
+        try:
+            result = response.get(self.retry_window + 2)
+        finally:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def call_urgent(self, calls):
+        """
+        Execute [(driver method or name, args)] ahead of every queued command and
+        read; the process checks for urgent calls before each transaction. Return
+        the result of each call, exceptions included (not raised), so one failing
+        call does not skip the next.
+        """
+        calls = [(func if isinstance(func, str) else func.__name__, tuple(args)) for func, args in calls]
+        request_id = next(self.ids)
+        response = _Response()
+        with self.pending_lock:
+            self.pending[request_id] = response
+        self.urgent.put((request_id, calls))
+        self.urgent_event.set()
+        self.commands.put((None, "__wake__", (), {}))   # Ends a wait for commands
+        try:
+            result = response.get(self.retry_window + 2)
+        finally:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def _dispatch(self):
+        """Hand the results of the process to the waiting callers."""
+        while self.process is not None and self.process.is_alive():
+            try:
+                request_id, result = self.results.get(timeout=0.5)
+            except (Empty, EOFError, OSError):
+                continue
+            with self.pending_lock:
+                response = self.pending.get(request_id)
+            if response:
+                response.put(result)
+
+    def close(self):
+        """Stop the process and remove the bus."""
+        if self.process is not None:
+            self.commands.put((None, "__stop__", (), {}))
+            self.process.join(timeout=self.retry_window + 2)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+
+class _Response:
+    """One-shot result slot of a call."""
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+    def put(self, result):
+        self.result = result
+        self.event.set()
+
+    def get(self, timeout):
+        if not self.event.wait(timeout):
+            return ConnectionError("HEAT3-PS: acquisition process not answering")
+        return self.result
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the HEAT3 acquisition process on its own; "
+                                                 "attach with 'sample_bus.py show|log'.")
+    parser.add_argument("address", help="HEAT3-PS IP address")
+    parser.add_argument("--port", type=int, default=502)
+    parser.add_argument("--bus", default=BUS_NAME, help="Shared memory name")
+    parser.add_argument("--interval", type=float, default=0.25, help="Temperature read interval in seconds")
+    args = parser.parse_args()
+
+    acquisition = AcquisitionProcess(args.address, args.port, args.bus)
+    acquisition.intervals = {"temperature": args.interval}
+    if not acquisition.connect():
+        raise SystemExit("Cannot connect to HEAT3-PS")
+    print(f"Publishing on '{args.bus}', Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        acquisition.close()
+
+if __name__ == "__main__":
+    main()
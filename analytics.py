@@ -0,0 +1,202 @@
+import math
+import threading
+import numpy as np
+from ticker import TickScheduler
+
+ANALYTICS_CHANNELS = ["correlation", "response_lag", "pressure_per_kelvin", "outgassing_time"]
+
+class CorrelationAnalyzer:
+    def __init__(self, period=1.0, window=300, max_lag=120, step_threshold=2.0, min_rise=0.05, resum_every=None):
+        """
+        Rolling temperature/pressure analytics on samples aligned to a fixed period.
+
+        Every statistic is kept as running sums over the last `window` samples: the
+        new sample is added and the one leaving the window subtracted, so an update
+        costs the same whatever the window (one vectorized pass over the lags for the
+        cross-correlation). The sums are recomputed from the buffers every
+        resum_every updates so rounding errors do not accumulate over a long run.
+
+        - Lagged cross-correlation of the temperature changes dT with the changes of
+          log10(pressure) for lags 0..max_lag periods; the lag of the peak is the
+          pressure response lag.
+        - Pressure per kelvin: least-squares slope of pressure against temperature
+          over the window (mbar/K).
+        - Outgassing response time: after a temperature step of at least
+          step_threshold K in one period that raises the pressure by min_rise decades,
+          the time from the step until log10(pressure) has fallen back 63 % from its
+          peak towards the level before the step.
+
+        :param period: Seconds between the aligned samples
+        :param window: Samples in the rolling window
+        :param max_lag: Largest lag of the cross-correlation, in samples
+        """
+        self.period = period
+        self.window = window
+        self.max_lag = max_lag
+        self.step_threshold = step_threshold
+        self.min_rise = min_rise
+        self.resum_every = resum_every or window
+        self.lags = np.arange(max_lag + 1)
+        self.reset()
+
+    def reset(self):
+        # Circular buffers indexed by sample number; unwritten slots read as zero
+        self.dx = np.zeros(self.window + self.max_lag)    # dT
+        self.dy = np.zeros(self.window)                   # d log10(p)
+        self.t = np.zeros(self.window)
+        self.p = np.zeros(self.window)
+        self.count = 0
+        self.previous = None
+        self.since_resum = 0
+        self.sums = np.zeros(5)     # T, P, T^2, T*P, P^2 over the window
+        self.sx = np.zeros(self.max_lag + 1)
+        self.sxx = np.zeros(self.max_lag + 1)
+        self.sxy = np.zeros(self.max_lag + 1)
+        self.sy = 0.0
+        self.syy = 0.0
+        self.step = None            # [step time, log p before, peak log p]
+        self.response_time = math.nan
+
+    def update(self, timestamp, temperature, pressure):
+        """Add one aligned sample and return the current results as a dict (None at first)."""
+        log_p = math.log10(pressure) if pressure > 0 else math.nan
+        if not math.isfinite(log_p):
+            return None
+        if self.previous is None:
+            self.previous = (temperature, log_p)
+            return None
+        dx, dy = temperature - self.previous[0], log_p - self.previous[1]
+        self.track_step(timestamp, dx, log_p, self.previous[1])
+        self.previous = (temperature, log_p)
+
+        # dT at lag k is sample count - k; the lagged windows lose sample count - window - k
+        i = self.count
+        size = len(self.dx)
+        new_x = self.dx[(i - self.lags) % size]
+        new_x[0] = dx
+        old_x = self.dx[(i - self.window - self.lags) % size]
+        slot = i % self.window
+        old_y, old_t, old_p = self.dy[slot], self.t[slot], self.p[slot]
+
+        self.sx += new_x - old_x
+        self.sxx += new_x * new_x - old_x * old_x
+        self.sxy += new_x * dy - old_x * old_y
+        self.sy += dy - old_y
+        self.syy += dy * dy - old_y * old_y
+        self.sums += (np.array([temperature, pressure, temperature * temperature, temperature * pressure, pressure * pressure])
+                      - np.array([old_t, old_p, old_t * old_t, old_t * old_p, old_p * old_p]))
+
+        self.dx[i % size] = dx
+        self.dy[slot], self.t[slot], self.p[slot] = dy, temperature, pressure
+        self.count += 1
+        self.since_resum += 1
+        if self.since_resum >= self.resum_every:
+            self.resum()
+        return self.results()
+
+    def resum(self):
+        """Recompute the running sums from the buffers (amortized over resum_every updates)."""
+        n = min(self.count, self.window)
+        samples = self.count - 1 - np.arange(n)
+        lagged_samples = samples[None, :] - self.lags[:, None]
+        lagged = np.where(lagged_samples >= 0, self.dx[lagged_samples % len(self.dx)], 0.0)
+        y = self.dy[samples % self.window]
+        self.sx = lagged.sum(axis=1)
+        self.sxx = (lagged * lagged).sum(axis=1)
+        self.sxy = lagged @ y
+        self.sy = float(y.sum())
+        self.syy = float(y @ y)
+        t, p = self.t[samples % self.window], self.p[samples % self.window]
+        self.sums = np.array([t.sum(), p.sum(), t @ t, t @ p, p @ p])
+        self.since_resum = 0
+
+    def track_step(self, timestamp, dx, log_p, before):
+        if self.step is None:
+            if abs(dx) >= self.step_threshold:
+                self.step = [timestamp, before, log_p]
+            return
+        start, before, peak = self.step
+        if log_p > peak:
+            self.step[2] = log_p
+        elif peak - before >= self.min_rise:
+            if log_p <= peak - 0.63 * (peak - before):
+                self.response_time = timestamp - start
+                self.step = None
+        elif timestamp - start > self.max_lag * self.period:
+            self.step = None   # The step did not raise the pressure
+
+    def results(self):
+        n = min(self.count, self.window)
+        if n < 3:
+            return None
+        mean_x, mean_y = self.sx / n, self.sy / n
+        var_x = self.sxx / n - mean_x ** 2
+        var_y = self.syy / n - mean_y ** 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlation = (self.sxy / n - mean_x * mean_y) / np.sqrt(var_x * var_y)
+        # Lags reaching before the first sample are not valid yet
+        correlation[self.lags >= self.count - 2] = np.nan
+        if np.isfinite(correlation).any():
+            lag = int(np.nanargmax(np.abs(correlation)))
+            peak = float(correlation[lag])
+        else:
+            lag, peak = 0, math.nan
+        sum_t, sum_p, sum_tt, sum_tp, _ = self.sums
+        var_t = sum_tt / n - (sum_t / n) ** 2
+        slope = (sum_tp / n - sum_t * sum_p / n ** 2) / var_t if var_t > 1e-9 else math.nan
+        return {"correlation": peak, "response_lag": lag * self.period,
+                "pressure_per_kelvin": slope, "outgassing_time": self.response_time,
+                "lagged_correlation": correlation}
+
+class AnalyticsStage:
+    def __init__(self, store, analyzer, on_result, temperature="temperature", pressure="pressure",
+                 max_age=None):
+        """
+        Thread sampling the latest temperature and pressure of a SampleStore on the
+        analyzer's period (zero-order hold alignment) and feeding the analyzer.
+
+        :param on_result: Called as on_result(timestamp, results) from the thread
+        :param max_age: Samples older than this many seconds are not used (default 5 periods)
+        """
+        self.store = store
+        self.analyzer = analyzer
+        self.on_result = on_result
+        self.temperature = temperature
+        self.pressure = pressure
+        self.max_age = max_age or 5 * analyzer.period
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.thread = None
+
+    def _run(self):
+        ticker = TickScheduler(self.analyzer.period)
+        while True:
+            deadline = ticker.wait(self._stop)
+            if deadline is None:
+                break
+            temperature = self.store.sample(self.temperature)
+            pressure = self.store.sample(self.pressure)
+            if temperature is None or pressure is None:
+                continue
+            if deadline - min(temperature[0], pressure[0]) > self.max_age:
+                continue
+            results = self.analyzer.update(deadline, temperature[1], pressure[1])
+            if results is not None:
+                self.on_result(deadline, results)
+
+def format_results(results):
+    """One-line text of the analyzer results."""
+    def value(name, fmt):
+        number = results[name]
+        return "-" if number is None or not math.isfinite(number) else format(number, fmt)
+    return (f"r = {value('correlation', '.2f')} at lag {value('response_lag', '.0f')} s, "
+            f"dP/dT = {value('pressure_per_kelvin', '.2e')} mbar/K, "
+            f"outgassing time {value('outgassing_time', '.0f')} s")
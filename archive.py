@@ -0,0 +1,319 @@
+import os
+import re
+import threading
+import time
+import numpy as np
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), "prevac_archive")
+LEVELS = (1, 10, 60)   # Downsample pyramid bucket widths in seconds
+TIME_DTYPE = np.dtype("<f8")
+VALUE_DTYPE = np.dtype("<f4")
+BUCKET_DTYPE = np.dtype([("time", "<f8"), ("min", "<f4"), ("max", "<f4"), ("mean", "<f8"), ("count", "<u4")])
+
+class _Bucket:
+    """Open (not yet written) bucket of one pyramid level."""
+    def __init__(self, start):
+        self.start = start
+        self.min = np.inf
+        self.max = -np.inf
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, value):
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.sum += value
+        self.count += 1
+
+    def record(self):
+        return np.array([(self.start, self.min, self.max, self.sum / self.count, self.count)], dtype=BUCKET_DTYPE)
+
+class _Channel:
+    def __init__(self, directory, name, levels):
+        self.name = name
+        self.levels = levels
+        self.time_path = os.path.join(directory, name + ".time")
+        self.value_path = os.path.join(directory, name + ".value")
+        self.level_paths = {level: os.path.join(directory, f"{name}.{level}s") for level in levels}
+        self._repair()
+        self.time_file = open(self.time_path, "ab")
+        self.value_file = open(self.value_path, "ab")
+        self.level_files = {level: open(path, "ab") for level, path in self.level_paths.items()}
+
+    def _repair(self):
+        """
+        Make the files consistent after a crash: cut the raw columns to the same length,
+        drop the last (possibly partial) bucket of every level and rebuild it, and any
+        missing ones, from the raw samples.
+        """
+        count = min(_file_count(self.time_path, TIME_DTYPE), _file_count(self.value_path, VALUE_DTYPE))
+        _truncate(self.time_path, count * TIME_DTYPE.itemsize)
+        _truncate(self.value_path, count * VALUE_DTYPE.itemsize)
+        times = _map(self.time_path, TIME_DTYPE)
+        values = _map(self.value_path, VALUE_DTYPE)
+        self.last_time = float(times[-1]) if count else -np.inf
+        self.buckets = {}
+        for level, path in self.level_paths.items():
+            records = _file_count(path, BUCKET_DTYPE)
+            buckets = _map(path, BUCKET_DTYPE)
+            # Rebuild from the start of the last written bucket
+            resume = float(buckets["time"][records - 1]) if records else -np.inf
+            del buckets
+            _truncate(path, max(records - 1, 0) * BUCKET_DTYPE.itemsize)
+            first = int(np.searchsorted(times, resume, side="left"))
+            with open(path, "ab") as file:
+                bucket = None
+                for t, value in zip(times[first:].tolist(), values[first:].tolist()):
+                    bucket = self._add(level, bucket, t, value, file)
+                self.buckets[level] = bucket
+        del times, values
+
+    def _add(self, level, bucket, timestamp, value, file):
+        start = np.floor(timestamp / level) * level
+        if bucket is None or start != bucket.start:
+            if bucket is not None:
+                file.write(bucket.record().tobytes())
+            bucket = _Bucket(start)
+        bucket.add(value)
+        return bucket
+
+    def append(self, timestamp, value):
+        if timestamp < self.last_time:
+            return False   # Columns are sorted by time, late samples are dropped
+        self.last_time = timestamp
+        self.time_file.write(np.float64(timestamp).tobytes())
+        self.value_file.write(np.float32(value).tobytes())
+        for level in self.levels:
+            self.buckets[level] = self._add(level, self.buckets[level], timestamp, value, self.level_files[level])
+        return True
+
+    def extend(self, times, values):
+        """Append sorted arrays of samples, building the buckets with NumPy."""
+        times = np.asarray(times, dtype=TIME_DTYPE)
+        values = np.asarray(values, dtype=VALUE_DTYPE)
+        # Drop samples older than one before them, like append does one at a time
+        keep = times >= np.maximum.accumulate(np.r_[self.last_time, times[:-1]])
+        times, values = times[keep], values[keep]
+        if not len(times):
+            return 0
+        self.last_time = float(times[-1])
+        times.tofile(self.time_file)
+        values.tofile(self.value_file)
+        for level in self.levels:
+            starts = np.floor(times / level) * level
+            first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+            records = np.empty(len(first), dtype=BUCKET_DTYPE)
+            records["time"] = starts[first]
+            records["min"] = np.minimum.reduceat(values, first)
+            records["max"] = np.maximum.reduceat(values, first)
+            records["count"] = np.diff(np.r_[first, len(values)])
+            sums = np.add.reduceat(values.astype(np.float64), first)
+            # Merge the first bucket into the open one if they are the same
+            bucket = self.buckets[level]
+            if bucket is not None and bucket.start == records["time"][0]:
+                records["min"][0] = min(records["min"][0], bucket.min)
+                records["max"][0] = max(records["max"][0], bucket.max)
+                records["count"][0] += bucket.count
+                sums[0] += bucket.sum
+            elif bucket is not None:
+                self.level_files[level].write(bucket.record().tobytes())
+            records["mean"] = sums / records["count"]
+            records[:-1].tofile(self.level_files[level])
+            last = records[-1]
+            bucket = _Bucket(float(last["time"]))
+            bucket.min, bucket.max, bucket.sum, bucket.count = float(last["min"]), float(last["max"]), float(sums[-1]), int(last["count"])
+            self.buckets[level] = bucket
+        return len(times)
+
+    def flush(self):
+        self.time_file.flush()
+        self.value_file.flush()
+        for file in self.level_files.values():
+            file.flush()
+
+    def close(self):
+        self.flush()
+        # Write the open buckets so readers see the tail; the next open rebuilds them
+        for level, bucket in self.buckets.items():
+            if bucket is not None:
+                self.level_files[level].write(bucket.record().tobytes())
+        for file in [self.time_file, self.value_file] + list(self.level_files.values()):
+            file.close()
+
+class TimeSeriesArchive:
+    def __init__(self, directory=DEFAULT_DIRECTORY, levels=LEVELS, flush_interval=2.0, readonly=False):
+        """
+        Columnar on-disk archive of every acquired channel.
+
+        Each channel is stored as two append-only files, <name>.time (float64 seconds
+        since the epoch) and <name>.value (float32), plus one file per downsample level
+        (<name>.10s...) holding min/max/mean/count records per bucket. Reads memory-map
+        the files and find a time range by binary search on the sorted time column, so
+        a query costs O(log n) plus the size of the result.
+
+        :param levels: Bucket widths of the downsample pyramid in seconds
+        :param flush_interval: Longest time appended samples stay in the write buffers
+        :param readonly: Open an archive written by another process, for plotting only
+        """
+        self.directory = directory
+        self.levels = tuple(levels)
+        self.flush_interval = flush_interval
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.maps = {}
+        self.last_flush = time.monotonic()
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+
+    def names(self):
+        """Names of the channels stored in the archive."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".time")] for name in os.listdir(self.directory) if name.endswith(".time"))
+
+    def append(self, channel, value, timestamp=None):
+        """Add one sample; timestamps of a channel must not go backwards."""
+        if self.readonly:
+            raise PermissionError("Archive opened read-only")
+        if value is None:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            added = self._channel(channel).append(timestamp, value)
+            if time.monotonic() - self.last_flush > self.flush_interval:
+                self._flush()
+        return added
+
+    def extend(self, channel, times, values):
+        """Add arrays of samples sorted by time (bulk import). Return the number added."""
+        if self.readonly:
+            raise PermissionError("Archive opened read-only")
+        with self.lock:
+            return self._channel(channel).extend(times, values)
+
+    def _channel(self, channel):
+        entry = self.channels.get(channel)
+        if entry is None:
+            if not re.fullmatch(r"[A-Za-z0-9_\-]+", channel):
+                raise ValueError(f"Invalid channel name '{channel}'")
+            entry = _Channel(self.directory, channel, self.levels)
+            self.channels[channel] = entry
+        return entry
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        for entry in self.channels.values():
+            entry.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            for entry in self.channels.values():
+                entry.close()
+            self.channels = {}
+            self.maps = {}
+
+    def _column(self, channel, suffix, dtype):
+        """Memory map of a channel file, mapped again only when the file has grown."""
+        path = os.path.join(self.directory, channel + suffix)
+        entry = self.channels.get(channel)
+        if entry is not None:
+            entry.flush()
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self.maps.get(path)
+        if cached is None or cached[0] != size:
+            cached = (size, _map(path, dtype))
+            self.maps[path] = cached
+        return cached[1]
+
+    def span(self, channel):
+        """(first, last) timestamp of a channel, or None if it is empty."""
+        with self.lock:
+            times = self._column(channel, ".time", TIME_DTYPE)
+        if not len(times):
+            return None
+        return float(times[0]), float(times[-1])
+
+    def query(self, channel, start=None, end=None):
+        """
+        Raw samples with start <= time <= end as (times, values) views on the mapped
+        files. Copy them if they must outlive the archive.
+        """
+        with self.lock:
+            times = self._column(channel, ".time", TIME_DTYPE)
+            values = self._column(channel, ".value", VALUE_DTYPE)
+        count = min(len(times), len(values))
+        first = 0 if start is None else int(np.searchsorted(times[:count], start, side="left"))
+        last = count if end is None else int(np.searchsorted(times[:count], end, side="right"))
+        return times[first:last], values[first:last]
+
+    def query_level(self, channel, level, start=None, end=None):
+        """Downsampled buckets (time, min, max, mean, count) overlapping start..end."""
+        if level not in self.levels:
+            raise ValueError(f"No downsample level of {level} s. Levels are {self.levels}.")
+        with self.lock:
+            buckets = self._column(channel, f".{level}s", BUCKET_DTYPE)
+        first = 0 if start is None else int(np.searchsorted(buckets["time"], start - level, side="right"))
+        last = len(buckets) if end is None else int(np.searchsorted(buckets["time"], end, side="right"))
+        return buckets[first:last]
+
+    def plot_data(self, channel, start=None, end=None, max_points=4000):
+        """
+        Data for plotting start..end with at most max_points points: the raw samples
+        if they are few enough, otherwise the finest pyramid level that fits. Past the
+        coarsest level, buckets are merged further so the result never exceeds the
+        screen resolution the caller asked for.
+
+        :return: (times, minimum, maximum, mean); for raw samples the last three are the same
+        """
+        times, values = self.query(channel, start, end)
+        if len(times) <= max_points:
+            return times, values, values, values
+        for level in sorted(self.levels):
+            buckets = self.query_level(channel, level, start, end)
+            if len(buckets) <= max_points:
+                return buckets["time"], buckets["min"], buckets["max"], buckets["mean"]
+        return decimate(buckets, max_points)
+
+    def export(self, path, channels=None, start=None, end=None, mantissa_bits=23):
+        """
+        Write the raw samples of start..end to a compressed file (see codec.save_series);
+        23 mantissa bits keep the float32 values exactly, fewer trade precision for size.
+
+        :param channels: Channel names, default all
+        :return: Number of samples written
+        """
+        import codec
+        series = {}
+        for channel in channels or self.names():
+            series[channel] = self.query(channel, start, end)
+        codec.save_series(path, series, mantissa_bits)
+        return sum(len(times) for times, _ in series.values())
+
+def decimate(buckets, max_points):
+    """Merge consecutive buckets in groups so at most max_points remain."""
+    size = -(-len(buckets) // max_points)
+    first = np.arange(0, len(buckets), size)
+    counts = np.add.reduceat(buckets["count"].astype(np.float64), first)
+    sums = np.add.reduceat(buckets["mean"] * buckets["count"], first)
+    return (buckets["time"][first], np.minimum.reduceat(buckets["min"], first),
+            np.maximum.reduceat(buckets["max"], first), sums / counts)
+
+def _file_count(path, dtype):
+    return os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+
+def _truncate(path, size):
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as file:
+            file.truncate(size)
+
+def _map(path, dtype):
+    """Read-only memory map of the whole records of a file (an empty array if there are none)."""
+    count = _file_count(path, dtype)
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
@@ -0,0 +1,224 @@
+import math
+import threading
+import numpy as np
+
+# Tuning rules from the ultimate gain Ku and period Pu: (Kp / Ku, Ti / Pu, Td / Pu)
+TUNING_RULES = {
+    "ziegler-nichols": (0.6, 0.5, 0.125),
+    "tyreus-luyben": (1 / 2.2, 2.2, 1 / 6.3),   # Less overshoot, preferred for heaters
+    "no-overshoot": (0.2, 0.5, 1 / 3),
+}
+
+def analyze_relay_response(times, temperatures, setpoint, relay_amplitude, hysteresis=0.0, cycles=3):
+    """
+    Identify the ultimate gain and period from a relay feedback experiment.
+
+    Works on whole arrays: upward setpoint crossings give the period, the extremes
+    between crossings give the oscillation amplitude. Only the last `cycles` periods
+    are used so the initial heat-up is ignored.
+
+    :param relay_amplitude: Half the difference between relay high and low output
+    :return: (Ku, Pu, amplitude)
+    """
+    times = np.asarray(times, dtype=float)
+    error = np.asarray(temperatures, dtype=float) - setpoint
+    up = np.flatnonzero((error[:-1] < 0) & (error[1:] >= 0)) + 1
+    if len(up) < cycles + 1:
+        raise ValueError(f"Only {max(len(up) - 1, 0)} oscillation cycles recorded, {cycles} needed")
+    up = up[-(cycles + 1):]
+    # Linear interpolation of the crossing times between the two samples around them
+    t_cross = times[up - 1] + (times[up] - times[up - 1]) * (-error[up - 1]) / (error[up] - error[up - 1])
+    period = float(np.mean(np.diff(t_cross)))
+
+    window = error[up[0]:up[-1] + 1]
+    bounds = np.r_[up - up[0]]
+    peaks = np.maximum.reduceat(window, bounds[:-1])
+    troughs = np.minimum.reduceat(window, bounds[:-1])
+    amplitude = float(np.mean(peaks - troughs) / 2)
+    if amplitude <= hysteresis:
+        raise ValueError("Oscillation amplitude is below the relay hysteresis")
+    ku = 4 * relay_amplitude / (math.pi * math.sqrt(amplitude ** 2 - hysteresis ** 2))
+    return ku, period, amplitude
+
+def pid_from_ultimate(ku, pu, rule="tyreus-luyben"):
+    """Return (Kp, Ti, Td) in output units per degree and seconds."""
+    kp_factor, ti_factor, td_factor = TUNING_RULES[rule]
+    return kp_factor * ku, ti_factor * pu, td_factor * pu
+
+def heat3_parameters(kp, ti, td, output_limit):
+    """
+    Convert controller gains to the HEAT3 P/I/D fields.
+
+    P is expressed as percent of the output limit per degree of error, I and D as
+    times in seconds.
+    """
+    return round(100.0 * kp / output_limit, 2), round(ti, 1), round(td, 1)
+
+class RelayAutotune:
+    def __init__(self, setpoint, bias, amplitude, set_output, output_limit, hysteresis=0.5,
+                 cycles=3, max_cycles=8, max_overshoot=50.0, timeout=7200.0, rule="tyreus-luyben",
+                 on_finish=None, keep_running=None, channel="temperature", asymmetry_tolerance=0.1,
+                 stall_time=300.0):
+        """
+        Relay (Astrom-Hagglund) autotune, stepped by the ProgramExecutor like a program.
+
+        With HEAT3 in Manual mode, the output is switched between bias + amplitude and
+        bias - amplitude each time the temperature crosses the setpoint (with hysteresis).
+        Once the oscillation period is stable over `cycles` periods, the ultimate gain and
+        period are identified and converted to PID gains.
+
+        The bias should be the output that holds the setpoint, which depends on the
+        temperature. After every cycle whose high and low phases differ in length by more
+        than asymmetry_tolerance (relative), the bias is moved by amplitude times that
+        asymmetry and the period check starts again; the adapted bias is left in bias.
+        A level that cannot bring the temperature back across the setpoint at all moves
+        the bias by a whole amplitude, at most once per stall_time: the low level when
+        the temperature still passes setpoint + max_overshoot / 2, the high level when
+        it has risen less than the hysteresis over stall_time below the setpoint.
+
+        :param set_output: Function sending the manual output (Ic in A, or Ue in V)
+        :param output_limit: Output limit, used to express P in percent
+        :param max_overshoot: Abort if the temperature exceeds the setpoint by this much
+        """
+        self.setpoint = setpoint
+        self.bias = bias
+        self.amplitude = amplitude
+        self.set_output = set_output
+        self.output_limit = output_limit
+        self.hysteresis = hysteresis
+        self.cycles = cycles
+        self.max_cycles = max_cycles
+        self.max_overshoot = max_overshoot
+        self.timeout = timeout
+        self.rule = rule
+        self.on_finish = on_finish
+        self.keep_running = keep_running
+        self.channel = channel
+        self.asymmetry_tolerance = asymmetry_tolerance
+        self.stall_time = stall_time
+
+        self.high = min(bias + amplitude, output_limit)
+        self.low = max(bias - amplitude, 0.0)
+        self.output = None
+        self.switch_times = []      # Times of the output switches
+        self.last_adjust = None     # Time of the last stuck-level bias change
+        self.start_time = None
+        self.last_sample = None
+        self.times = []
+        self.temperatures = []
+        self.crossings = []
+        self.result = None          # (p, i, d) in HEAT3 units
+        self.ultimate = None        # (Ku, Pu, amplitude)
+        self.finished = False
+        self.completed = False
+        self.error = None
+        self.finish_lock = threading.Lock()
+
+    def tick(self, now, store):
+        if self.keep_running and not self.keep_running():
+            self.finish()
+            return None
+        sample = store.sample(self.channel)
+        if sample is None or sample[0] == self.last_sample:
+            return None
+        self.last_sample, temperature = sample
+        if self.start_time is None:
+            self.start_time = sample[0]
+        if temperature > self.setpoint + self.max_overshoot:
+            self.finish(RuntimeError(f"Autotune aborted: temperature {temperature:.1f} above the safe limit"))
+            return None
+        if sample[0] - self.start_time > self.timeout:
+            self.finish(RuntimeError("Autotune aborted: no stable oscillation before the timeout"))
+            return None
+
+        self.times.append(sample[0])
+        self.temperatures.append(temperature)
+
+        # Relay with hysteresis
+        if temperature < self.setpoint - self.hysteresis and self.output != self.high:
+            self._switch(self.high, sample[0])
+        elif temperature > self.setpoint + self.hysteresis and self.output != self.low:
+            if self.output == self.high:
+                self.crossings.append(sample[0])
+                self._adapt_bias(sample[0])
+            self._switch(self.low, sample[0])
+        elif self.output is None:
+            self._switch(self.high, sample[0])
+        else:
+            self._unstick(sample[0], temperature)
+
+        if len(self.crossings) >= self.cycles + 2 and self._stable():
+            self._identify()
+        elif len(self.crossings) > self.max_cycles + 1:
+            self.finish(RuntimeError("Autotune aborted: oscillation period does not settle"))
+        return None
+
+    def _switch(self, output, timestamp):
+        self.output = output
+        self.switch_times.append(timestamp)
+        self.set_output(output)
+
+    def _unstick(self, now, temperature):
+        """Move the bias by one amplitude if the current level holds the temperature on one side."""
+        phase_start = self.switch_times[-1]
+        if self.last_adjust is not None and now - self.last_adjust < self.stall_time:
+            return
+        if self.output == self.low and self.low > 0 and temperature > self.setpoint + self.max_overshoot / 2:
+            step = -self.amplitude
+        elif (self.output == self.high and self.high < self.output_limit and temperature < self.setpoint - self.hysteresis
+              and now - max(phase_start, self.last_adjust or phase_start) >= self.stall_time):
+            earlier = np.searchsorted(self.times, now - self.stall_time)
+            if temperature - self.temperatures[earlier] >= self.hysteresis:
+                return
+            step = self.amplitude
+        else:
+            return
+        self._set_bias(self.bias + step)
+        self.last_adjust = now
+        self.output = self.low if step < 0 else self.high
+        self.set_output(self.output)
+
+    def _set_bias(self, bias):
+        self.bias = min(max(bias, 0.0), self.output_limit)
+        self.high = min(self.bias + self.amplitude, self.output_limit)
+        self.low = max(self.bias - self.amplitude, 0.0)
+        # Periods before the change do not count towards a stable oscillation
+        self.crossings = self.crossings[-1:]
+
+    def _adapt_bias(self, now):
+        """At the end of a high phase, move the bias towards equal high and low phases."""
+        if len(self.switch_times) < 3:
+            return   # The first high phase is the heat-up
+        low_time = self.switch_times[-1] - self.switch_times[-2]
+        high_time = now - self.switch_times[-1]
+        asymmetry = (high_time - low_time) / (high_time + low_time)
+        if abs(asymmetry) <= self.asymmetry_tolerance:
+            return
+        self._set_bias(self.bias + self.amplitude * asymmetry)
+
+    def _stable(self):
+        """Relative spread of the last periods below 10 %."""
+        periods = np.diff(self.crossings[-(self.cycles + 1):])
+        return float(np.ptp(periods)) < 0.1 * float(np.mean(periods))
+
+    def _identify(self):
+        try:
+            relay_amplitude = (self.high - self.low) / 2
+            self.ultimate = analyze_relay_response(self.times, self.temperatures, self.setpoint,
+                                                   relay_amplitude, self.hysteresis, self.cycles)
+            kp, ti, td = pid_from_ultimate(self.ultimate[0], self.ultimate[1], self.rule)
+            self.result = heat3_parameters(kp, ti, td, self.output_limit)
+        except ValueError as e:
+            self.finish(e)
+            return
+        self.completed = True
+        self.finish()
+
+    def finish(self, error=None):
+        with self.finish_lock:
+            if self.finished:
+                return
+            self.finished = True
+        self.error = error
+        if self.on_finish:
+            self.on_finish(self)
@@ -0,0 +1,200 @@
+import math
+import struct
+
+# Delta-of-delta buckets of the timestamps: (prefix, prefix bits, value bits)
+DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12))
+MAGIC = b"PVZ1"
+
+def quantize(value, mantissa_bits):
+    """
+    Round a float to mantissa_bits bits of mantissa (relative precision
+    2 ** -mantissa_bits), so its low bits are zero and XOR-compress to nothing.
+    """
+    if mantissa_bits >= 52 or not math.isfinite(value) or value == 0:
+        return value
+    bits = struct.unpack("<Q", struct.pack("<d", value))[0]
+    drop = 52 - mantissa_bits
+    bits = (bits + (1 << (drop - 1))) >> drop << drop   # Round half up
+    return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+class BitWriter:
+    def __init__(self):
+        self.data = bytearray()
+        self.value = 0      # Bits not yet flushed to data
+        self.bits = 0
+
+    def write(self, value, bits):
+        self.value = (self.value << bits) | (value & ((1 << bits) - 1))
+        self.bits += bits
+        if self.bits >= 64:
+            whole = self.bits // 8 * 8
+            self.bits -= whole
+            self.data += (self.value >> self.bits).to_bytes(whole // 8, "big")
+            self.value &= (1 << self.bits) - 1
+
+    def getvalue(self):
+        padding = -self.bits % 8
+        return bytes(self.data) + (self.value << padding).to_bytes((self.bits + padding) // 8, "big")
+
+class BitReader:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def read(self, bits):
+        start = self.position
+        self.position += bits
+        if self.position > len(self.data) * 8:
+            raise ValueError("Compressed series is truncated")
+        chunk = int.from_bytes(self.data[start // 8:(self.position + 7) // 8], "big")
+        return (chunk >> (-self.position % 8)) & ((1 << bits) - 1)
+
+class GorillaEncoder:
+    def __init__(self, mantissa_bits=52):
+        """
+        Streaming encoder of (timestamp, value) samples after Facebook's Gorilla:
+
+        - timestamps as integer milliseconds, stored as the change of the interval
+          (delta of delta): a fixed-rate series costs 1 bit per sample;
+        - values as the XOR with the previous value, storing only the bits between
+          the leading and trailing zeros, and reusing the previous window when it
+          fits: a repeated value costs 1 bit, a slowly varying float a few bits.
+
+        :param mantissa_bits: Mantissa bits kept per value (52 = lossless). Device
+            readings are float32, so 23 loses nothing and compresses much better.
+        """
+        self.mantissa_bits = mantissa_bits
+        self.writer = BitWriter()
+        self.count = 0
+        self.time = 0
+        self.delta = 0
+        self.bits = 0
+        self.leading = None
+        self.trailing = 0
+
+    def append(self, timestamp, value):
+        milliseconds = int(round(timestamp * 1000))
+        value = quantize(float(value), self.mantissa_bits)
+        bits = struct.unpack("<Q", struct.pack("<d", value))[0]
+        writer = self.writer
+        if self.count == 0:
+            writer.write(milliseconds & ((1 << 64) - 1), 64)
+            writer.write(bits, 64)
+        else:
+            delta = milliseconds - self.time
+            self._write_dod(delta - self.delta if self.count > 1 else delta)
+            self.delta = delta
+            self._write_xor(bits ^ self.bits)
+        self.time = milliseconds
+        self.bits = bits
+        self.count += 1
+
+    def _write_dod(self, dod):
+        writer = self.writer
+        if dod == 0:
+            writer.write(0, 1)
+            return
+        for prefix, prefix_bits, value_bits in DOD_BUCKETS:
+            if -(1 << (value_bits - 1)) <= dod < (1 << (value_bits - 1)):
+                writer.write(prefix, prefix_bits)
+                writer.write(dod, value_bits)
+                return
+        writer.write(0b1111, 4)
+        writer.write(dod, 64)
+
+    def _write_xor(self, xor):
+        writer = self.writer
+        if xor == 0:
+            writer.write(0, 1)
+            return
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if self.leading is not None and leading >= self.leading and trailing >= self.trailing:
+            # Fits in the previous window
+            writer.write(0b10, 2)
+            writer.write(xor >> self.trailing, 64 - self.leading - self.trailing)
+            return
+        significant = 64 - leading - trailing
+        writer.write(0b11, 2)
+        writer.write(leading, 5)
+        writer.write(significant - 1, 6)
+        writer.write(xor >> trailing, significant)
+        self.leading, self.trailing = leading, trailing
+
+    def getvalue(self):
+        """Encoded series: u32 sample count followed by the bit stream."""
+        return struct.pack("<I", self.count) + self.writer.getvalue()
+
+def encode_series(times, values, mantissa_bits=52):
+    """Encode sequences of timestamps (seconds) and values; see GorillaEncoder."""
+    encoder = GorillaEncoder(mantissa_bits)
+    for timestamp, value in zip(times, values):
+        encoder.append(timestamp, value)
+    return encoder.getvalue()
+
+def decode_series(data):
+    """Inverse of encode_series: (times in seconds, values) as lists."""
+    count, = struct.unpack_from("<I", data, 0)
+    reader = BitReader(data[4:])
+    times, values = [], []
+    if count == 0:
+        return times, values
+    milliseconds = reader.read(64)
+    if milliseconds >= 1 << 63:
+        milliseconds -= 1 << 64
+    bits = reader.read(64)
+    times.append(milliseconds / 1000)
+    values.append(struct.unpack("<d", struct.pack("<Q", bits))[0])
+    delta = 0
+    leading = trailing = 0
+    for index in range(1, count):
+        delta += _read_dod(reader)
+        milliseconds += delta
+        if reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                trailing = 64 - leading - (reader.read(6) + 1)
+            bits ^= reader.read(64 - leading - trailing) << trailing
+        times.append(milliseconds / 1000)
+        values.append(struct.unpack("<d", struct.pack("<Q", bits))[0])
+    return times, values
+
+def _read_dod(reader):
+    if not reader.read(1):
+        return 0
+    for _, _, value_bits in DOD_BUCKETS:
+        if not reader.read(1):
+            return _signed(reader.read(value_bits), value_bits)
+    return _signed(reader.read(64), 64)
+
+def _signed(value, bits):
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+def save_series(path, series, mantissa_bits=23):
+    """
+    Write {name: (times, values)} to a compressed file:
+    "PVZ1" | per series: u8 name length, name, u32 byte length, encoded series.
+    """
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        for name, (times, values) in series.items():
+            encoded = encode_series(times, values, mantissa_bits)
+            name = name.encode("ascii")
+            file.write(struct.pack("<B", len(name)) + name + struct.pack("<I", len(encoded)) + encoded)
+
+def load_series(path):
+    """Read a file written by save_series as {name: (times, values)}."""
+    with open(path, "rb") as file:
+        data = file.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a compressed series file")
+    series = {}
+    offset = 4
+    while offset < len(data):
+        length = data[offset]
+        name = data[offset + 1:offset + 1 + length].decode("ascii")
+        size, = struct.unpack_from("<I", data, offset + 1 + length)
+        offset += 5 + length
+        series[name] = decode_series(data[offset:offset + size])
+        offset += size
+    return series
@@ -0,0 +1,107 @@
+import math
+import threading
+import time
+
+class DegasController:
+    def __init__(self, send_setpoint, base=1e-9, limit=1e-7, kp=20.0, ki=0.5,
+                 max_reduction=200.0, resolution=0.5, max_dt=5.0):
+        """
+        Pressure-feedback degas: a PI controller on log10(pressure) that lowers the
+        heating setpoint while the chamber outgasses.
+
+        The target pressure is the geometric mean of base and limit (the middle of the
+        two on a log scale). The controller output is the setpoint reduction in degrees,
+        clamped to [0, max_reduction], with conditional integration as anti-windup.
+        update() is called by the gauge acquisition loop for every pressure sample.
+
+        :param send_setpoint: Function sending a setpoint; must not block for long
+        :param kp: Degrees of reduction per decade of pressure above the target
+        :param ki: Degrees per second of reduction per decade above the target
+        :param resolution: Smallest setpoint change sent to the device (degrees)
+        :param max_dt: Longest sample gap integrated, so a stalled gauge cannot wind up
+        """
+        self.send_setpoint = send_setpoint
+        self.kp = kp
+        self.ki = ki
+        self.max_reduction = max_reduction
+        self.resolution = resolution
+        self.max_dt = max_dt
+        self.lock = threading.Lock()
+        self.configure(base, limit)
+        self.reset()
+
+    def configure(self, base, limit):
+        if not 0 < base < limit:
+            raise ValueError("Base pressure must be positive and below the limit pressure")
+        self.base = base
+        self.limit = limit
+        self.log_target = (math.log10(base) + math.log10(limit)) / 2
+
+    def reset(self):
+        with self.lock:
+            self.program_setpoint = None
+            self.integral = 0.0
+            self.reduction = 0.0
+            self.last_time = None
+            self.last_sent = None
+            self.holding = False
+
+    def restore(self, program_setpoint, integral, reduction):
+        """Continue a degas saved by the run journal without stepping the setpoint."""
+        with self.lock:
+            self.program_setpoint = program_setpoint
+            self.integral = integral
+            self.reduction = reduction
+            self.last_time = None
+            self.last_sent = program_setpoint - reduction if reduction else program_setpoint
+
+    def set_program_setpoint(self, setpoint):
+        """Setpoint requested by the heating program (already sent by the program)."""
+        with self.lock:
+            if setpoint != self.program_setpoint:
+                self.program_setpoint = setpoint
+                self.last_sent = setpoint - self.reduction if self.reduction else setpoint
+
+    def update(self, pressure, timestamp=None):
+        """Feed one pressure sample (mbar); send a new setpoint if it moved enough."""
+        now = time.monotonic() if timestamp is None else timestamp
+        with self.lock:
+            if self.program_setpoint is None or not pressure or pressure <= 0:
+                return
+            dt = 0.0 if self.last_time is None else min(max(now - self.last_time, 0.0), self.max_dt)
+            self.last_time = now
+            self.holding = pressure > self.base
+
+            error = math.log10(pressure) - self.log_target
+            integral = self.integral + self.ki * error * dt
+            output = self.kp * error + integral
+            # Anti-windup: stop integrating while the output is saturated in the
+            # direction the error is pushing it
+            if not ((output > self.max_reduction and error > 0) or (output < 0 and error < 0)):
+                self.integral = min(max(integral, 0.0), self.max_reduction)
+            self.reduction = min(max(self.kp * error + self.integral, 0.0), self.max_reduction)
+
+            setpoint = self.program_setpoint - self.reduction
+            if self.reduction == 0:
+                setpoint = self.program_setpoint
+            if self.last_sent is not None and abs(setpoint - self.last_sent) < self.resolution and \
+                    not (self.reduction == 0 and self.last_sent != setpoint):
+                return
+            self.last_sent = setpoint
+        self.send_setpoint(setpoint)
+
+    def track(self, setpoint):
+        """
+        Setpoint a host-streamed ramp is about to send (see trajectory.SetpointStreamer):
+        it becomes the program setpoint and the reduced setpoint to send instead is
+        returned, so the stream and the degas reduction never undo each other.
+        """
+        with self.lock:
+            self.program_setpoint = setpoint
+            self.last_sent = setpoint - self.reduction if self.reduction else setpoint
+            return self.last_sent
+
+    def hold(self, setpoint):
+        """Program hold callback: track the program setpoint, hold while above base pressure."""
+        self.set_program_setpoint(setpoint)
+        return self.holding
@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".prevac_device_cache.json")
+
+class DeviceMetadataCache:
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Persistent cache of static device metadata (product number, serial number...).
+
+        Entries are keyed by connection, e.g. "tcp://192.168.236.50:502" or "serial://COM4/00",
+        and are only valid for the firmware version they were read with.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        try:
+            with open(self.path, "r") as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def tcp_key(ip_address, port):
+        return f"tcp://{ip_address}:{port}"
+
+    @staticmethod
+    def serial_key(port, address=""):
+        return f"serial://{port}/{address}"
+
+    def lookup(self, key, firmware):
+        """Return the cached metadata for key, or None if missing or read with other firmware."""
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or entry.get("firmware") != str(firmware):
+            return None
+        return entry["metadata"]
+
+    def store(self, key, firmware, metadata):
+        """Store metadata for key and write the cache file."""
+        with self.lock:
+            self.entries[key] = {"firmware": str(firmware), "time": time.time(), "metadata": metadata}
+            self._save()
+
+    def invalidate(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def read_through(self, key, firmware, readers):
+        """
+        Return the metadata for key, calling the readers only on a cache miss.
+
+        :param firmware: Firmware version (or other cheap fingerprint) read from the device
+        :param readers: Dict of metadata name -> function reading it from the device
+        """
+        metadata = self.lookup(key, firmware)
+        if metadata is not None and all(name in metadata for name in readers):
+            return metadata
+        metadata = {name: read() for name, read in readers.items()}
+        self.store(key, firmware, metadata)
+        return metadata
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(self.entries, file, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write device cache {self.path}: {e}")
@@ -0,0 +1,123 @@
+import json
+import os
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".prevac_gain_schedule.json")
+
+class GainSchedule:
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Table of PID parameters per heating mode (RES/EB) and setpoint band.
+
+        Each entry is {"mode", "low", "high", "p", "i", "d"} and applies to setpoints
+        in [low, high). Bands of one mode never overlap. Temperatures are in Kelvin so
+        the table does not depend on the display unit.
+        """
+        self.path = path
+        self.entries = []
+        try:
+            with open(self.path, "r") as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = []
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(self.entries, file, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write gain schedule {self.path}: {e}")
+
+    def bands(self, mode):
+        """Entries of one heating mode sorted by temperature."""
+        return sorted((entry for entry in self.entries if entry["mode"] == mode), key=lambda entry: entry["low"])
+
+    def lookup(self, mode, temperature):
+        """Return the entry whose band contains temperature, or None."""
+        for entry in self.bands(mode):
+            if entry["low"] <= temperature < entry["high"]:
+                return entry
+        return None
+
+    def update(self, mode, temperature, p, i, d, half_width=50.0):
+        """
+        Store gains for the band containing temperature. If there is none, a new band
+        of +/- half_width is created and trimmed so it does not overlap its neighbours.
+        """
+        entry = self.lookup(mode, temperature)
+        if entry is None:
+            low, high = temperature - half_width, temperature + half_width
+            for other in self.bands(mode):
+                if other["high"] <= temperature:
+                    low = max(low, other["high"])
+                elif other["low"] > temperature:
+                    high = min(high, other["low"])
+            entry = {"mode": mode, "low": low, "high": high}
+            self.entries.append(entry)
+        entry.update({"p": p, "i": i, "d": d})
+        self.save()
+        return entry
+
+class GainScheduler:
+    def __init__(self, schedule, mode, send_pid, to_kelvin=None, hysteresis=10.0, current=None,
+                 keep_running=None, on_finish=None, channel="temperature"):
+        """
+        Switch PID parameters between gain schedule bands while a program runs, stepped
+        by the ProgramExecutor alongside the program.
+
+        The scheduling variable is the measured temperature, which follows the program
+        through its segments. The active band is kept until the temperature is more than
+        hysteresis Kelvin outside it, so noise at a band edge does not toggle the gains.
+        Outside every band the last gains stay in effect.
+
+        :param send_pid: Function(p, i, d) sending the parameters to the controller
+        :param to_kelvin: Function converting the channel value to Kelvin
+        :param current: Entry whose gains are already on the controller, if any
+        """
+        self.schedule = schedule
+        self.mode = mode
+        self.send_pid = send_pid
+        self.to_kelvin = to_kelvin
+        self.hysteresis = hysteresis
+        self.current = current
+        self.keep_running = keep_running
+        self.on_finish = on_finish
+        self.channel = channel
+
+        self.last_sample = None
+        self.switches = 0
+        self.finished = False
+        self.completed = False
+        self.error = None
+
+    def tick(self, now, store):
+        if self.keep_running and not self.keep_running():
+            self.completed = True
+            self.finish()
+            return None
+        sample = store.sample(self.channel)
+        if sample is None or sample[0] == self.last_sample:
+            return None
+        self.last_sample, temperature = sample
+        if self.to_kelvin:
+            temperature = self.to_kelvin(temperature)
+
+        current = self.current
+        if current is not None and current["low"] - self.hysteresis <= temperature < current["high"] + self.hysteresis:
+            return None
+        entry = self.schedule.lookup(self.mode, temperature)
+        if entry is None or entry is current:
+            return None
+        self.send_pid(entry["p"], entry["i"], entry["d"])
+        self.current = entry
+        self.switches += 1
+        return None
+
+    def finish(self, error=None):
+        if self.finished:
+            return
+        self.finished = True
+        self.error = error
+        if self.on_finish:
+            self.on_finish(self)
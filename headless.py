@@ -0,0 +1,160 @@
+import threading
+from prevacv2TCP import prevacV2TCP, UnverifiedParameterError
+from modbusTCP import ModbusTCP
+from xgs600 import XGS600Controller
+from supervisor import ConnectionSupervisor
+from sample_store import SampleStore
+from program import RampSoakProgram, ProgramExecutor
+from degas import DegasController
+from trajectory import SetpointStreamer, peak_rate_factor
+from ticker import TickScheduler
+
+def split_address(address, default_port=502):
+    ip_address, _, port = address.partition(":")
+    return ip_address, int(port or default_port)
+
+class HeadlessRunner:
+    def __init__(self, heat3, mg15=None, xgs600=None, xgs600_address="00", gauge="IG2",
+                 channel=1, time_interval=0.25):
+        """
+        Run a compiled recipe without the GUI.
+
+        :param heat3: HEAT3-PS address as IP[:PORT]
+        :param mg15: Optional MG15 address as IP[:PORT]
+        :param xgs600: Optional XGS-600 serial port
+        :param gauge: Gauge channel read for the pressure (IG1...CH4)
+        """
+        self.heat3 = prevacV2TCP(*split_address(heat3))
+        self.heat3_link = ConnectionSupervisor(self.heat3, name="HEAT3-PS", probe=self.heat3.r_serial_number,
+                                               on_reconnect=self.heat3.register_new_host)
+        self.gauge = None
+        self.gauge_link = None
+        if mg15:
+            self.gauge = ModbusTCP(*split_address(mg15))
+            self.gauge_link = ConnectionSupervisor(self.gauge, name="MG15", probe=self.gauge.read_serial_number)
+            self.read_pressure = lambda: self.gauge_link.call(self.gauge.read_vacuum, gauge)
+        elif xgs600:
+            self.gauge = XGS600Controller(xgs600_address, xgs600)
+            self.gauge_link = ConnectionSupervisor(self.gauge, name="XGS-600", probe=self.gauge.read_sw_version)
+            self.read_pressure = lambda: self.gauge_link.call(self.gauge.read_pressure, gauge)
+        self.channel = channel
+        self.time_interval = time_interval
+        self.state = SampleStore()
+        self.executor = ProgramExecutor(self.state)
+        self.unit = "C"
+        self.running = False
+        self.degas = None
+        self.streamer = SetpointStreamer(self.stream_setpoint)
+
+    def send(self, name, *args):
+        """Send one HEAT3 command by method name through the supervisor."""
+        return self.heat3_link.call(getattr(self.heat3, name), *args)
+
+    def to_device(self, temp):
+        return temp + 273.15 if self.unit == "C" else temp
+
+    def from_device(self, temp):
+        return temp - 273.15 if self.unit == "C" else temp
+
+    def stream_setpoint(self, sp):
+        if self.degas:
+            sp = self.degas.track(sp)   # Degas reduces the streamed setpoint, see degas_hold
+        self.send("set_setpoint_t_mode", self.channel, self.to_device(sp))
+
+    def degas_hold(self, setpoint):
+        """Program hold callback, see HeatingControlApp.degas_hold."""
+        if self.streamer.active:
+            return self.degas.holding
+        return self.degas.hold(setpoint)
+
+    def stream_ramp(self, profile, start, end, seconds):
+        """Host-side ramp, see HeatingControlApp.stream_ramp."""
+        if seconds <= 0:
+            self.send("set_setpoint_t_mode", self.channel, self.to_device(end))
+            return
+        peak_rate = abs(end - start) / (seconds / 60) * peak_rate_factor(profile)
+        self.send("set_ramp_rate_t_mode", self.channel, peak_rate * 1.5)
+        self.streamer.start(profile, start, end, seconds)
+
+    def read_temperature(self, source):
+        if source in ["Tc1", "Tc2"]:
+            return self.send("r_temperature_from_thermocouple", source)
+        if source in ["D1", "D2"]:
+            return self.send("r_temperature_from_diode", source)
+        if source == "RTD":
+            return self.send("r_temperature_from_resistance")
+        return self.send("r_actual_process_value", self.channel)
+
+    def acquire(self, source):
+        ticker = TickScheduler(self.time_interval)
+        while self.running:
+            deadline = ticker.wait()
+            try:
+                self.state.publish("temperature", self.from_device(self.read_temperature(source)), deadline)
+                if self.gauge_link:
+                    pressure = self.read_pressure()
+                    self.state.publish("pressure", pressure, deadline)
+                    if self.degas:
+                        self.degas.update(pressure)
+            except ConnectionError as e:
+                print(f"Acquisition error: {e}")
+        print(f"Sampling: {ticker.stats.report()}")
+
+    def run(self, compiled):
+        """Run the recipe to the end (or Ctrl+C), then switch the heater off."""
+        self.unit = compiled.unit
+        self.streamer.update_rate = compiled.heating["stream_rate"]
+        if not self.heat3.verified:
+            # Fail before taking control rather than at the first write
+            raise UnverifiedParameterError("HEAT3-PS function codes are not verified against the protocol manual")
+        if compiled.degas and self.gauge_link:
+            self.degas = DegasController(
+                lambda sp: self.send("set_setpoint_t_mode", self.channel, self.to_device(sp)),
+                compiled.degas["base"], compiled.degas["limit"])
+        if not self.heat3_link.connect():
+            raise ConnectionError("Cannot connect to HEAT3-PS")
+        if self.gauge_link and not self.gauge_link.connect():
+            raise ConnectionError("Cannot connect to the pressure gauge")
+        self.send("register_new_host")
+        self.running = True
+        threading.Thread(target=self.acquire, args=(compiled.heating["input"],), daemon=True).start()
+
+        finished = threading.Event()
+        program = None
+        try:
+            self.send("master_mode", 1)
+            for name, args in compiled.init_commands(self.channel):
+                self.send(name, *args)
+            program = RampSoakProgram(
+                compiled.steps,
+                send_ramp=lambda ramp: self.send("set_ramp_rate_t_mode", self.channel, ramp),
+                send_setpoint=lambda sp: self.send("set_setpoint_t_mode", self.channel, self.to_device(sp)),
+                hold=self.degas_hold if self.degas else None,
+                stream_ramp=self.stream_ramp,
+                on_finish=lambda program: finished.set())
+            self.executor.start(program)
+            while not finished.wait(60):
+                print(f"Step {program.index + 1}/{len(compiled.steps)}, "
+                      f"T = {self.state.get('temperature'):.1f} {compiled.unit}, P = {self.state.get('pressure'):.2e} mbar")
+            if program.error:
+                print(f"Program stopped: {program.error}")
+        except KeyboardInterrupt:
+            print("Interrupted, switching the heater off")
+        finally:
+            if program:
+                self.executor.stop(program)
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        self.streamer.stop()
+        try:
+            self.send("set_Ue_target_value", 0)
+            self.send("operate_control", self.channel, 0)
+            self.send("run_hold_control", self.channel, 0)
+            self.send("master_mode", 0)
+        except ConnectionError as e:
+            print(f"Could not switch the heater off: {e}")
+        self.heat3_link.close()
+        if self.gauge_link:
+            self.gauge_link.close()
@@ -0,0 +1,160 @@
+import math
+import re
+import threading
+import time
+import numpy as np
+from ticker import TickScheduler
+
+ABOVE, BELOW, RATE, STALE = range(4)
+KINDS = {">": ABOVE, "<": BELOW, "rate": RATE, "stale": STALE}
+ACTIONS = ("stop", "alarm")
+
+# Default interlock of the heater (temperatures in K, pressures in mbar)
+DEFAULT_RULES = """
+temperature > 2000 : stop          # Open thermocouple reads a huge value
+temperature rate > 50 : stop       # K/s, a jump no heater can make
+pressure > 1e-5 : stop
+pressure stale 5 : stop            # No pressure for 5 s while it was being read
+temperature stale 5 : stop
+heat3_errors > 2 : stop            # Consecutive failed reads = device timeout
+gauge_errors > 2 : stop
+"""
+
+RULE_PATTERN = re.compile(r"^\s*([A-Za-z0-9_]+)\s+(>|<|rate\s*>|stale)\s*([-+0-9.eE]+)\s*(?::\s*(\w+))?\s*$")
+
+class Rule:
+    def __init__(self, channel, kind, limit, action="stop", text=None):
+        """
+        One interlock condition.
+
+        :param kind: ABOVE / BELOW (value beyond limit), RATE (|dvalue/dt| above limit
+            per second) or STALE (no sample for limit seconds, once the channel was seen)
+        :param action: "stop" switches the heater off, "alarm" only reports
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown interlock action '{action}'")
+        self.channel = channel
+        self.kind = kind
+        self.limit = float(limit)
+        self.action = action
+        self.text = text or f"{channel} {kind} {limit} : {action}"
+
+    def __repr__(self):
+        return f"Rule({self.text})"
+
+def parse_rules(text):
+    """Rules from lines 'channel > limit : action' ('<', 'rate >', 'stale'); # starts a comment."""
+    rules = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        match = RULE_PATTERN.match(line)
+        if not match:
+            raise ValueError(f"Interlock rule {number}: cannot parse '{line}'")
+        channel, kind, limit, action = match.groups()
+        kind = "rate" if kind.startswith("rate") else kind
+        rules.append(Rule(channel, KINDS[kind], limit, action or "stop", line))
+    return rules
+
+class InterlockEngine:
+    def __init__(self, rules, on_trip, watchdog_interval=0.5):
+        """
+        Alarm/interlock rules checked on every sample.
+
+        The rules are compiled into arrays (channel index, kind, limit), and each
+        channel's last two samples are kept in arrays too, so one evaluation is a
+        handful of NumPy operations over all rules at once. A watchdog thread
+        evaluates as well, so stale-data rules fire when samples stop coming.
+
+        A rule trips once and stays latched until reset(); on_trip(rule, value) is
+        called for each newly tripped rule, from the thread that fed the sample.
+        Rules are only evaluated while the engine is armed.
+
+        :param rules: List of Rule, see parse_rules
+        :param on_trip: Called as on_trip(rule, value); must act directly, not queue
+        """
+        self.rules = list(rules)
+        self.on_trip = on_trip
+        self.watchdog_interval = watchdog_interval
+        self.channels = {}
+        for rule in self.rules:
+            self.channels.setdefault(rule.channel, len(self.channels))
+        count = len(self.channels)
+        self.rule_channel = np.array([self.channels[rule.channel] for rule in self.rules], dtype=int)
+        self.rule_kind = np.array([rule.kind for rule in self.rules], dtype=int)
+        self.rule_limit = np.array([rule.limit for rule in self.rules], dtype=float)
+        self.value = np.full(count, np.nan)
+        self.time = np.full(count, np.nan)
+        self.rate = np.zeros(count)
+        self.tripped = np.zeros(len(self.rules), dtype=bool)
+        self.armed = False
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def arm(self):
+        """Start evaluating; stale timers start from now."""
+        with self.lock:
+            now = time.monotonic()
+            self.time[np.isfinite(self.time)] = now
+            self.armed = True
+
+    def disarm(self):
+        self.armed = False
+
+    def reset(self):
+        """Clear the latched trips."""
+        with self.lock:
+            self.tripped[:] = False
+
+    def update(self, channel, value, timestamp=None):
+        """Feed one sample and evaluate all rules. Channels without rules are ignored."""
+        index = self.channels.get(channel)
+        if index is None:
+            return
+        now = time.monotonic() if timestamp is None else timestamp
+        with self.lock:
+            last_time, last_value = self.time[index], self.value[index]
+            if math.isfinite(last_time) and now > last_time:
+                self.rate[index] = (value - last_value) / (now - last_time)
+            self.value[index] = value
+            self.time[index] = now
+        self.evaluate(now)
+
+    def evaluate(self, now=None):
+        """Check every rule at once; return the rules that tripped in this call."""
+        if not self.armed or not len(self.rules):
+            return []
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            value = self.value[self.rule_channel]
+            kind, limit = self.rule_kind, self.rule_limit
+            with np.errstate(invalid="ignore"):
+                violated = (((kind == ABOVE) & (value > limit))
+                            | ((kind == BELOW) & (value < limit))
+                            | ((kind == RATE) & (np.abs(self.rate[self.rule_channel]) > limit))
+                            | ((kind == STALE) & (now - self.time[self.rule_channel] > limit)))
+            new = violated & ~self.tripped
+            if not new.any():
+                return []
+            self.tripped |= new
+            tripped = [(self.rules[index], float(value[index])) for index in np.flatnonzero(new)]
+        for rule, rule_value in tripped:
+            self.on_trip(rule, rule_value)
+        return [rule for rule, _ in tripped]
+
+    def start(self):
+        """Start the watchdog thread."""
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._watchdog, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.thread = None
+
+    def _watchdog(self):
+        ticker = TickScheduler(self.watchdog_interval)
+        while ticker.wait(self._stop) is not None:
+            self.evaluate()
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), "prevac_run.journal")
+# HEAT3 driver setters journaled before they are sent; reads and anything else are not
+JOURNALED_COMMANDS = frozenset({
+    "master_mode", "operate_control", "run_hold_control", "set_heating_mode", "set_work_mode",
+    "set_input_selection_for_process_value", "set_output_signal_Ue_UcIc", "set_Ic_target_value",
+    "set_Ue_target_value", "set_Uc_limit_res_mode", "set_Ic_limit_res_mode", "set_Uc_limit_eb_mode",
+    "set_Ic_limit_eb_mode", "set_Ue_limit_eb_mode", "set_Ie_limit_eb_mode", "set_setpoint_t_mode",
+    "set_ramp_rate_t_mode", "set_ramp_rate_unit_t_mode", "set_p_parameter_t_mode",
+    "set_i_parameter_t_mode", "set_d_parameter_t_mode",
+})
+
+class RunJournal:
+    def __init__(self, path=DEFAULT_PATH, flush_interval=0.5, progress_interval=5.0):
+        """
+        Write-ahead journal of a heating run, so a run interrupted by a crash can be
+        picked up again (see load_run and reconcile).
+
+        The journal is one append-only file of JSON lines: a "begin" record with the
+        run settings, a "program" record with the steps, a "command" record for every
+        command before it is sent, "progress" records with the program position and an
+        "end" record when the run stops. Records are collected in memory and written
+        and fsync'd together every flush_interval by a writer thread, so journaling a
+        command costs a list append; begin and end are synced at once. A crash loses
+        at most the last flush_interval of records, and a torn last line is skipped
+        when reading.
+
+        :param progress_interval: Longest time between progress records while the
+            program stays in the same step and phase
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.progress_interval = progress_interval
+        self.file = None
+        self.pending = []
+        self.position = None
+        self.written_position = None
+        self.written_time = 0.0
+        self.lock = threading.Lock()        # pending records
+        self.file_lock = threading.Lock()   # writes to the file
+        self._stop = threading.Event()
+        self.thread = None
+
+    @property
+    def active(self):
+        return self.file is not None
+
+    def begin(self, **settings):
+        """Start the journal of a new run; the previous journal is kept as <path>.1."""
+        self.close()
+        if os.path.exists(self.path):
+            os.replace(self.path, self.path + ".1")
+        self.reopen()
+        self.record("begin", sync=True, **settings)
+
+    def reopen(self):
+        """Go on appending to the journal, e.g. of an interrupted run that is resumed."""
+        self.close()
+        self.file = open(self.path, "ab")
+        # Cut a line torn by the crash, so the next record starts on its own line
+        size = self.file.tell()
+        if size:
+            with open(self.path, "rb") as file:
+                file.seek(max(size - 65536, 0))
+                tail = file.read()
+            self.file.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+        self.written_position = None
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, kind, sync=False, **fields):
+        if self.file is None:
+            return
+        line = json.dumps(dict(type=kind, t=time.time(), **fields)) + "\n"
+        with self.lock:
+            self.pending.append(line)
+        if sync:
+            self.sync()
+
+    def command(self, name, args):
+        """Record a command before it is sent."""
+        self.record("command", name=name, args=list(args))
+
+    def progress(self, position):
+        """
+        Latest program position (a dict with index and phase). It is written at the
+        next flush if the step or phase changed, otherwise every progress_interval.
+        """
+        with self.lock:
+            self.position = position
+
+    def end(self, reason):
+        """Close the run: a journal ending with this record is not resumed."""
+        if self.file is None:
+            return
+        self.sync()   # Last position before the end record
+        with self.lock:
+            self.position = None
+        self.record("end", sync=True, reason=reason)
+        self.close()
+
+    def sync(self):
+        """Write the pending records and fsync the file."""
+        now = time.time()
+        with self.lock:
+            lines, self.pending = self.pending, []
+            position = self.position
+            if position is not None and (self.written_position is None
+                                         or (position["index"], position["phase"]) != self.written_position
+                                         or now - self.written_time >= self.progress_interval):
+                lines.append(json.dumps(dict(type="progress", t=now, **position)) + "\n")
+                self.written_position = (position["index"], position["phase"])
+                self.written_time = now
+        with self.file_lock:
+            if self.file is None or not lines:
+                return
+            self.file.write("".join(lines).encode())
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self._stop.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.thread = None
+        self.sync()
+        with self.file_lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        self.position = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.sync()
+            except OSError as e:
+                print(f"Error writing the run journal: {e}")
+
+def load_run(path=DEFAULT_PATH):
+    """
+    The run recorded in a journal as a dict, or None if there is no journal or its
+    run ended. Keys: settings (the begin record), steps (None before the program
+    started), position (last progress record or None), setpoint (last setpoint sent,
+    or None), last (wall-clock time of the last record).
+    """
+    if not os.path.exists(path):
+        return None
+    run = None
+    with open(path, "rb") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break   # Torn write at the crash
+            kind = record.pop("type")
+            if kind == "begin":
+                run = {"settings": record, "steps": None, "position": None, "setpoint": None}
+            elif run is None:
+                continue
+            elif kind == "program":
+                run["steps"] = record["steps"]
+            elif kind == "progress":
+                run["position"] = record
+            elif kind == "command" and record["name"] == "set_setpoint_t_mode":
+                run["setpoint"] = record["args"][-1]
+            elif kind == "end":
+                run = None
+                continue
+            run["last"] = record["t"]
+    return run
+
+def reconcile(run, device, now=None, max_gap=300.0, tolerance=0.5):
+    """
+    Decide from what HEAT3 reports whether an interrupted run can continue.
+
+    The run is resumed only if the journal is recent, the output is still on and
+    running, and the device still holds the last setpoint the journal sent; anything
+    else means the device was switched off, power cycled or changed by hand.
+
+    :param device: Dict with operate, run_hold (0/1) and setpoint (K) read from HEAT3
+    :param max_gap: Longest time in seconds since the last record to still resume
+    :param tolerance: Largest setpoint difference in K accepted as the same setpoint
+    :return: (resume, reason)
+    """
+    now = time.time() if now is None else now
+    gap = now - run["last"]
+    if gap > max_gap:
+        return False, f"the journal is {gap:.0f} s old"
+    if not device["operate"] or not device["run_hold"]:
+        return False, "the HEAT3 output is off"
+    if run["setpoint"] is not None and abs(device["setpoint"] - run["setpoint"]) > tolerance:
+        return False, f"HEAT3 holds {device['setpoint']:.1f} K, the journal sent {run['setpoint']:.1f} K"
+    return True, f"HEAT3 holds {device['setpoint']:.1f} K, {gap:.0f} s after the last record"
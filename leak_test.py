@@ -0,0 +1,186 @@
+import math
+import threading
+import time
+from statistics import NormalDist
+import numpy as np
+
+def t_quantile(probability, dof):
+    """Student t quantile (Cornish-Fisher expansion around the normal quantile, good for dof >= 3)."""
+    z = NormalDist().inv_cdf(probability)
+    if dof == math.inf:
+        return z
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    return z + g1 / dof + g2 / dof ** 2 + g3 / dof ** 3
+
+class RiseFit:
+    def __init__(self, degree=1):
+        """
+        Incremental least-squares polynomial fit of pressure against time.
+
+        Only the power sums of the normal equations are kept (sum t^k and sum t^k p,
+        plus sum p^2 for the residual), so adding a block of samples is one NumPy
+        pass over the block and a fit costs the same after ten samples or a million.
+        Times and pressures are taken relative to the first sample to keep the sums
+        well conditioned.
+
+        :param degree: 1 for a straight rise, 2 to absorb decaying outgassing
+        """
+        self.degree = degree
+        self.n = 0
+        self.t0 = None
+        self.p0 = None
+        self.scale = 1.0
+        self.time_sums = np.zeros(2 * degree + 1)
+        self.cross_sums = np.zeros(degree + 1)
+        self.square_sum = 0.0
+        self.last_time = 0.0
+
+    def add(self, times, pressures):
+        """Add arrays of samples (times in seconds, pressures in mbar)."""
+        times = np.asarray(times, dtype=float)
+        pressures = np.asarray(pressures, dtype=float)
+        valid = np.isfinite(times) & np.isfinite(pressures) & (pressures > 0)
+        times, pressures = times[valid], pressures[valid]
+        if not len(times):
+            return
+        if self.t0 is None:
+            self.t0, self.p0 = float(times[0]), float(pressures[0])
+            self.scale = self.p0
+        t = times - self.t0
+        p = (pressures - self.p0) / self.scale
+        powers = t[:, None] ** np.arange(2 * self.degree + 1)
+        self.time_sums += powers.sum(axis=0)
+        self.cross_sums += (powers[:, :self.degree + 1] * p[:, None]).sum(axis=0)
+        self.square_sum += float(p @ p)
+        self.n += len(t)
+        self.last_time = float(t[-1])
+
+    def solve(self):
+        """Coefficients (lowest order first, scaled units) and their covariance, or None."""
+        terms = self.degree + 1
+        dof = self.n - terms
+        if dof < 1:
+            return None
+        index = np.arange(terms)
+        normal = self.time_sums[index[:, None] + index[None, :]]
+        try:
+            inverse = np.linalg.inv(normal)
+        except np.linalg.LinAlgError:
+            return None
+        beta = inverse @ self.cross_sums
+        residual = max(self.square_sum - float(beta @ self.cross_sums), 0.0)
+        return beta, inverse * (residual / dof), dof
+
+    def rate(self, confidence=0.95):
+        """
+        Rise rate dP/dt in mbar/s at the latest sample and its confidence interval,
+        as (rate, low, high), or None with too few samples.
+        """
+        solution = self.solve()
+        if solution is None:
+            return None
+        beta, covariance, dof = solution
+        # Derivative of the polynomial at the last time: sum k * b_k * t^(k-1)
+        gradient = np.array([k * self.last_time ** (k - 1) if k else 0.0 for k in range(self.degree + 1)])
+        rate = float(gradient @ beta) * self.scale
+        error = math.sqrt(max(float(gradient @ covariance @ gradient), 0.0)) * self.scale
+        half_width = t_quantile(0.5 + confidence / 2, dof) * error
+        return rate, rate - half_width, rate + half_width
+
+class LeakTest:
+    def __init__(self, read_pressure, volume=None, degree=1, confidence=0.95, tolerance=0.05,
+                 stable_updates=5, min_duration=30.0, max_duration=1800.0, update_interval=0.5,
+                 on_update=None, on_finish=None):
+        """
+        Rate-of-rise leak test: with the chamber isolated, read the gauge back to back
+        as fast as it answers, fit the rise incrementally and stop once the rate is
+        known well enough.
+
+        The test has converged when the confidence interval of dP/dt is narrower than
+        tolerance (relative half width) for stable_updates updates in a row, after at
+        least min_duration seconds.
+
+        :param read_pressure: Function returning the pressure in mbar (blocking read)
+        :param volume: Chamber volume in litres; gives the leak rate Q = V dP/dt in mbar l/s
+        :param degree: Degree of the fitted rise polynomial, see RiseFit
+        :param on_update: Called as on_update(result) every update_interval from the test thread
+        :param on_finish: Called as on_finish(test) when the test ends
+        """
+        self.read_pressure = read_pressure
+        self.volume = volume
+        self.confidence = confidence
+        self.tolerance = tolerance
+        self.stable_updates = stable_updates
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.update_interval = update_interval
+        self.on_update = on_update
+        self.on_finish = on_finish
+        self.fit = RiseFit(degree)
+        self.result = None
+        self.converged = False
+        self.error = None
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        start = time.monotonic()
+        times, pressures = [], []
+        next_update = start + self.update_interval
+        stable = 0
+        try:
+            while not self._stop.is_set():
+                pressure = self.read_pressure()
+                now = time.monotonic()
+                if pressure is not None:
+                    times.append(now)
+                    pressures.append(pressure)
+                if now < next_update:
+                    continue
+                # The samples since the last update go into the fit as one block
+                next_update = now + self.update_interval
+                self.fit.add(times, pressures)
+                times, pressures = [], []
+                self.result = self.summary(now - start)
+                if self.result is None:
+                    continue
+                stable = stable + 1 if self.result["relative_error"] < self.tolerance else 0
+                self.converged = stable >= self.stable_updates and now - start >= self.min_duration
+                if self.on_update:
+                    self.on_update(self.result)
+                if self.converged or now - start >= self.max_duration:
+                    break
+        except Exception as e:
+            self.error = e
+        if self.on_finish:
+            self.on_finish(self)
+
+    def summary(self, elapsed):
+        """Current estimate as a dict, or None while the fit has too few samples."""
+        rate = self.fit.rate(self.confidence)
+        if rate is None:
+            return None
+        rate, low, high = rate
+        result = {"rate": rate, "low": low, "high": high, "samples": self.fit.n, "elapsed": elapsed,
+                  "relative_error": (high - rate) / abs(rate) if rate else math.inf}
+        if self.volume:
+            result.update(leak_rate=rate * self.volume, leak_low=low * self.volume, leak_high=high * self.volume)
+        return result
+
+def format_result(result):
+    """One-line text of a LeakTest result."""
+    text = (f"dP/dt = {result['rate']:.3e} mbar/s [{result['low']:.3e}, {result['high']:.3e}]"
+            f", {result['samples']} samples in {result['elapsed']:.0f} s")
+    if "leak_rate" in result:
+        text += f", Q = {result['leak_rate']:.3e} mbar l/s"
+    return text
@@ -1,5 +1,6 @@
 import socket
 import struct
+from supervisor import enable_tcp_keepalive
 
 class ModbusTCP:
     def __init__(self, ip_address, port = 502):
@@ -17,14 +18,16 @@ class ModbusTCP:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.settimeout(2.0)
             self.sock.connect((self.ip_address, self.port))
+            enable_tcp_keepalive(self.sock)
             print(f"Connected to {self.ip_address}:{self.port}")
+            return True
         except socket.timeout:
-            raise TimeoutError(f"Connection to {self.ip_address}:{self.port} timed out")
             self.sock = None
-            return False
+            raise TimeoutError(f"Connection to {self.ip_address}:{self.port} timed out")
         except socket.error as e:
             print(f"Failed to connect to {self.ip_address}:{self.port}: {e}")
             self.sock = None
+            return False
 
     def close(self):
         """Close the TCP connection."""
@@ -81,15 +84,38 @@ class ModbusTCP:
         try:
             self.sock.sendall(request)
             #print(request.hex())
-            response = self.sock.recv(1024)  # Buffer size is 1024 bytes
+            response = self.receive_frame(self.sock)
             #print(response.hex())
-            return response
         except socket.timeout:
             raise TimeoutError("Receiving data timed out")
-            return None
         except socket.error as e:
-            print(f"Failed to send or receive data: {e}")
-            return None
+            raise ConnectionError(f"Failed to send or receive data: {e}")
+        return response
+
+    @staticmethod
+    def receive_frame(sock):
+        """
+        Read exactly one Modbus TCP frame (MBAP header + PDU) from the socket.
+        The length field of the header tells how many bytes follow.
+        """
+        header = ModbusTCP.receive_exact(sock, 7)
+        length = int.from_bytes(header[4:6], 'big')
+        if not 2 <= length <= 254:
+            # Unit id plus a PDU of 1 to 253 bytes; anything else means the stream is lost
+            raise ConnectionError(f"Invalid Modbus TCP frame length {length}")
+        return header + ModbusTCP.receive_exact(sock, length - 1)
+
+    @staticmethod
+    def receive_exact(sock, size):
+        """Read size bytes, raising ConnectionError if the peer closes the connection."""
+        data = bytearray()
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                # An empty read means the peer closed the connection
+                raise ConnectionError("Connection closed by peer")
+            data.extend(chunk)
+        return bytes(data)
 
     def parse_response(self, response):
         """
@@ -0,0 +1,210 @@
+import socketserver
+import threading
+import time
+import argparse
+from modbusTCP import ModbusTCP
+from supervisor import ConnectionSupervisor
+
+READ_FUNCTIONS = (0x01, 0x02, 0x03, 0x04)   # Coils, inputs, holding and input registers
+SERVER_DEVICE_FAILURE = 0x04                # Modbus exception: unrecoverable error in the gateway
+GATEWAY_TARGET_FAILED = 0x0B                # Modbus exception: target device failed to respond
+
+class _Pending:
+    """A request that is on the wire; identical reads wait for its result."""
+    def __init__(self, generation):
+        self.event = threading.Event()
+        self.generation = generation
+        self.pdu = None
+        self.error = None
+
+class ModbusGateway:
+    def __init__(self, ip_address, port=502, listen_address="127.0.0.1", listen_port=5020, cache_ttl=0.1):
+        """
+        Local Modbus TCP multiplexer for one device.
+
+        Keeps a single upstream connection to the device and serves any number of
+        downstream clients (GUI, logger, interlock...) on listen_address:listen_port.
+        Identical reads are answered from a short-TTL cache or share the request
+        already in flight, so the device load does not grow with the number of clients.
+
+        :param ip_address: Device IP address
+        :param port: Device Modbus TCP port
+        :param cache_ttl: Seconds a read response may be reused (0 disables caching)
+        """
+        self.upstream = ModbusTCP(ip_address, port)
+        self.link = ConnectionSupervisor(self.upstream, name=f"Gateway {ip_address}:{port}",
+                                         probe=self.upstream.read_serial_number)
+        self.listen_address = listen_address
+        self.listen_port = listen_port
+        self.cache_ttl = cache_ttl
+
+        self.lock = threading.Lock()
+        self.cache = {}      # (unit, pdu) -> (timestamp, response pdu)
+        self.inflight = {}   # (unit, pdu) -> _Pending
+        self.generation = 0  # Bumped by every write; older reads are not cached
+        self.transaction_id = 0
+        self.server = None
+
+        # Counters to check that the device load stays constant
+        self.requests = 0
+        self.upstream_requests = 0
+        self.cache_hits = 0
+        self.shared_hits = 0
+
+    def start(self):
+        """Connect upstream and serve clients in a background thread."""
+        if not self.link.connect():
+            raise ConnectionError(f"Cannot reach {self.upstream.ip_address}:{self.upstream.port}")
+        gateway = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                gateway.serve_client(self.request)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((self.listen_address, self.listen_port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Gateway listening on {self.listen_address}:{self.listen_port}")
+
+    def stop(self):
+        """Stop serving clients and close the upstream connection."""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.link.close()
+
+    def serve_client(self, sock):
+        """Answer requests from one downstream client until it disconnects."""
+        while True:
+            try:
+                frame = ModbusTCP.receive_frame(sock)
+            except (ConnectionError, OSError):
+                return
+            # receive_frame rejects an MBAP length below 2, so the PDU is never empty
+            transaction_id = frame[0:2]
+            unit = frame[6]
+            pdu = frame[7:]
+            try:
+                response_pdu = self.request(unit, pdu)
+            except Exception as e:
+                print(f"Gateway: request failed: {e}")
+                response_pdu = bytes([pdu[0] | 0x80, SERVER_DEVICE_FAILURE])
+            reply = bytearray(transaction_id)
+            reply.extend((0).to_bytes(2, 'big'))
+            reply.extend((len(response_pdu) + 1).to_bytes(2, 'big'))
+            reply.append(unit)
+            reply.extend(response_pdu)
+            try:
+                sock.sendall(reply)
+            except OSError:
+                return
+
+    def request(self, unit, pdu):
+        """Return the response PDU for a request PDU, using the cache where possible."""
+        key = (unit, bytes(pdu))
+        if pdu[0] not in READ_FUNCTIONS:
+            # Writes always go to the device and make cached reads stale. The generation
+            # is bumped before and after, so reads that overlap the write are not cached.
+            with self.lock:
+                self.requests += 1
+                self._invalidate()
+            try:
+                return self._forward(unit, pdu)
+            finally:
+                with self.lock:
+                    self._invalidate()
+
+        with self.lock:
+            self.requests += 1
+            cached = self.cache.get(key)
+            if cached and time.monotonic() - cached[0] < self.cache_ttl:
+                self.cache_hits += 1
+                return cached[1]
+            pending = self.inflight.get(key)
+            # A read sent before the last write may return the old value, do not share it
+            owner = pending is None or pending.generation != self.generation
+            if owner:
+                pending = self.inflight[key] = _Pending(self.generation)
+            else:
+                self.shared_hits += 1
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.pdu
+
+        try:
+            pending.pdu = self._forward(unit, pdu)
+            with self.lock:
+                # Never cache exception responses or replies that a write made stale
+                if not pending.pdu[0] & 0x80 and pending.generation == self.generation:
+                    self.cache[key] = (time.monotonic(), pending.pdu)
+        except Exception as e:
+            pending.error = e   # Raised in the waiting requests too
+            raise
+        finally:
+            with self.lock:
+                if self.inflight.get(key) is pending:
+                    del self.inflight[key]
+            pending.event.set()
+        return pending.pdu
+
+    def _invalidate(self):
+        # Called with self.lock held
+        self.generation += 1
+        self.cache.clear()
+
+    def _forward(self, unit, pdu):
+        with self.lock:
+            self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+            transaction_id = self.transaction_id
+        frame = bytearray(transaction_id.to_bytes(2, 'big'))
+        frame.extend(self.upstream.protocol_id.to_bytes(2, 'big'))
+        frame.extend((len(pdu) + 1).to_bytes(2, 'big'))
+        frame.append(unit)
+        frame.extend(pdu)
+        try:
+            response = self.link.call(self._exchange, frame)
+        except ConnectionError as e:
+            print(f"Gateway: {e}")
+            return bytes([pdu[0] | 0x80, GATEWAY_TARGET_FAILED])
+        with self.lock:
+            self.upstream_requests += 1
+        return bytes(response[7:])
+
+    def _exchange(self, frame):
+        """
+        Send one upstream request. A reply with another transaction id is a late reply
+        to an earlier request (e.g. after a timeout): the stream is out of step, so it
+        is raised as a link error and the supervisor reconnects and sends again.
+        """
+        response = self.upstream.tcp_send_command(frame)
+        if response[0:2] != frame[0:2]:
+            raise ConnectionError(f"reply to transaction {int.from_bytes(response[0:2], 'big')}, "
+                                  f"expected {int.from_bytes(frame[0:2], 'big')}")
+        return response
+
+def main():
+    parser = argparse.ArgumentParser(description="Share one Modbus TCP device (e.g. MG15) between several clients.")
+    parser.add_argument("device", help="Device address as IP[:PORT]")
+    parser.add_argument("--listen", default="127.0.0.1:5020", help="Local address as IP:PORT (default 127.0.0.1:5020)")
+    parser.add_argument("--ttl", type=float, default=0.1, help="Read cache lifetime in seconds (default 0.1)")
+    args = parser.parse_args()
+
+    ip_address, _, port = args.device.partition(":")
+    listen_address, _, listen_port = args.listen.partition(":")
+    gateway = ModbusGateway(ip_address, int(port or 502), listen_address, int(listen_port or 5020), args.ttl)
+    gateway.start()
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Requests: {gateway.requests}, upstream: {gateway.upstream_requests}, "
+                  f"cached: {gateway.cache_hits}, shared: {gateway.shared_hits}")
+    except KeyboardInterrupt:
+        gateway.stop()
+
+if __name__ == "__main__":
+    main()
@@ -4,26 +4,70 @@ from tkinter import font as tkFont
 from tkinter import filedialog
 import threading
 import time
-import numpy as np
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-from prevacv2TCP import prevacV2TCP
+import math
+import os
+import secrets
+import sys
+import importlib.util
+
+def lazy_import(name):
+    """
+    Return a module that is only executed on first attribute access, for modules
+    that need NumPy at import time and are only used on demand.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+# Matplotlib is imported in create_plot, once the window is on screen
+archive = lazy_import("archive")
+viewer = lazy_import("viewer")
+autotune = lazy_import("autotune")
+acquisition = lazy_import("acquisition")
+leak_test = lazy_import("leak_test")
+analytics = lazy_import("analytics")
+interlock = lazy_import("interlock")
+remote_server = lazy_import("remote_server")
+sample_bus = lazy_import("sample_bus")
+
+from prevacv2TCP import prevacV2TCP, PARAMETER_FILE
 from modbusTCP import ModbusTCP
 from xgs600 import XGS600Controller
-import threading
+from supervisor import ConnectionSupervisor
+from device_cache import DeviceMetadataCache
+from sample_store import SampleStore
+from program import Step, RampSoakProgram, ProgramExecutor, steps_from_segments
+from journal import JOURNALED_COMMANDS, RunJournal, load_run, reconcile
+from recipe import compile_file, RecipeError
+from degas import DegasController
+from trajectory import PROFILES, SetpointStreamer, peak_rate_factor
+from gain_schedule import GainSchedule, GainScheduler
+from telemetry import ELECTRICAL_CHANNELS, derive_power, TelemetryPlan
+from ticker import TickScheduler
 from queue import Queue, Empty
-import time
-import random
-from itertools import zip_longest
-from matplotlib.ticker import FuncFormatter, MaxNLocator, MultipleLocator
 
 def on_closing():
-    plt.close('all')  # Close all matplotlib plots
+    if "matplotlib.pyplot" in sys.modules:
+        sys.modules["matplotlib.pyplot"].close('all')  # Close all matplotlib plots
+    if app.archive:
+        app.archive.close()
+    if app.remote_server:
+        app.remote_server.stop()
+    app.journal.close()   # A run still going is resumed at the next start
     root.destroy()
 
 class CommunicationError(Exception):
     pass
 
+class CommunicationTimeout(CommunicationError):
+    """The HEAT3 communication thread itself stopped answering."""
+
 # Main class for the heating control system GUI
 class HeatingControlApp:
     def __init__(self, root):
@@ -36,21 +80,44 @@ class HeatingControlApp:
         self.mg15 = None
         self.xgs600 = None
 
+        # Supervisors keep each driver connected and retry requests across short outages
+        self.heat3_link = None
+        self.mg15_link = None
+        self.xgs600_link = None
+        self.retry_window = 10.0
+        self.command_timeout = self.retry_window + 2
+        # HEAT3 acquisition in its own process, publishing into a shared-memory sample bus
+        self.acquisition_process = tk.BooleanVar(value=False)
+        self.bus_reader = None
+        # WebSocket server streaming the samples and taking commands with the token
+        self.remote_enabled = tk.BooleanVar(value=False)
+        self.remote_server = None
+        self.remote_host = os.environ.get("PREVAC_REMOTE_HOST", "127.0.0.1")
+        self.remote_port = 8765
+        self.remote_token = os.environ.get("PREVAC_REMOTE_TOKEN")
+        # Accepted range of the value of remote set commands, in HEAT3 units
+        self.remote_ranges = {"set_setpoint_t_mode": (1.0, 1500.0),     # K
+                              "set_ramp_rate_t_mode": (0.1, 100.0),     # K/min
+                              "set_p_parameter_t_mode": (0.0, 1000.0),
+                              "set_i_parameter_t_mode": (0.0, 10000.0),
+                              "set_d_parameter_t_mode": (0.0, 10000.0)}
+
+        # Product and serial numbers are cached on disk per device and firmware version
+        self.device_cache = DeviceMetadataCache()
+
         self.arial14 = tkFont.Font(family='Arial', size=14)
         self.arial18 = tkFont.Font(family='Arial', size=18)
 
         # Variables for server IPs and Ports
         self.heat3_channel = 1
         self.time_interval = 0.25
-        self.time_sleep = 0.2
-        self.temp_step = 5
         self.heat3_ip = tk.StringVar(value="192.168.236.50")
         self.heat3_port = tk.IntVar(value=502)
         self.mg15_ip = tk.StringVar(value="127.0.0.1")
         self.mg15_port = tk.IntVar(value=502)
         self.xgs600_add = tk.StringVar(value="00")
         self.xgs600_port = tk.StringVar(value="COM1")
-        self.xgs600_port_array = ["COM1", "COM2", "COM3", "COM4", "COM5", "COM6", "COM7", "COM8"]
+        self.xgs600_port_array = ["COM1", "COM2", "COM3", "COM4", "COM5", "COM6", "COM7", "COM8", "COM9"]
 
         self.mode_array = ["Auto", "Manual"];
         self.ic_ue_options = ["Ic", "Ue"]
@@ -76,6 +143,7 @@ class HeatingControlApp:
         self.i_value = tk.StringVar(value="20")
         self.d_value = tk.StringVar(value="3")
         self.num_segments_value = tk.StringVar(value="1")
+        self.ramp_profile_value = tk.StringVar(value=PROFILES[0])
         self.repeat_value = tk.StringVar(value="0") # widget accepts string
         self.sp_values = []
         self.t_values = []
@@ -89,12 +157,46 @@ class HeatingControlApp:
         self.ue_limit_value = tk.StringVar(value="1000")
         self.plot_txt_size = 14
         self.toggle_buttons = {}
+
+        # Worker threads publish floats to the sample store; the Tk variables above
+        # are only display copies, refreshed from the store on the Tk thread
+        self.state = SampleStore()
+        # Every sample is also appended to the on-disk archive (temperatures in K),
+        # opened with the first sample
+        self.archive = None
+        self.archive_lock = threading.Lock()
+        self.clock_offset = time.time() - time.monotonic()
+        self.gui_refresh_ms = 100
+        self.plot_delay_ms = 50
+        self.display_vars = {
+            "temperature": (self.temp_value, ".1f"),
+            "pressure": (self.pressure_value, ".2e"),
+            "uc": (self.uc_value, ".2f"),
+            "ic": (self.ic_value, ".2f"),
+            "ue": (self.ue_value, ".1f"),
+            "ie": (self.ie_value, ".1f"),
+        }
+        self.displayed = {}
+        self.unit = self.unit_value.get()
+        self.unit_value.trace_add("write", lambda *args: setattr(self, "unit", self.unit_value.get()))
     
         # Initial empty data for x and y axes
         self.x_temp = []
         self.y_temp = []
         self.x_pressure = []
         self.y_pressure = []
+        # Electrical readings aligned with x_temp, NaN where a channel was not read
+        self.telemetry = {channel: [] for channel in ELECTRICAL_CHANNELS}
+        self.telemetry_seen = {}
+        # Each HEAT3 signal is read at its own interval, temperature every time_interval
+        self.telemetry_plan = TelemetryPlan({"temperature": self.time_interval})
+        # Running [min, max] of the plotted data, so autoscaling does not rescan the history
+        self.temp_range = [math.inf, -math.inf]
+        self.pressure_range = [math.inf, -math.inf]
+        # Plot times are sample timestamps (tick deadlines) minus the first one
+        self.time_origin = None
+        self.plotted = {}
+        self.pressure_log = tk.BooleanVar(value=True)
 
         self.command_queue = Queue()
 
@@ -108,6 +210,42 @@ class HeatingControlApp:
 
         self.run_thread = None
         self.running = False
+        self.executor = ProgramExecutor(self.state)
+        self.program = None
+        self.recipe = None
+        # Write-ahead journal of the run, to resume it after a crash
+        self.journal = RunJournal()
+        self.degas_enabled = False
+        # Host-side ramps stream setpoints at stream_rate updates per second
+        self.stream_rate = 2.0
+        self.ramp_margin = 1.5  # Firmware ramp limit relative to the steepest streamed slope
+        self.streamer = SetpointStreamer(self.stream_setpoint, update_rate=self.stream_rate)
+        # PID gains per heating mode and setpoint band, filled by the autotune
+        self.gain_schedule = GainSchedule()
+        self.gain_entry = None      # Schedule band whose gains are on HEAT3
+        self.gain_hysteresis = 10.0  # K beyond a band edge before switching gains
+        self.autotune = None
+        self.autotune_setpoints = []   # Bands still to tune, see start_autotune
+        self.autotune_amplitude = 0.2  # Relay amplitude as a fraction of the output limit
+        self.leak_test = None
+        self.gauge_paused = threading.Event()   # Set while a leak test reads the gauge itself
+        self.chamber_volume = None     # Litres; set it to get the leak rate in mbar l/s
+        self.leak_result = tk.StringVar(value="")
+        # Rolling temperature/pressure analytics, started with the first device
+        self.analytics_stage = None
+        self.analytics_period = 1.0
+        self.analytics_rows = []
+        self.analytics_text = tk.StringVar(value="")
+        # Interlock rules checked on every sample, armed while the heater runs.
+        # interlock.txt next to this file replaces the default rules.
+        self.interlock = None
+        self.interlock_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interlock.txt")
+        self.read_errors = {"heat3_errors": 0, "gauge_errors": 0}
+        # Degas runs as a stage of the pressure acquisition loop of whichever gauge is connected
+        self.degas = DegasController(self.post_degas_setpoint)
+        self.update_degas_limits()
+        self.pressure_base_value.trace_add("write", self.update_degas_limits)
+        self.pressure_limit_value.trace_add("write", self.update_degas_limits)
         
         self.create_widgets()
         self.plot_data = []
@@ -115,6 +253,16 @@ class HeatingControlApp:
         # Update the UI based on initial mode selections
         self.update_mode_settings()
         self.update_heating_settings()
+        self.refresh_display()
+
+    def refresh_display(self):
+        """Copy new samples from the store into the display variables at a fixed rate."""
+        for channel, sample in self.state.snapshot().items():
+            if channel in self.display_vars and self.displayed.get(channel) != sample[0]:
+                self.displayed[channel] = sample[0]
+                var, fmt = self.display_vars[channel]
+                var.set(format(sample[1], fmt))
+        self.root.after(self.gui_refresh_ms, self.refresh_display)
 
     def heat3_communication_thread(self):
         """Thread dedicated to handling all TCP/IP communication with heat3."""
@@ -122,32 +270,65 @@ class HeatingControlApp:
         while self.heat3_connected:
             try:
                 command, args, kwargs, response_queue = self.command_queue.get(timeout=2)
-                result = command(*args, **kwargs)
+                self.journal_command(command, args)
+                try:
+                    result = self.heat3_link.call(command, *args, **kwargs)
+                except Exception as e:
+                    result = e  # Handed back to send_command, which raises it in the caller
                 if response_queue:
                     response_queue.put(result)
             except Empty:
                 continue  # No command in queue, continue loop
 
-    def send_command(self, command, *args, **kwargs):
+    def post_command(self, command, *args, **kwargs):
+        """Queue a command for heat3 without waiting for its response."""
+        self.command_queue.put((command, args, kwargs, None))
+
+    def call_heat3(self, command, *args, **kwargs):
+        """
+        Run a HEAT3 command on the communication thread and return its result. Errors
+        are raised as CommunicationError without touching the run or the window;
+        send_command adds that for the run's own commands.
+        """
         response_queue = Queue()
         self.command_queue.put((command, args, kwargs, response_queue))
         try:
-            return response_queue.get(timeout=2)
+            result = response_queue.get(timeout=self.command_timeout)
         except Empty:
-            if self.running:
-                self.running = False
-                self.start_pause_button.config(text="Stop", bg="red")
-                self.enable_controls()  # Re-enable Mode and Heating selection
+            raise CommunicationTimeout("Timeout during TCP/IP communication.")
+        if isinstance(result, Exception):
+            raise CommunicationError(str(result))
+        return result
 
+    def send_command(self, command, *args, **kwargs):
+        try:
+            return self.call_heat3(command, *args, **kwargs)
+        except CommunicationTimeout:
+            # The communication thread itself stopped answering
+            self.running = False
             self.heat3_connected = False
             self.heat3_thread_running = False
+            self.root.after(0, self.heat3_lost)
+            raise
+        except CommunicationError:
+            # The supervisor gave up after its retry window (it keeps reconnecting in
+            # the background) or the device refused the command: only the current run
+            # is stopped.
+            if self.running:
+                self.running = False
+                self.root.after(0, self.run_stopped)
+            raise
 
-            # Clear product and serial numbers
-            self.heat3_product_label.config(text="")
-            self.heat3_serial_label.config(text="")
-            self.toggle_buttons["HEAT3-PS IP:"].config(text="Disconnect", bg="red")
+    def run_stopped(self):
+        self.start_pause_button.config(text="Stop", bg="red")
+        self.enable_controls()  # Re-enable Mode and Heating selection
 
-            raise CommunicationError("Timeout during TCP/IP communication.")
+    def heat3_lost(self):
+        self.run_stopped()
+        # Clear product and serial numbers
+        self.heat3_product_label.config(text="")
+        self.heat3_serial_label.config(text="")
+        self.toggle_buttons["HEAT3-PS IP:"].config(text="Disconnect", bg="red")
 
     def create_widgets(self):
         # First row: HEAT3-PS IP and Port input with connect/disconnect button
@@ -158,6 +339,8 @@ class HeatingControlApp:
         self.heat3_product_label.grid(row=0, column=4, padx=5, sticky=tk.W)
         self.heat3_serial_label = tk.Label(self.root, text="", font=self.arial14)
         self.heat3_serial_label.grid(row=0, column=5, padx=5, sticky=tk.W)
+        tk.Checkbutton(self.root, text="Own process", font=self.arial14,
+                       variable=self.acquisition_process).grid(row=0, column=6, padx=5, sticky=tk.W)
 
         # Second row: MG15 IP and Port input with connect/disconnect button
         self.add_row_label_input_toggle_button(1, "MG15         IP:", self.mg15_ip, self.mg15_port, self.toggle_mg15_connection)
@@ -167,6 +350,8 @@ class HeatingControlApp:
         self.mg15_product_label.grid(row=1, column=4, padx=5, sticky=tk.W)
         self.mg15_serial_label = tk.Label(self.root, text="", font=self.arial14)
         self.mg15_serial_label.grid(row=1, column=5, padx=5, sticky=tk.W)
+        tk.Checkbutton(self.root, text="Remote", font=self.arial14, variable=self.remote_enabled,
+                       command=self.toggle_remote).grid(row=1, column=6, padx=5, sticky=tk.W)
 
         # Third row: XGS-600 Address and Port input with connect/disconnect button
         self.add_second_row(2, "XGS-600 Add:", self.xgs600_add, self.xgs600_port, self.toggle_xgs600_connection)
@@ -223,8 +408,23 @@ class HeatingControlApp:
     def toggle_heat3_connection(self, button):
         if not self.heat3_connected:
             # Connect
-            self.heat3 = prevacV2TCP(self.heat3_ip.get(), self.heat3_port.get())
-            if self.heat3.connect():
+            try:
+                self.heat3 = prevacV2TCP(self.heat3_ip.get(), self.heat3_port.get())
+            except (OSError, ValueError) as e:
+                messagebox.showerror("HEAT3-PS", f"Cannot load the HEAT3-PS parameter table: {e}")
+                return
+            if not self.heat3.verified:
+                messagebox.showwarning("HEAT3-PS", "The HEAT3-PS function codes are not verified against the "
+                                       "protocol manual, so the heater can only be read, not controlled. "
+                                       f"Provide {os.path.basename(PARAMETER_FILE)} next to prevacv2TCP.py.")
+            if self.acquisition_process.get():
+                # The process owns the connection; self.heat3 only names the commands
+                self.heat3_link = acquisition.AcquisitionProcess(self.heat3_ip.get(), self.heat3_port.get(),
+                                                                 retry_window=self.retry_window)
+            else:
+                self.heat3_link = ConnectionSupervisor(self.heat3, name="HEAT3-PS", probe=self.heat3.r_serial_number,
+                                                       on_reconnect=self.heat3.register_new_host, retry_window=self.retry_window)
+            if self.heat3_link.connect():
 
                 # Start the HEAT3-PS reading thread
                 self.x_temp = []
@@ -232,21 +432,30 @@ class HeatingControlApp:
                 self.x_temp.clear()
                 self.y_temp.clear()
                 self.temp_line.set_data([], [])
+                self.temp_range = [math.inf, -math.inf]
+                self.telemetry = {channel: [] for channel in ELECTRICAL_CHANNELS}
+                self.telemetry_seen = {}
                 self.heat3_connected = True
                 self.heat3_thread_running = True
                 self.comm_thread = threading.Thread(target=self.heat3_communication_thread)
                 self.comm_thread.start()
-                self.heat3_thread = threading.Thread(target=self.read_heat3_data)
+                if isinstance(self.heat3_link, ConnectionSupervisor):
+                    self.heat3_thread = threading.Thread(target=self.read_heat3_data)
+                else:
+                    self.bus_reader = sample_bus.BusReader(self.heat3_link.bus, self.bus_sample)
+                    self.bus_reader.start()
+                    self.heat3_thread = threading.Thread(target=self.sync_heat3_reads)
                 self.heat3_thread.start()
                 #self.schedule_read_heat3_data()
 
-                product_number = self.send_command(self.heat3.r_product_number)
-                serial_number  = self.send_command(self.heat3.r_serial_number)
-                self.heat3_product_label.config(text=f"{product_number}")
-                self.heat3_serial_label.config(text=f"{serial_number}")
-                self.send_command(self.heat3.register_new_host)
+                # Identity reads run in the background so the window stays responsive
+                cache_key = DeviceMetadataCache.tcp_key(self.heat3_ip.get(), self.heat3_port.get())
+                threading.Thread(target=self.load_heat3_identity, args=(cache_key,), daemon=True).start()
 
                 button.config(text="Connected", bg="green")
+                self.update_write_controls()
+                self.start_analytics()
+                self.start_interlock()
                 self.create_plot()
         else:
             if self.running:
@@ -261,15 +470,28 @@ class HeatingControlApp:
             self.heat3_product_label.config(text="")
             self.heat3_serial_label.config(text="")
             button.config(text="Disconnect", bg="red")
+            self.update_write_controls()
             # Disconnect
-            #if self.heat3:
-            #    self.heat3.close()
+            if self.bus_reader:
+                self.bus_reader.stop()
+                self.bus_reader = None
+            if self.heat3_link:
+                self.heat3_link.close()
+
+    def update_write_controls(self):
+        """Start and Autotune write to HEAT3, so they are disabled while its writes are refused."""
+        verified = not self.heat3_connected or self.heat3.verified
+        state = "normal" if verified else "disabled"
+        self.start_pause_button.config(state=state)
+        self.autotune_button.config(state=state)
 
     def toggle_mg15_connection(self, button):
         if not self.mg15_connected:
             # Connect
             self.mg15 = ModbusTCP(self.mg15_ip.get(), self.mg15_port.get())
-            if self.mg15.connect():
+            self.mg15_link = ConnectionSupervisor(self.mg15, name="MG15", probe=self.mg15.read_serial_number,
+                                                  retry_window=self.retry_window)
+            if self.mg15_link.connect():
                 self.toggle_buttons["XGS-600 Add:"].config(state="disabled")
                 
                 # Start the MG15 reading thread
@@ -277,38 +499,101 @@ class HeatingControlApp:
                 self.mg15_thread = threading.Thread(target=self.read_mg15_data)
                 self.mg15_thread.start()
 
-                product_number = self.mg15.read_product_number()
-                serial_number = self.mg15.read_serial_number()
-                self.mg15_product_label.config(text=f"{product_number}")
-                self.mg15_serial_label.config(text=f"{serial_number}")
+                cache_key = DeviceMetadataCache.tcp_key(self.mg15_ip.get(), self.mg15_port.get())
+                threading.Thread(target=self.load_mg15_identity, args=(cache_key,), daemon=True).start()
                 button.config(text="Connected", bg="green")
+                self.start_analytics()
+                self.start_interlock()
                 self.mg15_connected = True
         else:
             self.mg15_stop()
-            #if self.mg15:
-            #    self.mg15.close()
+
+    def load_heat3_identity(self, cache_key):
+        """
+        Read product/serial number through the device cache and register as host,
+        then look for an interrupted run: recovery only starts once this host is
+        registered, so its reads and commands never interleave with the handshake.
+        """
+        try:
+            firmware = self.send_command(self.heat3.r_firmware_version)
+            identity = self.device_cache.read_through(cache_key, firmware, {
+                "product_number": lambda: self.send_command(self.heat3.r_product_number),
+                "serial_number": lambda: self.send_command(self.heat3.r_serial_number),
+            })
+            self.send_command(self.heat3.register_new_host)
+        except CommunicationError as e:
+            print(f"Error reading HEAT3-PS identity: {e}")
+            return
+        self.root.after(0, lambda: self.heat3_product_label.config(text=f"{identity['product_number']}"))
+        self.root.after(0, lambda: self.heat3_serial_label.config(text=f"{identity['serial_number']}"))
+        self.recover_run()
+
+    def load_mg15_identity(self, cache_key):
+        """Read the MG15 product number through the device cache."""
+        try:
+            # No firmware register is read from the MG15, the serial number
+            # identifies the unit and validates the cached entry instead
+            serial_number = self.mg15_link.call(self.mg15.read_serial_number)
+            identity = self.device_cache.read_through(cache_key, serial_number, {
+                "product_number": lambda: self.mg15_link.call(self.mg15.read_product_number),
+            })
+        except ConnectionError as e:
+            print(f"Error reading MG15 identity: {e}")
+            return
+        self.root.after(0, lambda: self.mg15_product_label.config(text=f"{identity['product_number']}"))
+        self.root.after(0, lambda: self.mg15_serial_label.config(text=f"{serial_number}"))
 
     def toggle_xgs600_connection(self, button):
         if not self.xgs600_connected:
-            self.xgs600 = XGS600Controller(self.xgs600_add.get(), self.xgs600_port.get())
-            if self.xgs600.connect():
+            port = self.find_xgs600_port()
+            if port is None:
+                button.config(text="Disconnect", bg="red")
+                return
+            self.xgs600_port.set(port)
+            self.xgs600 = XGS600Controller(self.xgs600_add.get(), port)
+            self.xgs600_link = ConnectionSupervisor(self.xgs600, name="XGS-600", probe=self.xgs600.read_sw_version,
+                                                    retry_window=self.retry_window)
+            if self.xgs600_link.connect():
                 self.toggle_buttons["MG15         IP:"].config(state="disabled")
                 self.x_pressure = []
                 self.y_pressure = []
                 self.x_pressure.clear()
                 self.y_pressure.clear()
                 self.pressure_line.set_data([], [])
+                self.pressure_range = [math.inf, -math.inf]
                 self.xgs600_thread_running = True
                 self.xgs600_thread = threading.Thread(target=self.read_xgs600_data)
                 self.xgs600_thread.start()
 
-                sw_version = self.xgs600.read_sw_version()
+                sw_version = self.xgs600_link.call(self.xgs600.read_sw_version)
                 self.xgs600_sw_version_label.config(text=f"{sw_version}")
                 button.config(text="Connected", bg="green")
+                self.start_analytics()
+                self.start_interlock()
                 self.xgs600_connected = True
         else:
             self.xgs600_stop()
 
+    def find_xgs600_port(self):
+        """Return the first serial port with an XGS-600 answering, trying the selected one first."""
+        import serial.tools.list_ports
+        available_ports = [port.device for port in serial.tools.list_ports.comports()]
+        selected_port = self.xgs600_port.get().strip()
+        ports_to_try = [selected_port] if selected_port in available_ports else []
+        ports_to_try += [port for port in available_ports if port != selected_port]
+        for port in ports_to_try:
+            probe = XGS600Controller(self.xgs600_add.get(), port, timeout=1)
+            try:
+                probe.connect()
+                if probe.read_sw_version():
+                    return port
+            except Exception:
+                continue
+            finally:
+                probe.disconnect()
+        print("No XGS-600 device found on any COM port.")
+        return None
+
     def add_third_row(self):
         tk.Label(self.root, text="Working Mode:", font=self.arial14).grid(row=3, column=0, sticky=tk.W)
 
@@ -372,7 +657,15 @@ class HeatingControlApp:
         self.pressure_display.grid(row=4, column=5, padx=0, sticky='e')
         tk.Label(self.root, text="mbar", font=self.arial18).grid(row=4, column=6, sticky=tk.W)
 
+        tk.Checkbutton(self.root, text="Log", font=self.arial14, variable=self.pressure_log, command=self.toggle_pressure_log).grid(row=4, column=7, sticky=tk.W)
+
     def toggle_degas(self):
+        self.degas_enabled = bool(self.degas_var.get())
+        if not self.degas_enabled and self.degas.reduction:
+            # Return to the program setpoint when degas is switched off mid-run
+            self.post_degas_setpoint(self.degas.program_setpoint)
+        if not self.degas_enabled:
+            self.degas.reset()
         if self.degas_var.get():
             self.pressure_limit.config(state="normal")
             self.pressure_base.config(state="normal")
@@ -411,6 +704,13 @@ class HeatingControlApp:
         self.repeat_entry = tk.Entry(self.pid_frame, font=self.arial14, width=5, textvariable=self.repeat_value)
         self.repeat_entry.grid(row=1, column=3, padx=5, sticky=tk.W)
 
+        tk.Label(self.pid_frame, text="Ramp:", font=self.arial14).grid(row=2, column=0, sticky=tk.E)
+        self.ramp_profile = ttk.Combobox(self.pid_frame, font=self.arial14, values=PROFILES, width=8, textvariable=self.ramp_profile_value)
+        self.ramp_profile.grid(row=2, column=1, columnspan=2, padx=5, sticky=tk.W)
+
+        self.autotune_button = tk.Button(self.pid_frame, text="Autotune", font=self.arial14, command=self.start_autotune)
+        self.autotune_button.grid(row=2, column=3, columnspan=3, padx=5, sticky=tk.W)
+
         # Second Column (Manual Control Inputs)
         self.manual_frame = tk.LabelFrame(self.fourth_row_frame, text="Manual Control", font=self.arial14)
         self.manual_frame.grid(row=0, column=1, padx=10, sticky=tk.W)
@@ -428,18 +728,8 @@ class HeatingControlApp:
         self.uc_display.grid(row=0, column=4, padx=5)
         tk.Label(self.manual_frame, text="V", font=self.arial14).grid(row=0, column=5, sticky=tk.W)
 
-        # Second row in manual frame
-        tk.Label(self.manual_frame, text="Ie:", font=self.arial14)
-        self.ie_display = tk.Label(self.manual_frame, font=self.arial14, width=6, textvariable=self.ie_value)
-        #self.ie_display.grid(row=0, column=4, padx=5, sticky=tk.W)
-        tk.Label(self.manual_frame, text="mA", font=self.arial14)
-
-        tk.Label(self.manual_frame, text="Ue:", font=self.arial14)
-        self.ue_entry = tk.Entry(self.manual_frame, font=self.arial14, width=6, textvariable=self.ue_value)
-        self.ue_entry.bind("<MouseWheel>", self.change_ue_value)
-        self.ue_entry.bind("<Return>", self.ue_value_entered)  # Bind keyboard "Enter" for Ic entry
-        self.ue_entry.bind("<FocusOut>", self.ue_value_entered)
-        tk.Label(self.manual_frame, text="V", font=self.arial14)
+        # The EB rows (Ie/Ue) are built the first time EB heating is selected
+        self.eb_widgets = None
 
         # Third Column (Limit Control Inputs)
         self.limit_frame = tk.LabelFrame(self.fourth_row_frame, text="Limit", font=self.arial14)
@@ -458,19 +748,6 @@ class HeatingControlApp:
         self.uc_limit_entry.bind("<Return>", self.uc_limit_value_entered)
         self.uc_limit_entry.bind("<FocusOut>", self.uc_limit_value_entered)
         tk.Label(self.limit_frame, text="V", font=self.arial14).grid(row=0, column=5, sticky=tk.W)
-
-        # Second row in manual frame
-        tk.Label(self.limit_frame, text="Ie:", font=self.arial14)
-        self.ie_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.ie_limit_value)
-        self.ie_limit_entry.bind("<Return>", self.ie_limit_value_entered)
-        self.ie_limit_entry.bind("<FocusOut>", self.ie_limit_value_entered)
-        tk.Label(self.limit_frame, text="mA", font=self.arial14)
-
-        tk.Label(self.limit_frame, text="Ue:", font=self.arial14)
-        self.ue_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.ue_limit_value)
-        self.ue_limit_entry.bind("<Return>", self.ue_limit_value_entered)
-        self.ue_limit_entry.bind("<FocusOut>", self.ue_limit_value_entered)
-        tk.Label(self.limit_frame, text="V", font=self.arial14)
         # Place these widgets conditionally based on Heating mode
         #self.update_heating_settings()
         
@@ -546,7 +823,7 @@ class HeatingControlApp:
 
     def ie_limit_value_entered(self, event):
         try:
-            new_value = float(self.ie_limit_value.get())  # Get the new value from the entry
+            new_value = float(self.ie_limit_value.get())  # Get the new value from the entry (mA)
             if self.running and self.heat3_thread_running:
                 self.send_command(self.heat3.set_Ie_limit_eb_mode, new_value)
         except ValueError:
@@ -564,13 +841,17 @@ class HeatingControlApp:
         try:
             sp_value = float(self.sp_values[0].get())  # Get the new value from the entry
             t_value = self.t_values[0].get()
-            current_temperature = self.temp_value.get()
+            current_temperature = self.state.get("temperature")
             diff = sp_value - current_temperature
             ramp = abs(diff)/t_value
   
             if self.running and self.heat3_thread_running:   
-                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))         
-                self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
+                profile = self.ramp_profile_value.get()
+                if profile != "firmware" and diff != 0:
+                    self.stream_ramp(profile, current_temperature, sp_value, t_value * 60)
+                else:
+                    self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
+                    self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
         except ValueError:
             print("Invalid input for free value. Please enter a valid number.")
 
@@ -578,7 +859,7 @@ class HeatingControlApp:
         try:
             sp_value = float(self.sp_values[0].get())  # Get the new value from the entry
             t_value = self.t_values[0].get()
-            current_temperature = self.temp_value.get()
+            current_temperature = self.state.get("temperature")
             diff = sp_value - current_temperature
             ramp = abs(diff)/t_value
   
@@ -633,6 +914,10 @@ class HeatingControlApp:
                 widget.grid_remove()
             for widget in self.limit_frame.grid_slaves(row=1):
                 widget.grid_remove()
+        elif self.eb_widgets is not None:
+            # Show the Ie and Ue inputs again, grid_remove kept their placement
+            for widget in self.eb_widgets:
+                widget.grid()
         else:
             # Show Ie and Ue inputs
             tk.Label(self.manual_frame, text="Ie:", font=self.arial14).grid(row=1, column=0, sticky=tk.W)
@@ -662,6 +947,7 @@ class HeatingControlApp:
             self.ue_limit_entry.bind("<FocusOut>", self.ue_limit_value_entered)   
             self.ue_limit_entry.grid(row=1, column=4, padx=0)
             tk.Label(self.limit_frame, text="V", font=self.arial14).grid(row=1, column=5, sticky=tk.W)
+            self.eb_widgets = self.manual_frame.grid_slaves(row=1) + self.limit_frame.grid_slaves(row=1)
 
         if mode == "Auto":
             # If in Auto mode, ensure manual frame is disabled
@@ -744,10 +1030,14 @@ class HeatingControlApp:
         self.plot_frame = tk.Frame(self.root)
         self.plot_frame.grid(row=7, column=0, columnspan=8, sticky="w")
 
-        # Call the create_plot function to initialize the plot
-        self.create_plot()
+        # Build the plot once the window is shown: it pulls in Matplotlib and NumPy,
+        # which take most of the startup time
+        self.root.after(self.plot_delay_ms, self.create_plot)
 
     def create_plot(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         # Create a larger figure for the plot
         self.fig, self.ax = plt.subplots(figsize=(12, 6))  # Adjust size as needed
         self.ax.set_title('Real-Time Plot', fontsize=self.plot_txt_size)
@@ -775,6 +1065,8 @@ class HeatingControlApp:
         # Initialize Line2D objects for temperature and pressure
         self.temp_line, = self.ax.plot([], [], color='tomato')  # Set line color to orange
         self.pressure_line, = self.ax_pressure.plot([], [], color='cornflowerblue')  # Set line color to blue
+        if self.pressure_log.get():
+            self.ax_pressure.set_yscale('log')  # UHV pressures span many decades
 
         # Set up the canvas for embedding the plot in the Tkinter window
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
@@ -782,50 +1074,98 @@ class HeatingControlApp:
 
     def update_plot_temp(self):
         if self.heat3_connected and self.heat3_thread_running:  # Only update the plot if connected to HEAT3-PS
-            # Append the current time and temperature to the data
-            if self.xgs600_thread_running and len(self.x_pressure) > len(self.x_temp):
-                current_time = self.x_pressure[len(self.x_pressure)-1]
-            else:
-                if len(self.x_temp) == 0:
-                    current_time = 0
-                else:  
-                    current_time = self.x_temp[len(self.x_temp)-1] + self.time_interval 
-                self.update_time_scale(current_time)
-                self.update_xlim(current_time)
-          
-            current_temp = self.temp_value.get()
+            # Append the sample time and temperature to the data
+            sample = self.state.sample("temperature")
+            if sample is None or sample[0] == self.plotted.get("temperature"):
+                return
+            self.plotted["temperature"] = sample[0]
+            current_time = self.plot_time(sample[0])
+            self.update_time_scale(current_time)
+            self.update_xlim(current_time)
+            current_temp = sample[1]
 
             self.x_temp.append(current_time)
             self.y_temp.append(current_temp)
+            for channel, values in self.telemetry.items():
+                # Only a reading newer than the last row is logged, a stale one is NaN
+                sample = self.state.sample(channel)
+                fresh = sample is not None and sample[0] != self.telemetry_seen.get(channel)
+                values.append(sample[1] if fresh else math.nan)
+                if fresh:
+                    self.telemetry_seen[channel] = sample[0]
             self.temp_line.set_data(self.x_temp, self.y_temp)
-            self.ax.relim()
-            self.ax.autoscale_view()
+            if self.track_range(self.temp_range, current_temp):
+                self.set_ylim(self.ax, self.temp_range)
             self.canvas.draw()
 
     def update_plot_pressure(self):
         if self.xgs600_connected and self.xgs600_thread_running:  # Only update the plot if connected to HEAT3-PS
-            # Append the current time and temperature to the data
-            if self.heat3_thread_running and len(self.x_temp) > len(self.x_pressure):
-                current_time = self.x_temp[len(self.x_temp)-1]
-            else:
-                if len(self.x_pressure) == 0: 
-                    current_time = 0
-                else:
-                    current_time = self.x_pressure[len(self.x_pressure)-1] + self.time_interval
-                self.update_time_scale(current_time)
-                self.update_xlim(current_time)
-            #current_time = len(self.x_pressure) * self.time_interval
-            current_pressure = self.pressure_value.get()
+            # Append the sample time and pressure to the data
+            sample = self.state.sample("pressure")
+            if sample is None or sample[0] == self.plotted.get("pressure"):
+                return
+            self.plotted["pressure"] = sample[0]
+            current_time = self.plot_time(sample[0])
+            self.update_time_scale(current_time)
+            self.update_xlim(current_time)
+            current_pressure = sample[1]
 
             self.x_pressure.append(current_time)
             self.y_pressure.append(current_pressure)
             self.pressure_line.set_data(self.x_pressure, self.y_pressure)
-            self.ax_pressure.relim()
-            self.ax_pressure.autoscale_view()
+            if self.track_range(self.pressure_range, current_pressure, self.pressure_log.get()):
+                self.set_ylim(self.ax_pressure, self.pressure_range, self.pressure_log.get())
             self.canvas.draw()
 
+    def plot_time(self, timestamp):
+        """
+        Plot time of a sample: its scheduled (monotonic) timestamp relative to the
+        first sample, shared by both plots so temperature and pressure line up.
+        """
+        if self.time_origin is None or (not self.x_temp and not self.x_pressure):
+            self.time_origin = timestamp
+        return timestamp - self.time_origin
+
+    def track_range(self, data_range, value, log=False):
+        """Extend a running [min, max] with one sample. Return True if it changed."""
+        if not math.isfinite(value) or (log and value <= 0):
+            return False   # Nothing to show on a log axis for a zero reading
+        changed = False
+        if value < data_range[0]:
+            data_range[0] = value
+            changed = True
+        if value > data_range[1]:
+            data_range[1] = value
+            changed = True
+        return changed
+
+    def set_ylim(self, axis, data_range, log=False):
+        low, high = data_range
+        if low > high:
+            return
+        if log:
+            # A quarter of a decade above and below
+            axis.set_ylim(low / 10 ** 0.25, high * 10 ** 0.25)
+        else:
+            margin = (high - low) * 0.05 or max(abs(high) * 0.05, 1.0)
+            axis.set_ylim(low - margin, high + margin)
+
+    def toggle_pressure_log(self):
+        """Switch the pressure axis between log and linear scale."""
+        log = self.pressure_log.get()
+        self.ax_pressure.set_yscale('log' if log else 'linear')
+        # The range must be rebuilt once: a log axis ignores zero and negative readings
+        import numpy as np
+        pressures = np.asarray(self.y_pressure, dtype=float)
+        if log:
+            pressures = pressures[pressures > 0]
+        self.pressure_range = [pressures.min(), pressures.max()] if len(pressures) else [math.inf, -math.inf]
+        self.set_ylim(self.ax_pressure, self.pressure_range, log)
+        self.canvas.draw()
+
     def update_time_scale(self, current_time):
         """Update x-axis label, ticks, and formatter dynamically with ~nbins ticks."""
+        from matplotlib.ticker import FuncFormatter, MaxNLocator
         nbins = 6
         if current_time < 100:  # seconds
             self.ax.set_xlabel('Time (secs)', fontsize=self.plot_txt_size)
@@ -859,14 +1199,94 @@ class HeatingControlApp:
         self.save_button = tk.Button(self.root, text="Save", font=self.arial14, command=self.save_data)
         self.save_button.grid(row=9, column=3, padx=10, pady=10, sticky='w')
 
+        self.recipe_button = tk.Button(self.root, text="Load Recipe", font=self.arial14, command=self.toggle_recipe)
+        self.recipe_button.grid(row=9, column=4, columnspan=2, padx=10, pady=10, sticky='w')
+
+        self.history_button = tk.Button(self.root, text="History", font=self.arial14, command=self.open_history)
+        self.history_button.grid(row=9, column=6, padx=10, pady=10, sticky='w')
+
+        self.leak_button = tk.Button(self.root, text="Leak Test", font=self.arial14, command=self.toggle_leak_test)
+        self.leak_button.grid(row=9, column=7, padx=10, pady=10, sticky='w')
+        self.leak_button_bg = self.leak_button.cget("bg")
+        tk.Label(self.root, textvariable=self.leak_result, font=self.arial14).grid(row=10, column=0, columnspan=8, sticky=tk.W)
+        tk.Label(self.root, textvariable=self.analytics_text, font=self.arial14).grid(row=11, column=0, columnspan=8, sticky=tk.W)
+
+    def open_history(self):
+        """View a saved log or the archive in a separate window."""
+        if self.archive:
+            self.archive.flush()
+        try:
+            viewer.open_history(self.root)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("History", f"Could not open the log: {e}")
+
+    def toggle_recipe(self):
+        """Load a recipe file that replaces the segment table, or unload it."""
+        if self.running:
+            return
+        if self.recipe is not None:
+            self.recipe = None
+            self.recipe_button.config(text="Load Recipe")
+            self.segment_frame.grid()
+            return
+
+        filename = filedialog.askopenfilename(filetypes=[("Recipe files", "*.toml *.yaml *.yml")])
+        if not filename:
+            return
+        try:
+            recipe = compile_file(filename)
+        except (RecipeError, OSError) as e:
+            messagebox.showerror("Invalid recipe", str(e))
+            return
+
+        # Show the recipe settings; run_control sends them as usual
+        self.recipe = recipe
+        self.mode_value.set("Auto")
+        self.heating_value.set(recipe.heating["mode"])
+        self.temp_input_value.set(recipe.heating["input"])
+        self.ic_ue_value.set(recipe.heating["output"])
+        self.ramp_profile_value.set(recipe.heating["profile"])
+        self.streamer.update_rate = recipe.heating["stream_rate"]
+        self.unit_value.set(recipe.unit)
+        self.p_value.set(f"{recipe.pid['p']:g}")
+        self.i_value.set(f"{recipe.pid['i']:g}")
+        self.d_value.set(f"{recipe.pid['d']:g}")
+        self.ic_limit_value.set(f"{recipe.limits['ic']:.2f}")
+        self.uc_limit_value.set(f"{recipe.limits['uc']:.2f}")
+        self.ie_limit_value.set(f"{recipe.limits['ie']:g}")
+        self.ue_limit_value.set(f"{recipe.limits['ue']:g}")
+        if recipe.heating["output"] == "Ue":
+            self.ic_value.set(f"{recipe.heating['ic_target']:.2f}")
+        else:
+            self.ue_value.set(f"{recipe.heating['ue_target']:.1f}")
+        self.degas_var.set(1 if recipe.degas else 0)
+        if recipe.degas:
+            self.pressure_limit_value.set(f"{recipe.degas['limit']:.2e}")
+            self.pressure_base_value.set(f"{recipe.degas['base']:.2e}")
+        self.toggle_degas()
+        self.update_mode_settings()
+        self.segment_frame.grid_remove()
+        self.recipe_button.config(text=f"Recipe: {recipe.name}")
+
     def start_pause(self):
         if self.heat3_connected and self.heat3_thread_running:
             if not self.running:
                 # Start the operation
                 self.start_pause_button.config(text="Running", bg="green")
                 self.disable_controls()  # Disable Mode and Heating selection
-                self.send_command(self.heat3.master_mode,1)
+                self.journal.begin(**self.run_settings())
+                try:
+                    self.send_command(self.heat3.master_mode,1)
+                except CommunicationError as e:
+                    # Nothing started: undo the button, controls and journal
+                    print(f"Error starting HEAT3-PS: {e}")
+                    self.journal.end(f"start failed: {e}")
+                    self.start_pause_button.config(text="Stop", bg="red")
+                    self.enable_controls()
+                    messagebox.showerror("HEAT3-PS", f"The run could not be started: {e}")
+                    return
                 self.running = True
+                self.arm_interlock()
 
                 self.run_thread = threading.Thread(target=self.run_control)
                 self.run_thread.start()
@@ -874,14 +1294,33 @@ class HeatingControlApp:
                 # Pause/Stop the operation
                 self.stop_heat3_master()
 
-    def stop_heat3_master(self):        
+    def arm_interlock(self):
+        if self.interlock is not None:
+            self.interlock.reset()
+            self.interlock.arm()
+
+    def stop_heat3_master(self, reason="stopped"):
         self.running = False
-        self.send_command(self.heat3.set_Ue_target_value, 0)
-        self.send_command(self.heat3.operate_control,self.heat3_channel, 0)
-        self.send_command(self.heat3.run_hold_control,self.heat3_channel, 0)
-        self.send_command(self.heat3.master_mode,0)
-        self.start_pause_button.config(text="Stop", bg="red")
-        self.enable_controls()  # Re-enable Mode and Heating selection
+        if self.interlock is not None:
+            self.interlock.disarm()
+        self.streamer.stop()
+        if self.autotune:
+            self.executor.stop(self.autotune)
+        if self.program:
+            self.executor.stop(self.program)
+        try:
+            self.send_command(self.heat3.set_Ue_target_value, 0)
+            self.send_command(self.heat3.operate_control,self.heat3_channel, 0)
+            self.send_command(self.heat3.run_hold_control,self.heat3_channel, 0)
+            self.send_command(self.heat3.master_mode,0)
+        except CommunicationError as e:
+            reason = f"{reason}, stop failed: {e}"
+            raise
+        finally:
+            # The run is over either way; a failed stop is not offered for recovery
+            self.journal.end(reason)
+            self.start_pause_button.config(text="Stop", bg="red")
+            self.enable_controls()  # Re-enable Mode and Heating selection
         
     def disable_controls(self):
         # Disable the Mode and Heating comboboxes
@@ -904,12 +1343,14 @@ class HeatingControlApp:
                 if self.mode_value.get() == "Auto":
                     if init:
                         # Set heating mode and control parameters
+                        first_sp = self.recipe.steps[0].setpoint if self.recipe is not None else self.sp_values[0].get()
+                        p, i, d = self.scheduled_pid(first_sp)
                         self.send_command(self.heat3.set_heating_mode,self.heating_value.get())
-                        self.send_command(self.heat3.set_p_parameter_t_mode,self.heat3_channel,float(self.p_value.get()))
-                        self.send_command(self.heat3.set_i_parameter_t_mode,self.heat3_channel,float(self.i_value.get()))
-                        self.send_command(self.heat3.set_d_parameter_t_mode,self.heat3_channel,float(self.d_value.get()))
+                        self.send_command(self.heat3.set_p_parameter_t_mode,self.heat3_channel,p)
+                        self.send_command(self.heat3.set_i_parameter_t_mode,self.heat3_channel,i)
+                        self.send_command(self.heat3.set_d_parameter_t_mode,self.heat3_channel,d)
                         self.send_command(self.heat3.set_work_mode,self.heat3_channel, "PID")
-                        self.heat3.set_ramp_rate_unit_t_mode(self.heat3_channel,1)
+                        self.send_command(self.heat3.set_ramp_rate_unit_t_mode,self.heat3_channel,1)
 
                         if self.heating_value.get() == "EB":
                             self.send_command(self.heat3.set_Ic_limit_eb_mode, float(self.ic_limit_value.get()))
@@ -930,59 +1371,18 @@ class HeatingControlApp:
                         self.send_command(self.heat3.operate_control,self.heat3_channel, 1)
                         self.send_command(self.heat3.run_hold_control,self.heat3_channel, 1)
                         init = False
-                    # Repeat the sequence of segments
-                    for repeat in range(repeat_count + 1):  # Repeat the sequence the specified number of times
-                        if not self.running:
-                            break  # Stop if the running flag is turned off
-
-                        # Loop through each segment
-                        for segment in range(num_segments):
-                            if not self.running:
-                                break
-
-                            if segment == 0:
-                                current_temperature = self.temp_value.get()
-                            else:
-                                current_temperature = self.sp_values[segment-1].get()
-                            sp_value = self.sp_values[segment].get()
-                            t_value = self.t_values[segment].get()
-                            diff = sp_value - current_temperature
-
-                            if num_segments == 1:
-                                while self.running and self.heat3_thread_running:
-                                    time.sleep(self.time_sleep)
-                            if diff > 0:
-                                ramp = diff/t_value
-                                self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
-                                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
-                                while self.temp_value.get() < (sp_value - 0.2) and self.running and self.heat3_thread_running:
-                                    if self.degas_var.get():
-                                        self.degas_function(sp_value)
-                                    time.sleep(self.time_sleep)
-                            elif diff < 0:
-                                ramp = abs(diff)/t_value
-                                self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
-                                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
-                                while self.temp_value.get() > (sp_value + 0.2) and self.running and self.heat3_thread_running:
-                                    if self.degas_var.get():
-                                        self.degas_function(sp_value)
-                                    time.sleep(self.time_sleep)
-                            else:
-                                # Start the timer for the segment
-                                t_value = self.t_values[segment].get()*60 # Convert to second time.time() returns second
-                                #print(f"Inside No Ramp")
-                                start_time = time.time()
-                                while (time.time() - start_time < t_value) and self.running and self.heat3_thread_running:
-                                    if self.degas_var.get():
-                                        start_degas_time = time.time()
-                                        self.degas_function(sp_value)
-                                        end_degas_time = time.time()
-                                        t_value = t_value + (end_degas_time - start_degas_time)
-                                    time.sleep(self.time_sleep)
-
-                    # End of the operation, reset the button and re-enable controls
-                    #print(f"Finish Heating Cycle")
-                    self.stop_heat3_master()
+                    if self.recipe is not None:
+                        steps = self.recipe.steps
+                    elif num_segments == 1:
+                        # Free mode: the SP/T entries drive HEAT3 until Stop is pressed
+                        return
+                    else:
+                        segments = [(self.sp_values[i].get(), self.t_values[i].get()) for i in range(num_segments)]
+                        steps = steps_from_segments(segments, repeat_count, self.ramp_profile_value.get())
+
+                    self.journal.record("program", steps=[vars(step) for step in steps])
+                    self.start_program(steps)
+                    return
 
                 else:
                     if self.heat3_thread_running:
@@ -995,8 +1395,7 @@ class HeatingControlApp:
                             self.send_command(self.heat3.set_Ue_target_value, float(self.ue_value.get()))
                         self.send_command(self.heat3.operate_control, self.heat3_channel, 1)
                         self.send_command(self.heat3.run_hold_control, self.heat3_channel, 1)
-                    while self.running:
-                        time.sleep(self.time_sleep)
+                    return
 
             except CommunicationError:
                 return
@@ -1005,95 +1404,200 @@ class HeatingControlApp:
             #    break
 
     def save_data(self):
-        filename = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("TXT files", "*.txt")])
-        if filename:
-            # Write the x_data (time) and y_data (temperature) to a TXT file
+        filename = filedialog.asksaveasfilename(defaultextension=".txt",
+                                                filetypes=[("TXT files", "*.txt"), ("Compressed", "*.pvz")])
+        if filename.endswith(".pvz"):
+            self.save_compressed(filename)
+        elif filename:
+            # Temperature rows with the electrical readings and power, then the pressure
+            # time base; the shorter part is padded with NaN
+            import numpy as np
+            columns = {"time": self.x_temp, "temperature": self.y_temp}
+            columns.update(self.telemetry)
+            derive_power(columns)
+            columns["time_pressure"] = self.x_pressure
+            columns["pressure"] = self.y_pressure
+            formats = {"time": "%.2f", "temperature": "%.1f", "uc": "%.3f", "ic": "%.3f", "ue": "%.1f", "ie": "%.3f",
+                       "power_c": "%.2f", "power_e": "%.2f", "time_pressure": "%.2f", "pressure": "%.2e"}
+            rows = max(len(values) for values in columns.values())
+            data = np.full((rows, len(columns)), np.nan)
+            for index, values in enumerate(columns.values()):
+                data[:len(values), index] = values
             try:
-                with open(filename, mode='w') as file:
-                    # Write the data points, tab-separated (no header)
-                    for x, y, w, z in zip_longest(self.x_temp, self.y_temp, self.x_pressure, self.y_pressure, fillvalue=-1):
-                        file.write(f"{x:.2f}\t{y:.1f}\t{w:.2f}\t{z:.2e}\n")
+                np.savetxt(filename, data, fmt=[formats[name] for name in columns], delimiter="\t",
+                           header="\t".join(columns))
+                if self.analytics_rows:
+                    # Analytics on their own time base next to the run: <name>_analytics.txt
+                    base, extension = os.path.splitext(filename)
+                    np.savetxt(base + "_analytics" + extension, np.array(self.analytics_rows), fmt="%.4g",
+                               delimiter="\t", header="\t".join(["time"] + analytics.ANALYTICS_CHANNELS))
 
             except Exception as e:
                 print(f"Error saving data: {e}")
 
+    def save_compressed(self, filename):
+        """Save the run as compressed series (see codec.py); the electrical columns share the temperature times."""
+        import codec
+        series = {"temperature": (self.x_temp, self.y_temp)}
+        series.update((name, (self.x_temp, values)) for name, values in self.telemetry.items())
+        series["pressure"] = (self.x_pressure, self.y_pressure)
+        try:
+            codec.save_series(filename, series)
+        except Exception as e:
+            print(f"Error saving data: {e}")
+
+    def archive_sample(self, channel, value, timestamp=None):
+        """Append a sample to the archive; timestamp is monotonic, the archive keeps wall-clock time."""
+        try:
+            if self.archive is None:
+                with self.archive_lock:
+                    if self.archive is None:
+                        self.archive = archive.TimeSeriesArchive()
+            self.archive.append(channel, value, None if timestamp is None else timestamp + self.clock_offset)
+        except (OSError, ValueError) as e:
+            print(f"Error archiving {channel}: {e}")
+
     def get_temp(self):
-        temp_source = self.temp_input_value.get()
-
-        if temp_source in ["Tc1", "Tc2"]:
-            # Read temperature from thermocouple
-            temperature = self.send_command(self.heat3.r_temperature_from_thermocouple, temp_source)
-            return temperature
-        elif temp_source in ["D1", "D2"]:
-            # Read temperature from diode
-            temperature = self.send_command(self.heat3.r_temperature_from_diode, temp_source)
-            return temperature
-        elif temp_source == "RTD":
-            # Read temperature from resistance (RTD)
-            temperature = self.send_command(self.heat3.r_temperature_from_resistance)
-            return temperature
-        elif temp_source in ["Ain1", "Ain2"]:
-            # Read process value from Ain1 or Ain2
-            temperature = self.send_command(self.heat3.r_actual_process_value, self.heat3_channel)
-            return temperature
-        else:
+        request = self.heat3_read_request("temperature")
+        if request is None:
+            return 0.0
+        return self.send_command(getattr(self.heat3, request[0]), *request[1])
+
+    def heat3_signals(self):
+        """Signals the acquisition loop reads in the current mode."""
+        signals = ["temperature", "uc"]
+        if self.mode_value.get() == "Auto":
+            if self.heating_value.get() == "RES" or self.ic_ue_value.get() == "Ic":
+                signals.append("ic")
+            if self.ic_ue_value.get() == "Ue":
+                signals.append("ue")
+        if self.heating_value.get() == "EB":
+            signals.append("ie")
+        return signals
+
+    def heat3_read_request(self, signal):
+        """(driver method name, args) reading one signal."""
+        if signal == "temperature":
+            temp_source = self.temp_input_value.get()
+            if temp_source in ["Tc1", "Tc2"]:
+                # Read temperature from thermocouple
+                return "r_temperature_from_thermocouple", (temp_source,)
+            elif temp_source in ["D1", "D2"]:
+                # Read temperature from diode
+                return "r_temperature_from_diode", (temp_source,)
+            elif temp_source == "RTD":
+                # Read temperature from resistance (RTD)
+                return "r_temperature_from_resistance", ()
+            elif temp_source in ["Ain1", "Ain2"]:
+                # Read process value from Ain1 or Ain2
+                return "r_actual_process_value", (self.heat3_channel,)
             # Handle unexpected input source if needed
             print(f"Unknown temperature source: {temp_source}")
-            return 0.0
+            return None
+        return {"uc": ("r_actual_value_Uc", (self.heat3_channel,)),
+                "ic": ("r_actual_value_Ic", (self.heat3_channel,)),
+                "ue": ("r_actual_value_Ue", ()),
+                "ie": ("r_actual_value_Ie", ())}[signal]
+
+    def read_heat3_signals(self, signals):
+        """
+        Read several signals in one queue slot. The driver's read_many sends the
+        requests back to back and then collects the answers, instead of one round
+        trip per signal.
+        """
+        requests = [(signal, self.heat3_read_request(signal)) for signal in signals]
+        requests = [(signal, request) for signal, request in requests if request is not None]
+        if len(requests) > 1 and hasattr(self.heat3, "read_many"):
+            values = self.send_command(self.heat3.read_many, [request for _, request in requests])
+        else:
+            values = [self.send_command(getattr(self.heat3, name), *args) for _, (name, args) in requests]
+        return {signal: value for (signal, _), value in zip(requests, values)}
 
     def read_heat3_data(self):
         # Run continuously until heat3_thread_running is set to False
-        temperature = 0
-        uc_actual = 0
-        ic_actual = 0
-        ue_actual = 0
-        ie_actual = 0
-        
+        self.telemetry_plan.reset()
         while self.heat3_connected and self.heat3_thread_running:
             try:
-                # Read temperature from HEAT3-PS (or any other data)
-                # Check the value of temp_input_value and call the corresponding function
-                temperature = self.get_temp()
-                self.temp_value.set(f"{self.kelvin_to_celsius(temperature):.1f}")
-
-                # Read Uc and Ic values and update in a thread-safe way
-                uc_actual = self.send_command(self.heat3.r_actual_value_Uc, self.heat3_channel)
-                self.uc_value.set(f"{uc_actual:.2f}")
-                if self.mode_value.get() == "Auto":
-                    if self.heating_value.get() == "RES" or self.ic_ue_value.get() == "Ic":
-                        ic_actual = self.send_command(self.heat3.r_actual_value_Ic, self.heat3_channel)
-                        self.ic_value.set(f"{ic_actual:.2f}")
-                    if self.ic_ue_value.get() == "Ue":
-                        ue_actual = self.send_command(self.heat3.r_actual_value_Ue)
-                        self.ue_value.set(f"{ue_actual:.1f}")
-                if self.heating_value.get() == "EB":
-                    ie_actual = self.send_command(self.heat3.r_actual_value_Ie)*1000
-                    self.ie_value.set(f"{ie_actual:.1f}")
-                #self.root.after(0, self.update_uc_ic_display)
-                
-                # Start updating the plot continuously
-                self.root.after(0, self.update_plot_temp)
-
-                # Sleep for a short period (e.g., 0.3 seconds) before the next read
-                time.sleep(self.time_interval)
-
-            except CommunicationError:
-                return
+                # Only the signals whose interval has elapsed are read this cycle
+                signals = self.heat3_signals()
+                due = self.telemetry_plan.due(time.monotonic(), signals)
+                values = self.read_heat3_signals(due)
+                for signal, value in values.items():
+                    if value is None:
+                        continue
+                    if signal == "ie":
+                        value = value * 1000   # mA
+                    # Stamped with the grid time the read was due, not when it returned
+                    self.publish_heat3_sample(signal, value, self.telemetry_plan.deadline[signal])
+                # Only a read that returned something clears the error count: a pass
+                # with nothing due must not hide the failures around it
+                if any(value is not None for value in values.values()):
+                    self.count_read_error("heat3_errors", False)
+
+                if "temperature" in due:
+                    # Start updating the plot continuously
+                    self.root.after(0, self.update_plot_temp)
+
+                # Sleep until the next signal is due
+                time.sleep(self.telemetry_plan.wait_time(time.monotonic(), signals))
+
+            except CommunicationError as e:
+                # Link outage longer than the retry window: keep polling while the
+                # supervisor reconnects, the thread only ends on disconnect
+                print(f"Error reading from HEAT3-PS: {e}")
+                self.count_read_error("heat3_errors", True)
+                time.sleep(self.telemetry_plan.wait_time(time.monotonic(), self.heat3_signals()))
+                continue
 
             #finally:
                 # Re-schedule the next data read
                 #self.schedule_read_heat3_data()
+        print(f"HEAT3-PS sampling:\n{self.telemetry_plan.report()}")
+
+    def publish_heat3_sample(self, signal, value, timestamp=None):
+        """Store and archive one HEAT3 reading in archive units (K, mA)."""
+        # The archive keeps temperatures in K, the store in the display unit
+        self.state.publish(signal, self.kelvin_to_celsius(value) if signal == "temperature" else value, timestamp)
+        self.interlock_sample(signal, value, timestamp)
+        self.archive_sample(signal, value, timestamp)
+
+    def bus_sample(self, channel, timestamp, value):
+        """Sample from the acquisition process (bus reader thread)."""
+        self.publish_heat3_sample(channel, value, timestamp)
+        if channel == "temperature":
+            self.root.after(0, self.update_plot_temp)
+
+    def sync_heat3_reads(self):
+        """
+        With acquisition in its own process, send it the read table whenever the
+        mode or the temperature input changes what has to be read.
+        """
+        reads = None
+        while self.heat3_connected and self.heat3_thread_running:
+            table = {signal: self.heat3_read_request(signal) for signal in self.heat3_signals()}
+            table = {signal: request for signal, request in table.items() if request is not None}
+            if table != reads:
+                reads = table
+                self.heat3_link.set_reads(reads, self.telemetry_plan.intervals)
+            time.sleep(0.5)
 
     def read_mg15_data(self):
         vacuum_value = 0
+        ticker = TickScheduler(self.time_interval)
         while self.mg15_thread_running:
             try:
+                deadline = ticker.wait()
+                if self.gauge_paused.is_set():
+                    continue   # A leak test is reading the gauge
                 vacuum_input_str = self.vacuum_input_value.get()
-                vacuum_value = self.mg15.read_vacuum(vacuum_input_str)
-                self.pressure_value.set(f"{vacuum_value:.2e}")
-                self.root.after(0, self.update_plot_pressure)
-                time.sleep(self.time_interval)
+                vacuum_value = self.mg15_link.call(self.mg15.read_vacuum, vacuum_input_str)
+                self.pressure_sample(vacuum_input_str, vacuum_value, deadline)
 
+            except ConnectionError as e:
+                # The supervisor keeps reconnecting, acquisition resumes on its own
+                print(f"Error reading from MG15: {e}")
+                self.count_read_error("gauge_errors", True)
+                continue
             except Exception as e:
                 print(f"Error reading from MG15: {e}")
                 # Stop the MG15 thread
@@ -1104,17 +1608,25 @@ class HeatingControlApp:
                 # Stop the MG15 thread
                 self.mg15_stop()
                 break
+        print(f"MG15 sampling: {ticker.stats.report()}")
 
     def read_xgs600_data(self):
         vacuum_value = 0
+        ticker = TickScheduler(self.time_interval)
         while self.xgs600_thread_running:
             try:
+                deadline = ticker.wait()
+                if self.gauge_paused.is_set():
+                    continue   # A leak test is reading the gauge
                 vacuum_input_str = self.vacuum_input_value.get()
-                vacuum_value = self.xgs600.read_pressure(vacuum_input_str)
-                self.pressure_value.set(f"{vacuum_value:.2e}")
-                self.root.after(0, self.update_plot_pressure)
-                time.sleep(self.time_interval)
+                vacuum_value = self.xgs600_link.call(self.xgs600.read_pressure, vacuum_input_str)
+                self.pressure_sample(vacuum_input_str, vacuum_value, deadline)
 
+            except ConnectionError as e:
+                # The supervisor keeps reconnecting, acquisition resumes on its own
+                print(f"Error reading from XGS-600: {e}")
+                self.count_read_error("gauge_errors", True)
+                continue
             except Exception as e:
                 print(f"Error reading from XGS-600: {e}")
                 # Stop the XGS-600 thread
@@ -1125,11 +1637,24 @@ class HeatingControlApp:
                 # Stop the XGS-600 thread
                 self.xgs600_stop()
                 break
+        print(f"XGS-600 sampling: {ticker.stats.report()}")
+
+    def pressure_sample(self, channel, vacuum_value, timestamp):
+        """A gauge reading (mbar, monotonic time): publish, archive, interlock, degas and plot."""
+        self.state.publish("pressure", vacuum_value, timestamp)
+        self.interlock_sample("pressure", vacuum_value, timestamp)
+        self.count_read_error("gauge_errors", False)
+        self.archive_sample(f"pressure_{channel}", vacuum_value, timestamp)
+        if self.degas_enabled and self.running:
+            self.degas.update(vacuum_value)
+        self.root.after(0, self.update_plot_pressure)
 
     def mg15_stop(self):
         # Stop the MG15 thread
         self.mg15_thread_running = False
         self.mg15_connected = False
+        if self.mg15_link:
+            self.mg15_link.close()
         self.mg15_product_label.config(text="")
         self.mg15_serial_label.config(text="")
         self.toggle_buttons["MG15         IP:"].config(text="Disconnect", bg="red")
@@ -1139,33 +1664,496 @@ class HeatingControlApp:
         # Stop the XGS-600 thread
         self.xgs600_thread_running = False
         self.xgs600_connected = False
+        if self.xgs600_link:
+            self.xgs600_link.close()
         self.xgs600_sw_version_label.config(text="")
         self.toggle_buttons["XGS-600 Add:"].config(text="Disconnect", bg="red")
         self.toggle_buttons["MG15         IP:"].config(state="normal")
 
-    def degas_function(self, set_temp):
-        sp_value = set_temp
-        current_pressure = self.pressure_value.get()
-        while current_pressure > float(self.pressure_base_value.get()) and self.running and self.heat3_thread_running and self.mg15_thread_running:
-            degas_nominal_pressure = (float(self.pressure_base_value.get()) + float(self.pressure_limit_value.get()))/2
-            if current_pressure > degas_nominal_pressure:
-                # Adjust the setpoint downward to maintain pressure below the limit
-                sp_value -= self.temp_step                                                                              
-                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
+    def scheduled_pid(self, sp_value):
+        """P/I/D for a setpoint: from the gain schedule if it has a band for it, else the entries."""
+        entry = self.gain_schedule.lookup(self.heating_value.get(), self.celsius_to_kelvin(sp_value))
+        self.gain_entry = entry
+        if entry is None:
+            return float(self.p_value.get()), float(self.i_value.get()), float(self.d_value.get())
+        self.root.after(0, self.show_pid, entry["p"], entry["i"], entry["d"])
+        return entry["p"], entry["i"], entry["d"]
+
+    def send_pid(self, p, i, d):
+        """Send new P/I/D to HEAT3 during a program (gain schedule band change)."""
+        self.send_command(self.heat3.set_p_parameter_t_mode, self.heat3_channel, p)
+        self.send_command(self.heat3.set_i_parameter_t_mode, self.heat3_channel, i)
+        self.send_command(self.heat3.set_d_parameter_t_mode, self.heat3_channel, d)
+        self.root.after(0, self.show_pid, p, i, d)
+
+    def show_pid(self, p, i, d):
+        self.p_value.set(f"{p:g}")
+        self.i_value.set(f"{i:g}")
+        self.d_value.set(f"{d:g}")
+
+    def start_autotune(self):
+        """
+        Relay autotune in Manual mode, one experiment per gain schedule band of the
+        heating mode (at the band centre), plus one at SP1 if no band contains it;
+        each result goes into its band. Without bands only SP1 is tuned.
+        """
+        if not (self.heat3_connected and self.heat3_thread_running) or self.running or not self.heat3.verified:
+            return
+        try:
+            sp_value = float(self.sp_values[0].get())
+            ic_limit = float(self.ic_limit_value.get())
+            ue_limit = float(self.ue_limit_value.get())
+        except (ValueError, tk.TclError):
+            messagebox.showerror("Autotune", "Enter a valid SP1 and output limits first.")
+            return
+        heating = self.heating_value.get()
+        output = "Ic" if heating == "RES" else self.ic_ue_value.get()
+        limit = ic_limit if output == "Ic" else ue_limit
+        if output == "Ic":
+            set_output = lambda value: self.send_command(self.heat3.set_Ic_target_value, self.heat3_channel, value)
+        else:
+            set_output = lambda value: self.send_command(self.heat3.set_Ue_target_value, value)
+
+        setpoints = [self.kelvin_to_celsius((band["low"] + band["high"]) / 2)
+                     for band in self.gain_schedule.bands(heating)]
+        if self.gain_schedule.lookup(heating, self.celsius_to_kelvin(sp_value)) is None:
+            setpoints.append(sp_value)
+        setpoints.sort()
+        print("Autotune at " + ", ".join(f"{setpoint:.1f}" for setpoint in setpoints))
+
+        self.running = True
+        self.arm_interlock()
+        self.start_pause_button.config(text="Autotune", bg="orange")
+        self.disable_controls()
+        self.autotune_setpoints = setpoints[1:]
+        self.autotune = self.relay_autotune(setpoints[0], set_output, limit, limit / 2)
+        threading.Thread(target=self.run_autotune, args=(heating, output), daemon=True).start()
+
+    def run_autotune(self, heating, output):
+        try:
+            self.send_command(self.heat3.master_mode, 1)
+            self.send_command(self.heat3.set_heating_mode, heating)
+            self.send_command(self.heat3.set_work_mode, self.heat3_channel, "Manual")
+            if heating == "EB":
+                self.send_command(self.heat3.set_Ic_limit_eb_mode, float(self.ic_limit_value.get()))
+                self.send_command(self.heat3.set_Uc_limit_eb_mode, float(self.uc_limit_value.get()))
+                self.send_command(self.heat3.set_Ie_limit_eb_mode, float(self.ie_limit_value.get()))
+                self.send_command(self.heat3.set_Ue_limit_eb_mode, float(self.ue_limit_value.get()))
+                # The output that is not tuned keeps its manual value
+                if output == "Ue":
+                    self.send_command(self.heat3.set_Ic_target_value, self.heat3_channel, float(self.ic_value.get()))
+                else:
+                    self.send_command(self.heat3.set_Ue_target_value, float(self.ue_value.get()))
             else:
-                if set_temp > sp_value:
-                    sp_value += 1  # Return setpoint incrementally (adjust as needed)
-                    self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
-            time.sleep(self.time_sleep)
+                self.send_command(self.heat3.set_Ue_target_value, 0)
+                self.send_command(self.heat3.set_Ic_limit_res_mode, self.heat3_channel, float(self.ic_limit_value.get()))
+                self.send_command(self.heat3.set_Uc_limit_res_mode, self.heat3_channel, float(self.uc_limit_value.get()))
+            self.send_command(self.heat3.set_input_selection_for_process_value, self.heat3_channel, self.temp_input_value.get())
+            self.send_command(self.heat3.operate_control, self.heat3_channel, 1)
+            self.send_command(self.heat3.run_hold_control, self.heat3_channel, 1)
+        except CommunicationError:
+            return
+        self.executor.start(self.autotune)
+
+    def relay_autotune(self, setpoint, set_output, limit, bias):
+        """One relay experiment; the bias adapts to the band (see RelayAutotune)."""
+        return autotune.RelayAutotune(
+            setpoint, bias=bias, amplitude=limit * self.autotune_amplitude,
+            set_output=set_output, output_limit=limit,
+            keep_running=lambda: self.running and self.heat3_thread_running,
+            on_finish=self.autotune_finished)
+
+    def autotune_finished(self, autotune):
+        if autotune.error:
+            print(f"Autotune at {autotune.setpoint:.1f} failed: {autotune.error}")
+        if autotune.completed:
+            p, i, d = autotune.result
+            ku, pu, amplitude = autotune.ultimate
+            print(f"Autotune at {autotune.setpoint:.1f}: Ku = {ku:.3g}, Pu = {pu:.1f} s, "
+                  f"amplitude = {amplitude:.2f} -> P = {p}, I = {i}, D = {d}")
+            self.gain_schedule.update(self.heating_value.get(), self.celsius_to_kelvin(autotune.setpoint), p, i, d)
+            self.root.after(0, self.show_pid, p, i, d)
+            if self.autotune_setpoints and self.running:
+                # Next band: the relay heats or cools to its setpoint, then oscillates there,
+                # starting from the bias that held this band's setpoint
+                self.autotune = self.relay_autotune(self.autotune_setpoints.pop(0), autotune.set_output,
+                                                    autotune.output_limit, autotune.bias)
+                self.executor.start(self.autotune)
+                return
+        self.autotune_setpoints = []
+        if self.running:
+            self.stop_heat3_master()
+
+    def toggle_remote(self):
+        """Start or stop the remote WebSocket server (ws://<remote_host>:remote_port/?token=...)."""
+        if self.remote_enabled.get():
+            if not self.remote_token:
+                self.remote_token = secrets.token_urlsafe(12)
+            self.remote_server = remote_server.RemoteServer(self.remote_execute, host=self.remote_host,
+                                                            port=self.remote_port, token=self.remote_token,
+                                                            writable=self.remote_writable)
+            if not self.remote_server.start():
+                self.remote_server = None
+                self.remote_enabled.set(False)
+                return
+            self.state.subscribe(self.remote_publish)
+            print(f"Remote server on {self.remote_host}:{self.remote_port}, control token: {self.remote_token}")
+        elif self.remote_server:
+            self.state.unsubscribe(self.remote_publish)
+            self.remote_server.stop()
+            self.remote_server = None
+
+    def remote_publish(self, channel, timestamp, value):
+        server = self.remote_server
+        if server:
+            server.publish(channel, timestamp + self.clock_offset, value)
+
+    def remote_writable(self):
+        """Remote setpoint and PID changes only during a run started and armed here."""
+        return (self.heat3.verified and self.running and self.interlock is not None
+                and self.interlock.armed)
+
+    def remote_execute(self, name, args):
+        """
+        Remote command: a HEAT3 driver method by name, sent through the command queue.
+        Runs in the server's worker thread, so a failure is only answered to the client:
+        it neither stops the local run nor touches the window.
+        """
+        if not (self.heat3_connected and self.heat3_thread_running):
+            raise ConnectionError("HEAT3-PS is not connected")
+        if name in self.remote_ranges:
+            self.check_remote_args(name, args)
+        return self.call_heat3(getattr(self.heat3, name), *args)
+
+    def check_remote_args(self, name, args):
+        """Remote set commands take (channel, value): this channel and a value in remote_ranges."""
+        if len(args) != 2:
+            raise ValueError(f"{name} takes [channel, value]")
+        channel, value = args
+        if channel != self.heat3_channel or isinstance(channel, bool):
+            raise ValueError(f"{name}: channel must be {self.heat3_channel}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"{name}: value must be a number, got {value!r}")
+        low, high = self.remote_ranges[name]
+        if not low <= value <= high:
+            raise ValueError(f"{name}: {value:g} is outside {low:g}..{high:g}")
+
+    def start_analytics(self):
+        """Start the temperature/pressure analytics; it idles until both are acquired."""
+        if self.analytics_stage is None:
+            analyzer = analytics.CorrelationAnalyzer(period=self.analytics_period)
+            self.analytics_stage = analytics.AnalyticsStage(self.state, analyzer, self.analytics_result)
+            self.analytics_stage.start()
+
+    def analytics_result(self, timestamp, results):
+        """Analytics thread: keep the row for save_data, archive it and show it."""
+        row = [timestamp - (self.time_origin or timestamp)] + [results[name] for name in analytics.ANALYTICS_CHANNELS]
+        self.analytics_rows.append(row)
+        for name in analytics.ANALYTICS_CHANNELS:
+            if math.isfinite(results[name]):
+                self.archive_sample(name, results[name], timestamp)
+        self.root.after(0, self.analytics_text.set, analytics.format_results(results))
+
+    def start_interlock(self):
+        if self.interlock is not None:
+            return
+        rules = interlock.DEFAULT_RULES
+        if os.path.exists(self.interlock_file):
+            with open(self.interlock_file, "r") as file:
+                rules = file.read()
+        try:
+            rules = interlock.parse_rules(rules)
+        except ValueError as e:
+            print(f"Error in {self.interlock_file}: {e}, using the default rules")
+            rules = interlock.parse_rules(interlock.DEFAULT_RULES)
+        self.interlock = interlock.InterlockEngine(rules, self.interlock_trip)
+        self.interlock.start()
+
+    def interlock_sample(self, channel, value, timestamp=None):
+        """Feed a sample (archive units: K, mbar) to the interlock."""
+        if self.interlock is not None:
+            self.interlock.update(channel, value, timestamp)
+
+    def count_read_error(self, counter, failed):
+        """Consecutive failed reads of a device, checked by the device-timeout rules."""
+        count = self.read_errors[counter] + 1 if failed else 0
+        if count != self.read_errors[counter]:
+            self.read_errors[counter] = count
+            self.interlock_sample(counter, count)
+
+    def interlock_trip(self, rule, value):
+        """Called from the thread that fed the sample (or the watchdog)."""
+        print(f"Interlock: {rule.text} tripped at {value:.4g}")
+        if rule.action == "stop" and self.heat3_connected:
+            self.emergency_stop()
+        self.root.after(0, messagebox.showwarning, "Interlock", f"{rule.text}\nValue: {value:.4g}")
+
+    def emergency_stop(self):
+        """
+        Switch the heater off straight through the HEAT3 link, ahead of whatever
+        is waiting in the command queue, then stop the program. In process mode the
+        commands take the acquisition process's urgent path, ahead of its own queue.
+        """
+        self.running = False
+        self.streamer.stop()
+        calls = ((self.heat3.operate_control, (self.heat3_channel, 0)),
+                 (self.heat3.set_Ue_target_value, (0,)),
+                 (self.heat3.run_hold_control, (self.heat3_channel, 0)))
+        for command, args in calls:
+            self.journal_command(command, args)
+        if isinstance(self.heat3_link, ConnectionSupervisor):
+            outcome = []
+            for command, args in calls:
+                try:
+                    outcome.append(self.heat3_link.call(command, *args))
+                except Exception as e:
+                    outcome.append(e)
+        else:
+            try:
+                outcome = self.heat3_link.call_urgent(calls)
+            except ConnectionError as e:
+                outcome = [e] * len(calls)
+        for (command, _), result in zip(calls, outcome):
+            if isinstance(result, Exception):
+                print(f"Emergency stop: {command.__name__} failed: {result}")
+        for program in (self.autotune, self.program):
+            if program:
+                self.executor.stop(program)
+        self.root.after(0, self.interlock_stopped)
+
+    def interlock_stopped(self):
+        try:
+            self.stop_heat3_master()
+        except CommunicationError as e:
+            print(f"Error stopping HEAT3-PS: {e}")
+
+    def toggle_leak_test(self):
+        """
+        Rate-of-rise test on the selected gauge: isolate the chamber first. The gauge
+        is read back to back and the test ends by itself once dP/dt has converged.
+
+        The gauge poll thread is paused meanwhile, so its reads do not interleave with
+        the test's; the test publishes a reading every time_interval in its place.
+        Neither gauge driver has a block or continuous read, so the test still sends
+        one request per reading.
+        """
+        if self.leak_test is not None:
+            self.leak_test.stop()
+            return
+        channel = self.vacuum_input_value.get()
+        if self.mg15_thread_running:
+            link, read = self.mg15_link, self.mg15.read_vacuum
+        elif self.xgs600_thread_running:
+            link, read = self.xgs600_link, self.xgs600.read_pressure
+        else:
+            messagebox.showerror("Leak Test", "Connect the MG15 or the XGS-600 first.")
+            return
+        next_sample = 0.0
+
+        def read_pressure():
+            nonlocal next_sample
+            pressure = link.call(read, channel)
+            now = time.monotonic()
+            if now >= next_sample:
+                next_sample = now + self.time_interval
+                self.pressure_sample(channel, pressure, now)
+            return pressure
+
+        self.gauge_paused.set()
+        self.leak_test = leak_test.LeakTest(
+            read_pressure, volume=self.chamber_volume,
+            on_update=lambda result: self.root.after(0, self.leak_result.set, leak_test.format_result(result)),
+            on_finish=lambda test: self.root.after(0, self.leak_test_finished, test))
+        self.leak_result.set(f"Leak test on {channel}...")
+        self.leak_button.config(text="Stop Test", bg="orange")
+        self.leak_test.start()
+
+    def leak_test_finished(self, test):
+        self.leak_test = None
+        self.gauge_paused.clear()
+        self.leak_button.config(text="Leak Test", bg=self.leak_button_bg)
+        if test.error:
+            self.leak_result.set(f"Leak test failed: {test.error}")
+        elif test.result:
+            status = "converged" if test.converged else "stopped before convergence"
+            self.leak_result.set(f"{leak_test.format_result(test.result)} ({status})")
+            print(f"Leak test {status}: {leak_test.format_result(test.result)}")
+
+    def start_program(self, steps, position=None, downtime=0.0):
+        """Run the steps on the executor, from a journaled position when a run is resumed."""
+        # The executor steps the program on every new temperature sample
+        self.degas.reset()
+        self.program = RampSoakProgram(
+            steps,
+            send_ramp=lambda ramp: self.send_command(self.heat3.set_ramp_rate_t_mode, self.heat3_channel, ramp),
+            send_setpoint=lambda sp: self.send_command(self.heat3.set_setpoint_t_mode, self.heat3_channel, self.celsius_to_kelvin(sp)),
+            hold=self.degas_hold,
+            keep_running=lambda: self.running and self.heat3_thread_running,
+            on_finish=self.program_finished,
+            stream_ramp=self.stream_ramp,
+            on_progress=self.journal_progress)
+        if position is not None:
+            self.program.restore(position, downtime)
+            if self.degas_enabled and position["phase"] == "soak" and position.get("degas"):
+                self.degas.restore(position["setpoint"], *position["degas"])
+        self.executor.start(self.program)
+        # Switch P/I/D as the temperature moves through the schedule bands
+        if self.gain_schedule.bands(self.heating_value.get()):
+            program = self.program
+            self.executor.start(GainScheduler(
+                self.gain_schedule, self.heating_value.get(), self.send_pid,
+                to_kelvin=self.celsius_to_kelvin, hysteresis=self.gain_hysteresis,
+                current=self.gain_entry,
+                keep_running=lambda: self.running and not program.finished))
+
+    def run_settings(self):
+        """GUI settings of a run, journaled so a resumed run is shown as it was started."""
+        return {"mode": self.mode_value.get(), "heating": self.heating_value.get(), "ic_ue": self.ic_ue_value.get(),
+                "channel": self.heat3_channel, "unit": self.unit, "degas": self.degas_enabled}
+
+    def journal_command(self, command, args):
+        """Journal a HEAT3 write of the run before it is sent (see JOURNALED_COMMANDS)."""
+        name = getattr(command, "__name__", str(command))
+        if self.journal.active and name in JOURNALED_COMMANDS:
+            self.journal.command(name, args)
+
+    def journal_progress(self, position):
+        self.journal.progress(dict(position, degas=[self.degas.integral, self.degas.reduction]))
+
+    def recover_run(self):
+        """
+        Look for a run the journal shows was interrupted (crash or window closed while
+        running), read HEAT3 back, then resume it or switch the heater off.
+        """
+        try:
+            run = load_run(self.journal.path)
+        except OSError as e:
+            print(f"Error reading the run journal: {e}")
+            return
+        if run is None or self.running:
+            return
+        if not self.heat3.verified:
+            # Neither resuming nor switching off is possible without HEAT3 writes
+            print("Interrupted run found, but HEAT3 writes are refused; check the heater by hand")
+            self.root.after(0, messagebox.showwarning, "Interrupted run",
+                            "The journal shows an interrupted run, but HEAT3-PS writes are refused "
+                            "(unverified function codes). Check the heater by hand.")
+            return
+        channel = run["settings"]["channel"]
+        try:
+            device = {"operate": self.send_command(self.heat3.r_operate_control, channel),
+                      "run_hold": self.send_command(self.heat3.r_run_hold_control, channel),
+                      "setpoint": self.send_command(self.heat3.r_setpoint_t_mode, channel)}
+        except (CommunicationError, ValueError) as e:
+            print(f"Interrupted run not recovered, HEAT3 could not be read back: {e}")
+            return
+        resume, reason = reconcile(run, device)
+        if resume and (run["settings"]["unit"] != self.unit or channel != self.heat3_channel):
+            resume, reason = False, "the temperature unit or channel changed"
+        self.root.after(0, self.resume_run if resume else self.abandon_run, run, reason)
+
+    def resume_run(self, run, reason):
+        settings = run["settings"]
+        print(f"Resuming the interrupted run: {reason}")
+        self.journal.reopen()
+        self.journal.record("resume", reason=reason)
+        self.mode_value.set(settings["mode"])
+        self.heating_value.set(settings["heating"])
+        self.ic_ue_value.set(settings["ic_ue"])
+        self.degas_var.set(settings["degas"])
+        self.toggle_degas()
+        self.update_mode_settings()
+        self.update_heating_settings()
+        self.start_pause_button.config(text="Running", bg="green")
+        self.disable_controls()
+        try:
+            self.send_command(self.heat3.master_mode, 1)
+        except CommunicationError as e:
+            print(f"Error resuming the run: {e}")
+            return
+        self.running = True
+        self.arm_interlock()
+        if run["steps"] is not None:
+            position = run["position"] or {"index": 0, "phase": "start"}
+            downtime = time.time() - position.get("t", run["last"])
+            self.start_program([Step(**step) for step in run["steps"]], position, downtime)
+        messagebox.showinfo("Run resumed", f"The interrupted run was resumed: {reason}.")
+
+    def abandon_run(self, run, reason):
+        print(f"Interrupted run not resumed, switching the heater off: {reason}")
+        self.journal.reopen()
+        try:
+            self.stop_heat3_master(f"not resumed: {reason}")
+        except CommunicationError as e:
+            print(f"Error stopping HEAT3-PS: {e}")
+            messagebox.showerror("Run not resumed", f"The interrupted run was not resumed, because {reason}. "
+                                                    f"Switching the heater off FAILED ({e}): check it by hand.")
+            return
+        messagebox.showwarning("Run not resumed", f"The interrupted run was not resumed, because {reason}. "
+                                                  "The heater was switched off.")
+
+    def program_finished(self, program):
+        """Called by the executor when the heating program ends."""
+        if not self.running:
+            return
+        if program.completed:
+            # End of the operation, reset the button and re-enable controls
+            self.stop_heat3_master()
+            return
+        # Failed or aborted while the run is on: do not leave the heater on the last setpoint
+        reason = f"program failed: {program.error}" if program.error else "program aborted"
+        print(f"Heating {reason}, switching the heater off")
+        try:
+            self.stop_heat3_master(reason)
+        except CommunicationError as e:
+            print(f"Error stopping HEAT3-PS: {e}")
+
+    def stream_ramp(self, profile, start, end, seconds):
+        """Ramp by streaming a setpoint trajectory instead of using the firmware ramp."""
+        if seconds <= 0:
+            self.send_command(self.heat3.set_setpoint_t_mode, self.heat3_channel, self.celsius_to_kelvin(end))
+            return
+        # Keep the firmware ramp just above the steepest part of the profile so it
+        # follows the stream but still limits the rate if the host stalls
+        peak_rate = abs(end - start) / (seconds / 60) * peak_rate_factor(profile)
+        self.send_command(self.heat3.set_ramp_rate_t_mode, self.heat3_channel, peak_rate * self.ramp_margin)
+        self.streamer.start(profile, start, end, seconds)
+
+    def stream_setpoint(self, sp_value):
+        if not (self.running and self.heat3_thread_running):
+            raise CommunicationError("Run stopped")
+        if self.degas_enabled:
+            sp_value = self.degas.track(sp_value)
+        self.send_command(self.heat3.set_setpoint_t_mode, self.heat3_channel, self.celsius_to_kelvin(sp_value))
+
+    def degas_hold(self, set_temp):
+        """Program hold callback: keep the program clock still while degassing."""
+        if not self.degas_enabled:
+            return False
+        if self.streamer.active:
+            # set_temp is the end of the streamed ramp; degas follows the stream instead
+            return self.degas.holding
+        return self.degas.hold(set_temp)
+
+    def post_degas_setpoint(self, sp_value):
+        """Queue a degas setpoint without waiting, so the gauge loop never blocks on HEAT3."""
+        if self.running and self.heat3_thread_running:
+            self.post_command(self.heat3.set_setpoint_t_mode, self.heat3_channel, self.celsius_to_kelvin(sp_value))
+
+    def update_degas_limits(self, *args):
+        try:
+            self.degas.configure(float(self.pressure_base_value.get()), float(self.pressure_limit_value.get()))
+        except ValueError:
+            pass  # Keep the last valid limits while the entry is being edited
 
     def kelvin_to_celsius(self, temp):
-        if self.unit_value.get() == "C":
+        if self.unit == "C":
             return (temp - 273.15)  # Convert Kelvin to Celsius
         else:
             return temp  # Keep Kelvin
 
     def celsius_to_kelvin(self, temp):
-        if self.unit_value.get() == "C":
+        if self.unit == "C":
             return (temp + 273.15)  # Convert Celsius to Kelvin
         else:
             return temp  # Keep Kelvin
@@ -1,1203 +1,472 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from tkinter import font as tkFont
-from tkinter import filedialog
-import threading
-import time
-import numpy as np
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-from prevacv2TCP import prevacV2TCP
-from modbusTCP import ModbusTCP
-from xgs600 import XGS600Controller
-import threading
-from queue import Queue, Empty
-import time
-import random
-from itertools import zip_longest
-from matplotlib.ticker import FuncFormatter, MaxNLocator, MultipleLocator
-import serial
-import serial.tools.list_ports
-
-def on_closing():
-    plt.close('all')  # Close all matplotlib plots
-    root.destroy()
-
-class CommunicationError(Exception):
+import json
+import os
+import socket
+import struct
+from supervisor import enable_tcp_keepalive
+
+HEADER = 0xBB
+DEVICE_ADDRESS = 0xC8
+DEVICE_GROUP = 0xA1      # Power supplies
+LOGIC_GROUP = 0x01
+HOST_ADDRESS = 0x01
+ERROR_FLAG = 0x8000      # Set in the function code of an error answer
+
+READ = 0x00
+WRITE = 0x01
+
+# Value codecs: (struct format or None for ASCII strings, size in bytes)
+FLOAT = (">f", 4)
+UINT8 = (">B", 1)
+UINT16 = (">H", 2)
+STRING = (None, 0)
+
+# Enumerated parameters, name -> value sent to the device
+HEATING_MODES = {"RES": 0, "EB": 1}
+WORK_MODES = {"PID": 0, "Manual": 1}
+INPUTS = {"Tc1": 0, "Tc2": 1, "D1": 2, "D2": 3, "RTD": 4, "Ain1": 5, "Ain2": 6}
+EB_OUTPUTS = {"Ic": 0, "Ue": 1}
+
+# HEAT3-PS parameters: name -> (function code, value codec, indexed by channel).
+# These codes have NOT been checked against the HEAT3-PS v2 protocol manual. A wrong
+# write code sets the wrong parameter of a heater, so the driver refuses writes until
+# a table checked against the manual is loaded from PARAMETER_FILE (see load_parameters).
+PARAMETERS = {
+    "product_number":           (0x0101, STRING, False),
+    "serial_number":            (0x0102, STRING, False),
+    "firmware_version":         (0x0103, STRING, False),
+    "register_host":            (0x0F01, UINT8, False),
+    "master_mode":              (0x0F02, UINT8, False),
+    "heating_mode":             (0x0201, UINT8, False),
+    "output_signal":            (0x0202, UINT8, False),
+    "operate":                  (0x0203, UINT8, True),
+    "run_hold":                 (0x0204, UINT8, True),
+    "work_mode":                (0x0205, UINT8, True),
+    "process_input":            (0x0206, UINT8, True),
+    "temperature_thermocouple": (0x0301, FLOAT, True),
+    "temperature_diode":        (0x0302, FLOAT, True),
+    "temperature_resistance":   (0x0303, FLOAT, False),
+    "process_value":            (0x0304, FLOAT, True),
+    "actual_Uc":                (0x0311, FLOAT, True),
+    "actual_Ic":                (0x0312, FLOAT, True),
+    "actual_Ue":                (0x0313, FLOAT, False),
+    "actual_Ie":                (0x0314, FLOAT, False),
+    "target_Ic":                (0x0401, FLOAT, True),
+    "target_Ue":                (0x0402, FLOAT, False),
+    "limit_Uc_res":             (0x0411, FLOAT, True),
+    "limit_Ic_res":             (0x0412, FLOAT, True),
+    "limit_Uc_eb":              (0x0421, FLOAT, False),
+    "limit_Ic_eb":              (0x0422, FLOAT, False),
+    "limit_Ue_eb":              (0x0423, FLOAT, False),
+    "limit_Ie_eb":              (0x0424, FLOAT, False),
+    "setpoint_t":               (0x0501, FLOAT, True),
+    "ramp_rate_t":              (0x0502, FLOAT, True),
+    "ramp_rate_unit_t":         (0x0503, UINT8, True),
+    "p_t":                      (0x0511, FLOAT, True),
+    "i_t":                      (0x0512, FLOAT, True),
+    "d_t":                      (0x0513, FLOAT, True),
+}
+
+CHANNELS = (1, 2, 3)
+PARAMETER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "heat3_parameters.json")
+CODECS = {"FLOAT": FLOAT, "UINT8": UINT8, "UINT16": UINT16, "STRING": STRING}
+
+class UnverifiedParameterError(RuntimeError):
     pass
 
-# Main class for the heating control system GUI
-class HeatingControlApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Prevac Heating Control System")
-        self.root.geometry("1200x1050")
-        self.root.config(padx=20, pady=20)
-
-        self.heat3 = None
-        self.mg15 = None
-        self.xgs600 = None
-
-        self.arial14 = tkFont.Font(family='Arial', size=14)
-        self.arial18 = tkFont.Font(family='Arial', size=18)
-
-        # Variables for server IPs and Ports
-        self.heat3_channel = 1
-        self.time_interval = 0.25
-        self.time_sleep = 0.2
-        self.temp_step = 5
-        self.heat3_ip = tk.StringVar(value="192.168.236.50")
-        self.heat3_port = tk.IntVar(value=502)
-        self.mg15_ip = tk.StringVar(value="127.0.0.1")
-        self.mg15_port = tk.IntVar(value=502)
-        self.xgs600_add = tk.StringVar(value="00")
-        self.xgs600_port = tk.StringVar(value="COM1")
-        self.xgs600_port_array = ["COM1", "COM2", "COM3", "COM4", "COM5", "COM6", "COM7", "COM8", "COM9"]
-
-        self.mode_array = ["Auto", "Manual"];
-        self.ic_ue_options = ["Ic", "Ue"]
-        self.heating_array = ["RES", "EB"];
-        self.temp_input_array = ["Tc1", "Tc2", "D1", "D2", "RTD", "Ain1", "Ain2"];
-        self.unit_array = ["K","C"];
-        self.vacuum_input_array = ["IG1", "IG2", "IG3", "CH1", "CH2", "CH3", "CH4"]
-
-        self.mode_value = tk.StringVar(value=self.mode_array[0])
-        self.ic_ue_value = tk.StringVar(value=self.ic_ue_options[0])
-        self.heating_value = tk.StringVar(value=self.heating_array[0])
-        self.temp_input_value = tk.StringVar(value=self.temp_input_array[0])
-        self.unit_value = tk.StringVar(value=self.unit_array[1])
-        self.vacuum_input_value = tk.StringVar(value=self.vacuum_input_array[1])
-        self.pressure_limit_value = tk.StringVar(value="1.00e-7")
-        self.pressure_base_value = tk.StringVar(value="1.00e-9")
-
-        # Variables to hold the input values
-        self.temp_value = tk.DoubleVar(value=0.1)
-        self.degass_factor = tk.DoubleVar(value=0.6)
-        self.pressure_value = tk.DoubleVar(value=0.1)
-        self.p_value = tk.StringVar(value="100")
-        self.i_value = tk.StringVar(value="20")
-        self.d_value = tk.StringVar(value="3")
-        self.num_segments_value = tk.StringVar(value="1")
-        self.repeat_value = tk.StringVar(value="0") # widget accepts string
-        self.sp_values = []
-        self.t_values = []
-        self.ic_value = tk.StringVar(value="0.0")
-        self.uc_value = tk.DoubleVar(value=0.0)
-        self.ie_value = tk.DoubleVar(value=0.0)
-        self.ue_value = tk.StringVar(value="0.0")
-        self.ic_limit_value = tk.StringVar(value="4.00")
-        self.uc_limit_value = tk.StringVar(value="5.00")
-        self.ie_limit_value = tk.StringVar(value="20")
-        self.ue_limit_value = tk.StringVar(value="1000")
-        self.plot_txt_size = 14
-        self.toggle_buttons = {}
-    
-        # Initial empty data for x and y axes
-        self.x_temp = []
-        self.y_temp = []
-        self.x_pressure = []
-        self.y_pressure = []
-
-        self.command_queue = Queue()
-
-        # For toggle button states
-        self.heat3_connected = False
-        self.mg15_connected = False
-        self.xgs600_connected = False
-        self.heat3_thread_running = False
-        self.mg15_thread_running = False
-        self.xgs600_thread_running = False
-
-        self.run_thread = None
-        self.running = False
-        
-        self.create_widgets()
-        self.plot_data = []
-
-        # Update the UI based on initial mode selections
-        self.update_mode_settings()
-        self.update_heating_settings()
-
-    def heat3_communication_thread(self):
-        """Thread dedicated to handling all TCP/IP communication with heat3."""
-        #while self.heat3_thread_running:
-        while self.heat3_connected:
-            try:
-                command, args, kwargs, response_queue = self.command_queue.get(timeout=2)
-                result = command(*args, **kwargs)
-                if response_queue:
-                    response_queue.put(result)
-            except Empty:
-                continue  # No command in queue, continue loop
-
-    def send_command(self, command, *args, **kwargs):
-        response_queue = Queue()
-        self.command_queue.put((command, args, kwargs, response_queue))
+def load_parameters(path=PARAMETER_FILE):
+    """
+    Parameter table checked against the HEAT3-PS manual, as a JSON object
+    {"operate": ["0x0203", "UINT8", true], ...} with an entry for every name of
+    PARAMETERS. Return None if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as file:
+        entries = json.load(file)
+    missing = set(PARAMETERS) - set(entries)
+    if missing:
+        raise ValueError(f"{path}: no entry for {', '.join(sorted(missing))}")
+    table = {}
+    for name, (code, codec, indexed) in entries.items():
+        if codec not in CODECS:
+            raise ValueError(f"{path}: {name}: unknown value type '{codec}'")
+        table[name] = (int(code, 0) if isinstance(code, str) else int(code), CODECS[codec], bool(indexed))
+    return table
+
+class FrameCodec:
+    def __init__(self, device_address=DEVICE_ADDRESS, device_group=DEVICE_GROUP,
+                 logic_group=LOGIC_GROUP, host_address=HOST_ADDRESS, parameters=PARAMETERS):
+        """
+        Encoder/decoder of Prevac protocol v2 frames:
+
+        header 0xBB | data length | device address | device group | logic group |
+        host address | function code (2 bytes) | access | data | checksum
+
+        The checksum is the sum of every byte after the header, modulo 256. The
+        addressing bytes never change, so the frame prefix of every parameter and its
+        partial checksum are computed once here, and read requests (which carry no
+        value) are stored as complete frames.
+        """
+        self.address = bytes([device_address, device_group, logic_group, host_address])
+        self.parameters = parameters
+        self.prefixes = {}
+        self.read_frames = {}
+        for name, (code, codec, indexed) in parameters.items():
+            for access in (READ, WRITE):
+                body = self.address + code.to_bytes(2, "big") + bytes([access])
+                self.prefixes[name, access] = (body, sum(body))
+            for channel in (CHANNELS if indexed else (None,)):
+                self.read_frames[name, channel] = self.encode(name, READ, channel)
+
+    def encode(self, name, access, channel=None, value=None):
+        """Build one request frame."""
+        cached = self.read_frames.get((name, channel)) if access == READ else None
+        if cached is not None:
+            return cached
+        code, codec, indexed = self.parameters[name]
+        data = bytes([channel]) if indexed else b""
+        if value is not None:
+            data += self.pack(codec, value)
+        body, body_sum = self.prefixes[name, access]
+        length = len(data)
+        checksum = (length + body_sum + sum(data)) & 0xFF
+        return bytes([HEADER, length]) + body + data + bytes([checksum])
+
+    @staticmethod
+    def pack(codec, value):
+        fmt, size = codec
+        if fmt is None:
+            return str(value).encode("ascii")
+        if fmt == ">f":
+            return struct.pack(fmt, float(value))
+        return struct.pack(fmt, int(value))
+
+    @staticmethod
+    def unpack(codec, data):
+        fmt, size = codec
+        if fmt is None:
+            return data.decode("ascii", errors="replace").rstrip("\x00 ")
+        return struct.unpack(fmt, data[:size])[0]
+
+    def decode(self, frame, name, channel=None):
+        """
+        Check an answer frame and return the value of parameter name (None for an
+        answer to a write). Raise ValueError on a malformed frame or a device error.
+        """
+        if frame[0] != HEADER:
+            raise ValueError(f"Bad frame header 0x{frame[0]:02X}")
+        if sum(frame[1:-1]) & 0xFF != frame[-1]:
+            raise ValueError("Frame checksum mismatch")
+        code, codec, indexed = self.parameters[name]
+        answer_code = int.from_bytes(frame[6:8], "big")
+        data = frame[9:-1]
+        if answer_code == code | ERROR_FLAG:
+            raise ValueError(f"HEAT3-PS rejected {name}: error {data[0] if data else '?'}")
+        if answer_code != code:
+            raise ValueError(f"Answer for function 0x{answer_code:04X}, expected 0x{code:04X} ({name})")
+        if indexed:
+            data = data[1:]   # Echoed channel
+        if not data:
+            return None
+        return self.unpack(codec, data)
+
+class prevacV2TCP:
+    def __init__(self, ip_address, port=502, timeout=2.0, parameter_file=PARAMETER_FILE, pipelined=False):
+        """
+        HEAT3-PS driver for the Prevac protocol v2 over TCP.
+
+        Without a parameter file checked against the manual (see load_parameters),
+        the built-in codes are used for reads only and every write raises
+        UnverifiedParameterError.
+
+        :param ip_address: HEAT3-PS IP address
+        :param port: TCP port of the protocol server
+        :param timeout: Answer timeout in seconds
+        :param pipelined: Let read_many send its requests back to back; only if the
+            device is known to queue requests, otherwise they go one at a time
+        """
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout
+        self.pipelined = pipelined
+        self.sock = None
+        parameters = load_parameters(parameter_file) if parameter_file else None
+        self.verified = parameters is not None
+        self.parameters = parameters or PARAMETERS
+        self.codec = FrameCodec(parameters=self.parameters)
+
+    def connect(self):
+        """
+        Create and open a TCP socket connection to the HEAT3-PS.
+        """
         try:
-            return response_queue.get(timeout=2)
-        except Empty:
-            if self.running:
-                self.running = False
-                self.start_pause_button.config(text="Stop", bg="red")
-                self.enable_controls()  # Re-enable Mode and Heating selection
-
-            self.heat3_connected = False
-            self.heat3_thread_running = False
-
-            # Clear product and serial numbers
-            self.heat3_product_label.config(text="")
-            self.heat3_serial_label.config(text="")
-            self.toggle_buttons["HEAT3-PS IP:"].config(text="Disconnect", bg="red")
-
-            raise CommunicationError("Timeout during TCP/IP communication.")
-
-    def create_widgets(self):
-        # First row: HEAT3-PS IP and Port input with connect/disconnect button
-        self.add_row_label_input_toggle_button(0, "HEAT3-PS IP:", self.heat3_ip, self.heat3_port, self.toggle_heat3_connection)
-
-        # Labels for MG15 Product and Serial Number
-        self.heat3_product_label = tk.Label(self.root, text="", font=self.arial14)
-        self.heat3_product_label.grid(row=0, column=4, padx=5, sticky=tk.W)
-        self.heat3_serial_label = tk.Label(self.root, text="", font=self.arial14)
-        self.heat3_serial_label.grid(row=0, column=5, padx=5, sticky=tk.W)
-
-        # Second row: MG15 IP and Port input with connect/disconnect button
-        self.add_row_label_input_toggle_button(1, "MG15         IP:", self.mg15_ip, self.mg15_port, self.toggle_mg15_connection)
-
-        # Labels for MG15 Product and Serial Number
-        self.mg15_product_label = tk.Label(self.root, text="", font=self.arial14)
-        self.mg15_product_label.grid(row=1, column=4, padx=5, sticky=tk.W)
-        self.mg15_serial_label = tk.Label(self.root, text="", font=self.arial14)
-        self.mg15_serial_label.grid(row=1, column=5, padx=5, sticky=tk.W)
-
-        # Third row: XGS-600 Address and Port input with connect/disconnect button
-        self.add_second_row(2, "XGS-600 Add:", self.xgs600_add, self.xgs600_port, self.toggle_xgs600_connection)
-        
-        # Labels for XGS-600 Software Revision
-        self.xgs600_sw_version_label = tk.Label(self.root, text="", font=self.arial14)
-        self.xgs600_sw_version_label.grid(row=2, column=4, padx=5, sticky=tk.W)
-
-        # Third row: Mode and Heating dropboxes, temperature display and unit selection
-        self.add_third_row()
-
-        self.add_degas_row()                                                                      
-        # Fourth row: Pressure control and PID settings
-        self.add_fourth_row()
-
-        # Fifth row: Ramp/level settings and graph plot
-        self.add_fifth_row()
-
-        # Sixth row: Real-time temperature plot
-        self.add_sixth_row()
-
-        # Last row: Control buttons
-        self.add_control_buttons()
-
-    def add_row_label_input_toggle_button(self, row, label, ip_var, port_var, toggle_callback):
-        tk.Label(self.root, width=11, text=label, font=self.arial14).grid(row=row, padx=0, pady=0, column=0, sticky=tk.W)
-        ip_entry = tk.Entry(self.root, font=self.arial14, width=15, textvariable=ip_var)
-        ip_entry.grid(row=row, column=1, padx=0, sticky=tk.W)
-
-        #tk.Label(self.root, text=label, font=self.arial14).grid(row=row, column=2, sticky=tk.W)
-        port_entry = tk.Entry(self.root, font=self.arial14, width=5, textvariable=port_var)
-        port_entry.grid(row=row, column=2, padx=0, sticky=tk.W)
-
-        toggle_button = tk.Button(self.root, text="Disconnect", font=self.arial14, bg="red", command=lambda: toggle_callback(toggle_button))
-        toggle_button.grid(row=row, column=3, padx=0, sticky=tk.W)
-
-        self.toggle_buttons[label] = toggle_button
-
-    def add_second_row(self, row, label, add_var, port_var, toggle_callback):
-        tk.Label(self.root, width=11, text=label, font=self.arial14).grid(row=row, padx=0, pady=0, column=0, sticky=tk.W)
-        ip_entry = tk.Entry(self.root, font=self.arial14, width=15, textvariable=add_var)
-        ip_entry.grid(row=row, column=1, padx=0, sticky=tk.W)
-
-        port_entry = ttk.Combobox(self.root, font=self.arial14, values=self.xgs600_port_array, width=5, textvariable=port_var)
-        port_entry.grid(row=row, column=2, padx=0, sticky=tk.W)
-        port_entry.current(3)
-
-        toggle_button = tk.Button(self.root, text="Disconnect", font=self.arial14, bg="red", command=lambda: toggle_callback(toggle_button))
-        toggle_button.grid(row=row, column=3, padx=0, sticky=tk.W)
-
-        self.toggle_buttons[label] = toggle_button
-
-    def toggle_heat3_connection(self, button):
-        if not self.heat3_connected:
-            # Connect
-            self.heat3 = prevacV2TCP(self.heat3_ip.get(), self.heat3_port.get())
-            if self.heat3.connect():
-
-                # Start the HEAT3-PS reading thread
-                self.x_temp = []
-                self.y_temp = []
-                self.x_temp.clear()
-                self.y_temp.clear()
-                self.temp_line.set_data([], [])
-                self.heat3_connected = True
-                self.heat3_thread_running = True
-                self.comm_thread = threading.Thread(target=self.heat3_communication_thread)
-                self.comm_thread.start()
-                self.heat3_thread = threading.Thread(target=self.read_heat3_data)
-                self.heat3_thread.start()
-                #self.schedule_read_heat3_data()
-
-                product_number = self.send_command(self.heat3.r_product_number)
-                serial_number  = self.send_command(self.heat3.r_serial_number)
-                self.heat3_product_label.config(text=f"{product_number}")
-                self.heat3_serial_label.config(text=f"{serial_number}")
-                self.send_command(self.heat3.register_new_host)
-
-                button.config(text="Connected", bg="green")
-                self.create_plot()
-        else:
-            if self.running:
-                self.stop_heat3_master()
-            self.heat3_connected = False
-            self.heat3_thread_running = False
-            # Stop the HEAT3-PS thread
-            #self.heat3_thread.join()  # Wait for the thread to finish
-            #self.comm_thread.join()
-
-            # Clear product and serial numbers
-            self.heat3_product_label.config(text="")
-            self.heat3_serial_label.config(text="")
-            button.config(text="Disconnect", bg="red")
-            # Disconnect
-            #if self.heat3:
-            #    self.heat3.close()
-
-    def toggle_mg15_connection(self, button):
-        if not self.mg15_connected:
-            # Connect
-            self.mg15 = ModbusTCP(self.mg15_ip.get(), self.mg15_port.get())
-            if self.mg15.connect():
-                self.toggle_buttons["XGS-600 Add:"].config(state="disabled")
-                
-                # Start the MG15 reading thread
-                self.mg15_thread_running = True
-                self.mg15_thread = threading.Thread(target=self.read_mg15_data)
-                self.mg15_thread.start()
-
-                product_number = self.mg15.read_product_number()
-                serial_number = self.mg15.read_serial_number()
-                self.mg15_product_label.config(text=f"{product_number}")
-                self.mg15_serial_label.config(text=f"{serial_number}")
-                button.config(text="Connected", bg="green")
-                self.mg15_connected = True
-        else:
-            self.mg15_stop()
-            #if self.mg15:
-            #    self.mg15.close()
-
-    def toggle_xgs600_connection(self, button):
-        if not self.xgs600_connected:
-            available_ports = [port.device for port in serial.tools.list_ports.comports()]
-            selected_port = self.xgs600_port.get().strip()
-            ports_to_try = []
-            
-            if selected_port and selected_port in available_ports:
-                ports_to_try.append(selected_port)
-
-            ports_to_try += [p for p in available_ports if p != selected_port]
-            comm = False
-
-            for port in ports_to_try:
-                try:
-                    self.xgs600 = XGS600Controller(self.xgs600_add.get(), port, timeout=1)
-                    if self.xgs600.connect():
-                        sw_version = self.xgs600.read_sw_version()
-                        if sw_version:
-                            comm = True
-                            self.xgs600_port.set(port)
-                            self.xgs600_sw_version_label.config(text=f"{sw_version}")
-                            button.config(text="Connected", bg="green")
-                            self.xgs600_connected = True
-                            self.toggle_buttons["MG15         IP:"].config(state="disabled")
-                            self.x_pressure = []
-                            self.y_pressure = []
-                            self.x_pressure.clear()
-                            self.y_pressure.clear()
-                            self.pressure_line.set_data([], [])
-                            self.xgs600_thread_running = True
-                            self.xgs600_thread = threading.Thread(target=self.read_xgs600_data)
-                            self.xgs600_thread.start()
-                            break
-                
-                except Exception as e:
-                    #print(f"Failed to connect on {port}: {e}")
-                    continue
-
-            if not comm:
-                #print("No XGS-600 device found on any COM port.")
-                button.config(text="Disconnect", bg="red")
-        else:
-            self.xgs600_stop()
-
-    def add_third_row(self):
-        tk.Label(self.root, text="Working Mode:", font=self.arial14).grid(row=3, column=0, sticky=tk.W)
-
-        mode_frame = tk.Frame(self.root)
-        self.mode = ttk.Combobox(mode_frame, font=self.arial14, values=self.mode_array, width=6, textvariable=self.mode_value)
-        self.mode.pack(side="left", padx=0)
-        self.mode.current(0)
-        self.mode.bind("<<ComboboxSelected>>", lambda e: self.update_mode_settings())
-        # Add the Ic/Ue Combobox inside the frame (hidden initially)
-        self.ic_ue_combobox = ttk.Combobox(mode_frame, font=self.arial14, values=self.ic_ue_options, width=4, textvariable=self.ic_ue_value)
-        self.ic_ue_combobox.pack(side="left", padx=0)  # Pack it next to the Heating Mode Combobox
-        self.ic_ue_combobox.pack_forget()  # Hide initially
-        self.ic_ue_combobox.bind("<<ComboboxSelected>>", lambda e: self.update_ic_ue_controls())
-        mode_frame.grid(row=3, column=1, padx=0, sticky=tk.W)
-
-        tk.Label(self.root, text="Heating Mode:", font=self.arial14).grid(row=3, column=2, sticky=tk.W)
-        self.heating = ttk.Combobox(self.root, font=self.arial14, values=self.heating_array, width=4, textvariable=self.heating_value)
-        self.heating.grid(row=3, column=3, padx=0, sticky=tk.W)
-        self.heating.current(0)
-        self.heating.bind("<<ComboboxSelected>>", lambda e: self.update_mode_settings())
-
-        #tk.Label(self.root, text="Input:", font=self.arial14).grid(row=3, column=4, sticky=tk.W)
-        self.temp_input = ttk.Combobox(self.root, font=self.arial14, values=self.temp_input_array, width=5, textvariable=self.temp_input_value)
-        self.temp_input.grid(row=3, column=4, padx=0, sticky=tk.W)
-        #self.temp_input.current(0)
-        #self.temp_input.bind("<<ComboboxSelected>>", lambda e: self.update_temp_input())
-
-        self.temp_display = tk.Label(self.root, textvariable=self.temp_value, font=self.arial18, width=8)
-        self.temp_display.grid(row=3, column=5, padx=0, sticky="e")
-
-        #tk.Label(self.root, font=self.arial14).grid(row=3, column=7, sticky=tk.W)
-        self.temp_unit = ttk.Combobox(self.root, font=self.arial18, values=self.unit_array, width=3, textvariable=self.unit_value)
-        self.temp_unit.grid(row=3, column=6, padx=0, sticky=tk.W)
-        self.temp_unit.current(1)
-        #self.temp_input.bind("<<ComboboxSelected>>", lambda e: self.update_temp_unit())
-
-    def add_degas_row(self):
-        self.degas_var = tk.IntVar()
-        self.degas_check = tk.Checkbutton(self.root, text="Degas", font=self.arial14, variable=self.degas_var, command=self.toggle_degas)
-        self.degas_check.grid(row=4, column=0, sticky=tk.W)
-
-        tk.Label(self.root, text="Limit:", font=self.arial14).grid(row=4, column=1, sticky=tk.W)
-        self.pressure_limit = tk.Entry(self.root, font=self.arial14, width=7, textvariable=self.pressure_limit_value)
-        self.pressure_limit.grid(row=4, column=1, padx=0, sticky=tk.E)
-
-        tk.Label(self.root, text="Base:", font=self.arial14).grid(row=4, column=2, sticky=tk.W)
-        self.pressure_base = tk.Entry(self.root, font=self.arial14, width=7, textvariable=self.pressure_base_value)
-        self.pressure_base.grid(row=4, column=2, padx=0, sticky=tk.E)
-
-        self.pressure_label = tk.Label(self.root, text="mbar", font=self.arial14)
-        self.pressure_label.grid(row=4, column=3, sticky=tk.W)
-
-        # Initial state is greyed out
-        self.toggle_degas()
-
-        #tk.Label(self.root, text="Channel:", font=self.arial14).grid(row=4, column=13, sticky=tk.W)
-        self.channel = ttk.Combobox(self.root, font=self.arial14, values=self.vacuum_input_array, width=5, textvariable=self.vacuum_input_value)
-        self.channel.grid(row=4, column=4, padx=0, sticky=tk.W)
-
-        self.pressure_display = tk.Label(self.root, textvariable=self.pressure_value, font=self.arial18, width=8)
-        self.pressure_display.grid(row=4, column=5, padx=0, sticky='e')
-        tk.Label(self.root, text="mbar", font=self.arial18).grid(row=4, column=6, sticky=tk.W)
-
-    def toggle_degas(self):
-        if self.degas_var.get():
-            self.pressure_limit.config(state="normal")
-            self.pressure_base.config(state="normal")
-            self.pressure_label.config(state="normal")
-        else:
-            self.pressure_limit.config(state="disabled")
-            self.pressure_base.config(state="disabled")
-            self.pressure_label.config(state="disabled")
-
-    def add_fourth_row(self):
-        # Frame to contain the two columns
-        self.fourth_row_frame = tk.Frame(self.root)
-        self.fourth_row_frame.grid(row=5, column=0, columnspan=17, pady=10, sticky=tk.W)
-
-        # First Column (PID Settings)
-        self.pid_frame = tk.LabelFrame(self.fourth_row_frame, text="PID Settings", font=self.arial14)
-        self.pid_frame.grid(row=0, column=0, padx=10, sticky=tk.W)
-
-        tk.Label(self.pid_frame, text="P:", font=self.arial14).grid(row=0, column=0, sticky=tk.E)
-        self.p_entry = tk.Entry(self.pid_frame, font=self.arial14, width=5, textvariable=self.p_value)
-        self.p_entry.grid(row=0, column=1, padx=5, sticky=tk.W)
-
-        tk.Label(self.pid_frame, text="I:", font=self.arial14).grid(row=0, column=2, sticky=tk.E)
-        self.i_entry = tk.Entry(self.pid_frame, font=self.arial14, width=5, textvariable=self.i_value)
-        self.i_entry.grid(row=0, column=3, padx=5, sticky=tk.W)
-
-        tk.Label(self.pid_frame, text="D:", font=self.arial14).grid(row=0, column=4, sticky=tk.E)
-        self.d_entry = tk.Entry(self.pid_frame, font=self.arial14, width=5, textvariable=self.d_value)
-        self.d_entry.grid(row=0, column=5, padx=5, sticky=tk.W)
-
-        tk.Label(self.pid_frame, text="Number of Segments:", font=self.arial14).grid(row=1, column=0, sticky=tk.W)
-        self.num_segments_entry = tk.Entry(self.pid_frame, font=self.arial14, width=5, textvariable=self.num_segments_value)
-        self.num_segments_entry.grid(row=1, column=1, padx=5, sticky=tk.W)
-
-        tk.Label(self.pid_frame, text="Repeat:", font=self.arial14).grid(row=1, column=2, sticky=tk.W)
-        self.repeat_entry = tk.Entry(self.pid_frame, font=self.arial14, width=5, textvariable=self.repeat_value)
-        self.repeat_entry.grid(row=1, column=3, padx=5, sticky=tk.W)
-
-        # Second Column (Manual Control Inputs)
-        self.manual_frame = tk.LabelFrame(self.fourth_row_frame, text="Manual Control", font=self.arial14)
-        self.manual_frame.grid(row=0, column=1, padx=10, sticky=tk.W)
-
-        tk.Label(self.manual_frame, text="Ic:", font=self.arial14).grid(row=0, column=0, sticky=tk.W)
-        self.ic_entry = tk.Entry(self.manual_frame, font=self.arial14, width=6, textvariable=self.ic_value)
-        self.ic_entry.grid(row=0, column=1, padx=5)
-        self.ic_entry.bind("<MouseWheel>", self.change_ic_value)
-        self.ic_entry.bind("<Return>", self.ic_value_entered)  # Bind keyboard "Enter" for Ic entry
-        self.ic_entry.bind("<FocusOut>", self.ic_value_entered)
-        tk.Label(self.manual_frame, text="A", font=self.arial14).grid(row=0, column=2, sticky=tk.W)
-
-        tk.Label(self.manual_frame, text="Uc:", font=self.arial14).grid(row=0, column=3, sticky=tk.W)
-        self.uc_display = tk.Label(self.manual_frame, font=self.arial14, width=6, textvariable=self.uc_value)
-        self.uc_display.grid(row=0, column=4, padx=5)
-        tk.Label(self.manual_frame, text="V", font=self.arial14).grid(row=0, column=5, sticky=tk.W)
-
-        # Second row in manual frame
-        tk.Label(self.manual_frame, text="Ie:", font=self.arial14)
-        self.ie_display = tk.Label(self.manual_frame, font=self.arial14, width=6, textvariable=self.ie_value)
-        #self.ie_display.grid(row=0, column=4, padx=5, sticky=tk.W)
-        tk.Label(self.manual_frame, text="mA", font=self.arial14)
-
-        tk.Label(self.manual_frame, text="Ue:", font=self.arial14)
-        self.ue_entry = tk.Entry(self.manual_frame, font=self.arial14, width=6, textvariable=self.ue_value)
-        self.ue_entry.bind("<MouseWheel>", self.change_ue_value)
-        self.ue_entry.bind("<Return>", self.ue_value_entered)  # Bind keyboard "Enter" for Ic entry
-        self.ue_entry.bind("<FocusOut>", self.ue_value_entered)
-        tk.Label(self.manual_frame, text="V", font=self.arial14)
-
-        # Third Column (Limit Control Inputs)
-        self.limit_frame = tk.LabelFrame(self.fourth_row_frame, text="Limit", font=self.arial14)
-        self.limit_frame.grid(row=0, column=2, padx=10, sticky=tk.W)
-
-        tk.Label(self.limit_frame, text="Ic:", font=self.arial14).grid(row=0, column=0, sticky=tk.W)
-        self.ic_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.ic_limit_value)
-        self.ic_limit_entry.grid(row=0, column=1, padx=5)
-        self.ic_limit_entry.bind("<Return>", self.ic_limit_value_entered)
-        self.ic_limit_entry.bind("<FocusOut>", self.ic_limit_value_entered)
-        tk.Label(self.limit_frame, text="A", font=self.arial14).grid(row=0, column=2, sticky=tk.W)
-
-        tk.Label(self.limit_frame, text="Uc:", font=self.arial14).grid(row=0, column=3, sticky=tk.W)
-        self.uc_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.uc_limit_value)
-        self.uc_limit_entry.grid(row=0, column=4, padx=5)
-        self.uc_limit_entry.bind("<Return>", self.uc_limit_value_entered)
-        self.uc_limit_entry.bind("<FocusOut>", self.uc_limit_value_entered)
-        tk.Label(self.limit_frame, text="V", font=self.arial14).grid(row=0, column=5, sticky=tk.W)
-
-        # Second row in manual frame
-        tk.Label(self.limit_frame, text="Ie:", font=self.arial14)
-        self.ie_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.ie_limit_value)
-        self.ie_limit_entry.bind("<Return>", self.ie_limit_value_entered)
-        self.ie_limit_entry.bind("<FocusOut>", self.ie_limit_value_entered)
-        tk.Label(self.limit_frame, text="mA", font=self.arial14)
-
-        tk.Label(self.limit_frame, text="Ue:", font=self.arial14)
-        self.ue_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.ue_limit_value)
-        self.ue_limit_entry.bind("<Return>", self.ue_limit_value_entered)
-        self.ue_limit_entry.bind("<FocusOut>", self.ue_limit_value_entered)
-        tk.Label(self.limit_frame, text="V", font=self.arial14)
-        # Place these widgets conditionally based on Heating mode
-        #self.update_heating_settings()
-        
-    def change_ic_value(self, event):
-        """Change Ic value based on scroll up or down and send the new value to heat3."""
-        if event.delta > 0:  # Scroll up
-            new_value = float(self.ic_value.get()) + 0.01  # Increment by 0.1 (adjust as needed)
-        else:  # Scroll down
-            new_value = float(self.ic_value.get()) - 0.01  # Decrement by 0.1 (adjust as needed)
-
-        new_value = max(0, new_value)  # Ensure the value doesn't go below 0
-        self.ic_value.set(new_value)  # Update the entry field with the new value
-
-        # Send the new Ic target value to heat3
-        if self.running and self.heat3_thread_running:
-            self.send_command(self.heat3.set_Ic_target_value,self.heat3_channel, new_value)
-
-    def change_ue_value(self, event):
-        """Change Ue value based on scroll up or down and send the new value to heat3."""
-        if event.delta > 0:  # Scroll up
-            new_value = float(self.ue_value.get()) + 1  # Increment by 0.1 (adjust as needed)
-        else:  # Scroll down
-            new_value = float(self.ue_value.get()) - 1  # Decrement by 0.1 (adjust as needed)
-
-        new_value = max(0, new_value)  # Ensure the value doesn't go below 0
-        self.ue_value.set(new_value)  # Update the entry field with the new value
-
-        # Send the new Ue target value to heat3
-        if self.running and self.heat3_thread_running:
-            self.send_command(self.heat3.set_Ue_target_value,new_value)
-        
-    def ic_value_entered(self, event):
-        """Update Ic target value when the user presses Enter or leaves the entry field."""
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect((self.ip_address, self.port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            enable_tcp_keepalive(self.sock)
+            print(f"Connected to {self.ip_address}:{self.port}")
+            return True
+        except socket.timeout:
+            self.sock = None
+            raise TimeoutError(f"Connection to {self.ip_address}:{self.port} timed out")
+        except socket.error as e:
+            print(f"Failed to connect to {self.ip_address}:{self.port}: {e}")
+            self.sock = None
+            return False
+
+    def close(self):
+        """Close the TCP connection."""
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+            print(f"Disconnected from {self.ip_address}:{self.port}")
+
+    def receive_frame(self):
+        """Read exactly one frame; the length byte tells how much data follows."""
+        start = self.receive_exact(2)
+        return start + self.receive_exact(start[1] + 8)
+
+    def receive_exact(self, size):
+        """Read size bytes, raising ConnectionError if the peer closes the connection."""
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by peer")
+            data.extend(chunk)
+        return bytes(data)
+
+    def transact(self, frames):
+        """
+        Send request frames back to back, then read one answer per frame, so several
+        requests cost one round trip.
+        """
+        if self.sock is None:
+            raise ConnectionError("Socket is not connected. Call connect() first.")
         try:
-            new_value = float(self.ic_value.get())  # Get the new value from the entry
-            if self.running and self.heat3_thread_running:
-                self.send_command(self.heat3.set_Ic_target_value,self.heat3_channel, new_value)  # Send the updated value to heat3
-        except ValueError:
-            print("Invalid input for Ic value. Please enter a valid number.")
-
-    def ue_value_entered(self, event):
-        """Update Ue target value when the user presses Enter or leaves the entry field."""
-        try:
-            new_value = float(self.ue_value.get())  # Get the new value from the entry
-            if self.running and self.heat3_thread_running:
-                self.send_command(self.heat3.set_Ue_target_value,new_value)  # Send the updated value to heat3
-        except ValueError:
-            print("Invalid input for Ue value. Please enter a valid number.")
+            self.sock.sendall(b"".join(frames))
+            return [self.receive_frame() for _ in frames]
+        except socket.timeout:
+            raise TimeoutError("Receiving data timed out")
+        except socket.error as e:
+            raise ConnectionError(f"Failed to send or receive data: {e}")
+
+    def read(self, name, channel=None):
+        """Read one parameter of the PARAMETERS table."""
+        channel = self.check_channel(name, channel)
+        frame = self.codec.encode(name, READ, channel)
+        return self.codec.decode(self.transact([frame])[0], name, channel)
+
+    def write(self, name, value, channel=None):
+        """Write one parameter of the PARAMETERS table."""
+        if not self.verified:
+            raise UnverifiedParameterError(
+                f"HEAT3-PS write of {name} refused: the function codes are not verified, "
+                f"provide {os.path.basename(PARAMETER_FILE)} checked against the protocol manual")
+        channel = self.check_channel(name, channel)
+        frame = self.codec.encode(name, WRITE, channel, value)
+        self.codec.decode(self.transact([frame])[0], name, channel)
+
+    def read_many(self, requests):
+        """
+        Run several read methods of this driver: in one pipelined exchange if the
+        driver was created with pipelined=True, otherwise one request at a time.
+
+        :param requests: List of (method name, args), e.g. [("r_actual_value_Uc", (1,))]
+        :return: List of values in the same order
+        """
+        reads = [getattr(self, method)(*args, plan=True) for method, args in requests]
+        frames = [self.codec.encode(name, READ, channel) for name, channel, _ in reads]
+        if self.pipelined:
+            answers = self.transact(frames)
+        else:
+            answers = [self.transact([frame])[0] for frame in frames]
+        return [convert(self.codec.decode(answer, name, channel))
+                for (name, channel, convert), answer in zip(reads, answers)]
+
+    def check_channel(self, name, channel):
+        indexed = self.parameters[name][2]
+        if not indexed:
+            return None
+        if channel not in CHANNELS:
+            raise ValueError(f"Channel must be one of {CHANNELS}, got {channel!r}")
+        return channel
+
+    def _read(self, name, channel=None, plan=False, convert=float):
+        """Read name, or with plan=True return what read_many needs to batch it."""
+        if plan:
+            return name, self.check_channel(name, channel), convert
+        return convert(self.read(name, channel))
+
+    @staticmethod
+    def lookup(table, value, what):
+        if value not in table:
+            raise ValueError(f"Invalid {what} '{value}'. Must be one of {', '.join(table)}.")
+        return table[value]
+
+    # Identity
+
+    def register_new_host(self):
+        """Register this program as host; required after every (re)connect before writes."""
+        if self.verified:
+            self.write("register_host", HOST_ADDRESS)
+
+    def r_product_number(self, plan=False):
+        return self._read("product_number", plan=plan, convert=str)
+
+    def r_serial_number(self, plan=False):
+        return self._read("serial_number", plan=plan, convert=str)
+
+    def r_firmware_version(self, plan=False):
+        return self._read("firmware_version", plan=plan, convert=str)
+
+    # Control
+
+    def master_mode(self, state):
+        """
+        Take (1) or release (0) remote control of the front panel.
+        """
+        self.write("master_mode", 1 if state else 0)
+
+    def r_master_mode(self, plan=False):
+        return self._read("master_mode", plan=plan, convert=int)
+
+    def operate_control(self, channel, state):
+        """Switch the output of a channel on (1) or off (0)."""
+        self.write("operate", 1 if state else 0, channel)
+
+    def r_operate_control(self, channel, plan=False):
+        return self._read("operate", channel, plan, int)
+
+    def run_hold_control(self, channel, state):
+        """Run (1) or hold (0) the temperature program of a channel."""
+        self.write("run_hold", 1 if state else 0, channel)
+
+    def r_run_hold_control(self, channel, plan=False):
+        return self._read("run_hold", channel, plan, int)
+
+    def set_heating_mode(self, mode):
+        """
+        :param mode: "RES" (resistive) or "EB" (electron bombardment)
+        """
+        self.write("heating_mode", self.lookup(HEATING_MODES, mode, "heating mode"))
+
+    def set_work_mode(self, channel, mode):
+        """
+        :param mode: "PID" (temperature control) or "Manual" (fixed output)
+        """
+        self.write("work_mode", self.lookup(WORK_MODES, mode, "work mode"), channel)
+
+    def set_input_selection_for_process_value(self, channel, source):
+        """
+        :param source: Tc1, Tc2, D1, D2, RTD, Ain1 or Ain2
+        """
+        self.write("process_input", self.lookup(INPUTS, source, "input"), channel)
+
+    def set_output_signal_Ue_UcIc(self, output):
+        """
+        EB mode: regulate the emission with Ic ("Ic") or with Ue ("Ue").
+        """
+        self.write("output_signal", self.lookup(EB_OUTPUTS, output, "output signal"))
+
+    # Measurements (temperatures in K, voltages in V, currents in A)
+
+    def r_temperature_from_thermocouple(self, source, plan=False):
+        """
+        :param source: "Tc1" or "Tc2"
+        """
+        channel = {"Tc1": 1, "Tc2": 2}.get(source)
+        if channel is None:
+            raise ValueError(f"Invalid thermocouple '{source}'. Must be Tc1 or Tc2.")
+        return self._read("temperature_thermocouple", channel, plan)
+
+    def r_temperature_from_diode(self, source, plan=False):
+        """
+        :param source: "D1" or "D2"
+        """
+        channel = {"D1": 1, "D2": 2}.get(source)
+        if channel is None:
+            raise ValueError(f"Invalid diode '{source}'. Must be D1 or D2.")
+        return self._read("temperature_diode", channel, plan)
+
+    def r_temperature_from_resistance(self, plan=False):
+        return self._read("temperature_resistance", plan=plan)
 
-    def ic_limit_value_entered(self, event):
-        try:
-            new_value = float(self.ic_limit_value.get())  # Get the new value from the entry
-            if self.mode_value.get() == "RES":
-                if self.running and self.heat3_thread_running:
-                    self.send_command(self.heat3.set_Ic_limit_res_mode,self.heat3_channel, new_value)
-            else:
-                if self.running and self.heat3_thread_running:
-                    self.send_command(self.heat3.set_Ic_limit_eb_mode, new_value)
-        except ValueError:
-            print("Invalid input for limit Ic value. Please enter a valid number.")
-
-    def uc_limit_value_entered(self, event):
-        try:
-            new_value = float(self.uc_limit_value.get())  # Get the new value from the entry
-            if self.mode_value.get() == "RES":
-                if self.running and self.heat3_thread_running:
-                    self.send_command(self.heat3.set_Uc_limit_res_mode,self.heat3_channel, new_value)
-            else:
-                if self.running and self.heat3_thread_running:
-                    self.send_command(self.heat3.set_Uc_limit_eb_mode, new_value)
-        except ValueError:
-            print("Invalid input for limit Uc value. Please enter a valid number.")
-
-    def ie_limit_value_entered(self, event):
-        try:
-            new_value = float(self.ie_limit_value.get())  # Get the new value from the entry
-            if self.running and self.heat3_thread_running:
-                self.send_command(self.heat3.set_Ie_limit_eb_mode, new_value)
-        except ValueError:
-            print("Invalid input for limit Ie value. Please enter a valid number.")
+    def r_actual_process_value(self, channel, plan=False):
+        return self._read("process_value", channel, plan)
 
-    def ue_limit_value_entered(self, event):
-        try:
-            new_value = float(self.ue_limit_value.get())  # Get the new value from the entry
-            if self.running and self.heat3_thread_running:
-                self.send_command(self.heat3.set_Ue_limit_eb_mode, new_value)
-        except ValueError:
-            print("Invalid input for limit Ue value. Please enter a valid number.")
+    def r_actual_value_Uc(self, channel, plan=False):
+        return self._read("actual_Uc", channel, plan)
 
-    def handle_free_sp_input_event(self, event):
-        try:
-            sp_value = float(self.sp_values[0].get())  # Get the new value from the entry
-            t_value = self.t_values[0].get()
-            current_temperature = self.temp_value.get()
-            diff = sp_value - current_temperature
-            ramp = abs(diff)/t_value
-  
-            if self.running and self.heat3_thread_running:   
-                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))         
-                self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
-        except ValueError:
-            print("Invalid input for free value. Please enter a valid number.")
-
-    def handle_free_t_input_event(self, event):
-        try:
-            sp_value = float(self.sp_values[0].get())  # Get the new value from the entry
-            t_value = self.t_values[0].get()
-            current_temperature = self.temp_value.get()
-            diff = sp_value - current_temperature
-            ramp = abs(diff)/t_value
-  
-            if self.running and self.heat3_thread_running:            
-                self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
-        except ValueError:
-            print("Invalid input for free value. Please enter a valid number.")
-    def update_mode_settings(self):
-        mode = self.mode_value.get()
-        heating = self.heating_value.get()
-        #print(f"Working Mode: {mode}, Heating Mode: {heating}") 
-
-        # Show the Ic/Ue Combobox only if mode is Auto and heating is EB
-        if mode == "Auto" and heating == "EB":
-            self.ic_ue_combobox.pack(side="right")  # Show the Ic/Ue Combobox
-            # Enable Manual Control in this specific case
-            for child in self.manual_frame.winfo_children():
-                child.configure(state="normal")
-        else:
-            self.ic_ue_combobox.pack_forget()  # Hide the Ic/Ue Combobox
-            # Disable Manual Control in Auto mode unless conditions are met
-            if mode == "Auto":
-                for child in self.manual_frame.winfo_children():
-                    child.configure(state="disabled")
-                if heating == "EB":
-                    self.update_ic_ue_controls()
-            else:
-                for child in self.manual_frame.winfo_children():
-                    child.configure(state="normal")
-
-        # Enable or disable PID Settings based on mode
-        if mode == "Auto":
-            for child in self.pid_frame.winfo_children():
-                child.configure(state="normal")
-            if heating == "EB":
-                self.update_ic_ue_controls()
-        else:
-            for child in self.pid_frame.winfo_children():
-                child.configure(state="disabled")
-
-        # Always update the heating settings to display the correct fields
-        self.update_heating_settings()
-
-    def update_heating_settings(self):
-        mode = self.mode_value.get()
-        heating = self.heating_value.get()
-
-        #print("Heating Mode settings")
-        if heating == "RES":
-            # Hide Ie and Ue inputs
-            for widget in self.manual_frame.grid_slaves(row=1):
-                widget.grid_remove()
-            for widget in self.limit_frame.grid_slaves(row=1):
-                widget.grid_remove()
-        else:
-            # Show Ie and Ue inputs
-            tk.Label(self.manual_frame, text="Ie:", font=self.arial14).grid(row=1, column=0, sticky=tk.W)
-            self.ie_display = tk.Label(self.manual_frame, font=self.arial14, width=6, textvariable=self.ie_value)
-            self.ie_display.grid(row=1, column=1, padx=0)
-            tk.Label(self.manual_frame, text="mA", font=self.arial14).grid(row=1, column=2, sticky=tk.W)
-
-            tk.Label(self.manual_frame, text="Ue:", font=self.arial14).grid(row=1, column=3, sticky=tk.W)
-            self.ue_entry = tk.Entry(self.manual_frame, font=self.arial14, width=6, textvariable=self.ue_value)
-            self.ue_entry.bind("<MouseWheel>", self.change_ue_value)
-            self.ue_entry.bind("<Return>", self.ue_value_entered)
-            self.ue_entry.bind("<FocusOut>", self.ue_value_entered)   
-            self.ue_entry.grid(row=1, column=4, padx=0)
-            tk.Label(self.manual_frame, text="V", font=self.arial14).grid(row=1, column=5, sticky=tk.W)
-
-            # Show Ie and Ue Limit
-            tk.Label(self.limit_frame, text="Ie:", font=self.arial14).grid(row=1, column=0, sticky=tk.W)
-            self.ie_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.ie_limit_value)
-            self.ie_limit_entry.bind("<Return>", self.ie_limit_value_entered)
-            self.ie_limit_entry.bind("<FocusOut>", self.ie_limit_value_entered)   
-            self.ie_limit_entry.grid(row=1, column=1, padx=0)
-            tk.Label(self.limit_frame, text="mA", font=self.arial14).grid(row=1, column=2, sticky=tk.W)
-
-            tk.Label(self.limit_frame, text="Ue:", font=self.arial14).grid(row=1, column=3, sticky=tk.W)
-            self.ue_limit_entry = tk.Entry(self.limit_frame, font=self.arial14, width=6, textvariable=self.ue_limit_value)
-            self.ue_limit_entry.bind("<Return>", self.ue_limit_value_entered)
-            self.ue_limit_entry.bind("<FocusOut>", self.ue_limit_value_entered)   
-            self.ue_limit_entry.grid(row=1, column=4, padx=0)
-            tk.Label(self.limit_frame, text="V", font=self.arial14).grid(row=1, column=5, sticky=tk.W)
-
-        if mode == "Auto":
-            # If in Auto mode, ensure manual frame is disabled
-            for child in self.manual_frame.winfo_children():
-                child.configure(state="disabled")
-            if heating == "EB":
-                self.update_ic_ue_controls()
-        
-    def update_ic_ue_controls(self):
-        selected_value = self.ic_ue_value.get()
-
-        if selected_value == "Ic":
-            # Enable Ue controls and disable Ic controls
-            self.ue_entry.config(state="normal")
-            self.ic_entry.config(state="disabled")
-        elif selected_value == "Ue":
-            # Enable Ic controls and disable Ue controls
-            self.ic_entry.config(state="normal")
-            self.ue_entry.config(state="disabled")
-
-    def create_segment_inputs(self):
-        # Clear any existing segment inputs
-        for widget in self.segment_frame.winfo_children():
-            widget.destroy()
-
-        num_segments_str = self.num_segments_value.get() 
-
-        # Handle empty input or invalid string
-        if not num_segments_str.strip():  # If it's empty or just whitespace
-            num_segments = 1  # Set a default
-            #self.num_segments_value.set("1")  # Reset the Entry to show 1
-        else:
-            try:
-                num_segments = int(num_segments_str)  # Convert the valid string to integer
-            except ValueError:
-                num_segments = 1  # Handle any unexpected invalid input
-                #self.num_segments_value.set("1")
-
-        # Check if we need to add more entries to the lists (new columns)
-        current_segments = len(self.t_values)
-        
-        if num_segments > current_segments:
-            # Add new segments with default zero values for SP, and T
-            for i in range(current_segments, num_segments):
-                self.sp_values.append(tk.DoubleVar(value=25))  # Append new DoubleVar with default 25
-                self.t_values.append(tk.DoubleVar(value=1))    # Append new DoubleVar with default 1
-
-        # No need to change old segments, we just create the GUI inputs for the updated number of segments
-        for i in range(num_segments):
-            column_index = i * 2  # Each segment gets its own two columns
-
-            # SP input (Setpoint temperature) and label in the same row
-            sp_label = tk.Label(self.segment_frame, text=f"SP{i + 1}", font=self.arial14, anchor='w', justify='right')
-            sp_label.grid(row=0, column=column_index, sticky="w", padx=10, pady=5)
-            sp_input = tk.Entry(self.segment_frame, width=4, textvariable=self.sp_values[i], font=self.arial14)
-            sp_input.grid(row=0, column=column_index + 1, padx=0, pady=5, sticky="w")
-
-            # T input (Time for segment) and label in the same row
-            t_label = tk.Label(self.segment_frame, text=f"T{i + 1}", font=self.arial14, anchor='w', justify='right')
-            t_label.grid(row=1, column=column_index, sticky="w", padx=10, pady=5)
-            t_input = tk.Entry(self.segment_frame, width=4, textvariable=self.t_values[i], font=self.arial14)
-            t_input.grid(row=1, column=column_index + 1, padx=0, pady=5, sticky="w")
-            # Bind event for only the first input boxes
-            if num_segments == 1:
-                sp_input.bind("<FocusOut>", self.handle_free_sp_input_event)
-                sp_input.bind("<Return>", self.handle_free_sp_input_event)
-                t_input.bind("<FocusOut>", self.handle_free_t_input_event)
-                t_input.bind("<Return>", self.handle_free_t_input_event)
-
-    def add_fifth_row(self):
-        # Create a frame for the segment inputs
-        self.segment_frame = tk.Frame(self.root)
-        self.segment_frame.grid(row=6, column=0, columnspan=17, sticky="w")  # Align to the left
-
-        self.create_segment_inputs()
-        self.num_segments_value.trace("w", lambda *args: self.create_segment_inputs())
-
-    def add_sixth_row(self):
-        # Create a frame for the plot if necessary, or embed the plot directly
-        self.plot_frame = tk.Frame(self.root)
-        self.plot_frame.grid(row=7, column=0, columnspan=8, sticky="w")
-
-        # Call the create_plot function to initialize the plot
-        self.create_plot()
-
-    def create_plot(self):
-        # Create a larger figure for the plot
-        self.fig, self.ax = plt.subplots(figsize=(12, 6))  # Adjust size as needed
-        self.ax.set_title('Real-Time Plot', fontsize=self.plot_txt_size)
-        self.ax.set_xlabel('Time (secs)', fontsize=self.plot_txt_size)
-        self.ax.set_ylabel('Temperature (°C)', fontsize=self.plot_txt_size, color='tomato')
-        
-        # Adjust ticks size (both major and minor)
-        self.ax.tick_params(axis='y', labelcolor='tomato', color='tomato')
-        self.ax.spines['left'].set_color('tomato')  # Set spine color
-
-        self.ax.tick_params(axis='both', which='major', labelsize=self.plot_txt_size)  # Major ticks
-        self.ax.tick_params(axis='both', which='minor', labelsize=self.plot_txt_size)  # Minor ticks
-
-        # Create the secondary y-axis
-        self.ax_pressure = self.ax.twinx()
-        self.ax_pressure.set_ylabel('Pressure (mbar)', fontsize=self.plot_txt_size, color='cornflowerblue')  # Set y-axis label color to blue
-        
-        # Set pressure y-axis ticks and labels to blue
-        self.ax_pressure.tick_params(axis='y', labelcolor='cornflowerblue', color='cornflowerblue')
-        self.ax_pressure.spines['right'].set_color('cornflowerblue')  # Set spine color
-        self.ax_pressure.spines['left'].set_color('tomato')  # Set spine color
-        self.ax_pressure.tick_params(axis='both', which='major', labelsize=self.plot_txt_size)
-        self.ax_pressure.tick_params(axis='both', which='minor', labelsize=self.plot_txt_size)
-
-        # Initialize Line2D objects for temperature and pressure
-        self.temp_line, = self.ax.plot([], [], color='tomato')  # Set line color to orange
-        self.pressure_line, = self.ax_pressure.plot([], [], color='cornflowerblue')  # Set line color to blue
-
-        # Set up the canvas for embedding the plot in the Tkinter window
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
-        self.canvas.get_tk_widget().grid(row=0, column=0, columnspan=8)
-
-    def update_plot_temp(self):
-        if self.heat3_connected and self.heat3_thread_running:  # Only update the plot if connected to HEAT3-PS
-            # Append the current time and temperature to the data
-            if self.xgs600_thread_running and len(self.x_pressure) > len(self.x_temp):
-                current_time = self.x_pressure[len(self.x_pressure)-1]
-            else:
-                if len(self.x_temp) == 0:
-                    current_time = 0
-                else:  
-                    current_time = self.x_temp[len(self.x_temp)-1] + self.time_interval 
-                self.update_time_scale(current_time)
-                self.update_xlim(current_time)
-          
-            current_temp = self.temp_value.get()
-
-            self.x_temp.append(current_time)
-            self.y_temp.append(current_temp)
-            self.temp_line.set_data(self.x_temp, self.y_temp)
-            self.ax.relim()
-            self.ax.autoscale_view()
-            self.canvas.draw()
-
-    def update_plot_pressure(self):
-        if self.xgs600_connected and self.xgs600_thread_running:  # Only update the plot if connected to HEAT3-PS
-            # Append the current time and temperature to the data
-            if self.heat3_thread_running and len(self.x_temp) > len(self.x_pressure):
-                current_time = self.x_temp[len(self.x_temp)-1]
-            else:
-                if len(self.x_pressure) == 0: 
-                    current_time = 0
-                else:
-                    current_time = self.x_pressure[len(self.x_pressure)-1] + self.time_interval
-                self.update_time_scale(current_time)
-                self.update_xlim(current_time)
-            #current_time = len(self.x_pressure) * self.time_interval
-            current_pressure = self.pressure_value.get()
-
-            self.x_pressure.append(current_time)
-            self.y_pressure.append(current_pressure)
-            self.pressure_line.set_data(self.x_pressure, self.y_pressure)
-            self.ax_pressure.relim()
-            self.ax_pressure.autoscale_view()
-            self.canvas.draw()
-
-    def update_time_scale(self, current_time):
-        """Update x-axis label, ticks, and formatter dynamically with ~nbins ticks."""
-        nbins = 6
-        if current_time < 100:  # seconds
-            self.ax.set_xlabel('Time (secs)', fontsize=self.plot_txt_size)
-            self.ax.xaxis.set_major_locator(MaxNLocator(nbins=nbins))  
-            def formatter(x, pos): 
-                return f"{x:.1f}"   # show in seconds
-
-        elif current_time < 100 * 60:  # minutes
-            self.ax.set_xlabel('Time (mins)', fontsize=self.plot_txt_size)
-            self.ax.xaxis.set_major_locator(MaxNLocator(nbins=nbins))  
-            def formatter(x, pos): 
-                return f"{x/60:.1f}"  # convert sec → min, 1 decimal
-
-        else:  # hours
-            self.ax.set_xlabel('Time (hrs)', fontsize=self.plot_txt_size)
-            self.ax.xaxis.set_major_locator(MaxNLocator(nbins=nbins))  
-            def formatter(x, pos): 
-                return f"{x/3600:.1f}"  # convert sec → hr, 1 decimal
-
-        self.ax.xaxis.set_major_formatter(FuncFormatter(formatter))
-
-    def update_xlim(self, current_time):
-        xmin, xmax = self.ax.get_xlim()
-        if current_time > xmax * 0.9:
-            self.ax.set_xlim(xmin, current_time * 1.02)
-
-    def add_control_buttons(self):
-        self.start_pause_button = tk.Button(self.root, text="Stop", bg="red", font=self.arial14, command=self.start_pause)
-        self.start_pause_button.grid(row=9, column=2, padx=0, pady=10, sticky='e')
-
-        self.save_button = tk.Button(self.root, text="Save", font=self.arial14, command=self.save_data)
-        self.save_button.grid(row=9, column=3, padx=10, pady=10, sticky='w')
-
-    def start_pause(self):
-        if self.heat3_connected and self.heat3_thread_running:
-            if not self.running:
-                # Start the operation
-                self.start_pause_button.config(text="Running", bg="green")
-                self.disable_controls()  # Disable Mode and Heating selection
-                self.send_command(self.heat3.master_mode,1)
-                self.running = True
-
-                self.run_thread = threading.Thread(target=self.run_control)
-                self.run_thread.start()
-            else:
-                # Pause/Stop the operation
-                self.stop_heat3_master()
-
-    def stop_heat3_master(self):        
-        self.running = False
-        self.send_command(self.heat3.set_Ue_target_value, 0)
-        self.send_command(self.heat3.operate_control,self.heat3_channel, 0)
-        self.send_command(self.heat3.run_hold_control,self.heat3_channel, 0)
-        self.send_command(self.heat3.master_mode,0)
-        self.start_pause_button.config(text="Stop", bg="red")
-        self.enable_controls()  # Re-enable Mode and Heating selection
-        
-    def disable_controls(self):
-        # Disable the Mode and Heating comboboxes
-        self.mode.config(state="disabled")
-        self.heating.config(state="disabled")
-
-    def enable_controls(self):
-        # Enable the Mode and Heating comboboxes
-        self.mode.config(state="normal")
-        self.heating.config(state="normal")
-
-    def run_control(self):
-        num_segments = int(self.num_segments_value.get())
-        repeat_count = int(self.repeat_value.get())  # Get the number of repeats
-        current_sp = 0  # This will hold the current setpoint value
-        init = True
-
-        while self.running and self.heat3_thread_running:  # Keep running while the process is active
-            try:
-                if self.mode_value.get() == "Auto":
-                    if init:
-                        # Set heating mode and control parameters
-                        self.send_command(self.heat3.set_heating_mode,self.heating_value.get())
-                        self.send_command(self.heat3.set_p_parameter_t_mode,self.heat3_channel,float(self.p_value.get()))
-                        self.send_command(self.heat3.set_i_parameter_t_mode,self.heat3_channel,float(self.i_value.get()))
-                        self.send_command(self.heat3.set_d_parameter_t_mode,self.heat3_channel,float(self.d_value.get()))
-                        self.send_command(self.heat3.set_work_mode,self.heat3_channel, "PID")
-                        self.heat3.set_ramp_rate_unit_t_mode(self.heat3_channel,1)
-
-                        if self.heating_value.get() == "EB":
-                            self.send_command(self.heat3.set_Ic_limit_eb_mode, float(self.ic_limit_value.get()))
-                            self.send_command(self.heat3.set_Uc_limit_eb_mode, float(self.uc_limit_value.get()))
-                            self.send_command(self.heat3.set_Ie_limit_eb_mode, float(self.ie_limit_value.get()))
-                            self.send_command(self.heat3.set_Ue_limit_eb_mode, float(self.ue_limit_value.get()))
-                            self.send_command(self.heat3.set_output_signal_Ue_UcIc,self.ic_ue_value.get())
-                            if(self.ic_ue_value.get() == 'Ue'):
-                                self.send_command(self.heat3.set_Ic_target_value, self.heat3_channel, float(self.ic_value.get()))
-                            else:
-                                self.send_command(self.heat3.set_Ue_target_value, float(self.ue_value.get()))
-                        else:
-                            self.send_command(self.heat3.set_Ue_target_value, 0)
-                            self.send_command(self.heat3.set_Ic_limit_res_mode,self.heat3_channel, float(self.ic_limit_value.get()))
-                            self.send_command(self.heat3.set_Uc_limit_res_mode,self.heat3_channel, float(self.uc_limit_value.get()))
-                            
-                        self.send_command(self.heat3.set_input_selection_for_process_value,self.heat3_channel, self.temp_input_value.get())
-                        self.send_command(self.heat3.operate_control,self.heat3_channel, 1)
-                        self.send_command(self.heat3.run_hold_control,self.heat3_channel, 1)
-                        init = False
-                    # Repeat the sequence of segments
-                    for repeat in range(repeat_count + 1):  # Repeat the sequence the specified number of times
-                        if not self.running:
-                            break  # Stop if the running flag is turned off
-
-                        # Loop through each segment
-                        for segment in range(num_segments):
-                            if not self.running:
-                                break
-
-                            if segment == 0:
-                                current_temperature = self.temp_value.get()
-                            else:
-                                current_temperature = self.sp_values[segment-1].get()
-                            sp_value = self.sp_values[segment].get()
-                            t_value = self.t_values[segment].get()
-                            diff = sp_value - current_temperature
-
-                            if num_segments == 1:
-                                while self.running and self.heat3_thread_running:
-                                    time.sleep(self.time_sleep)
-                            if diff > 0:
-                                ramp = diff/t_value
-                                self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
-                                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
-                                while self.temp_value.get() < (sp_value - 0.2) and self.running and self.heat3_thread_running:
-                                    if self.degas_var.get():
-                                        self.degas_function(sp_value)
-                                    time.sleep(self.time_sleep)
-                            elif diff < 0:
-                                ramp = abs(diff)/t_value
-                                self.send_command(self.heat3.set_ramp_rate_t_mode,self.heat3_channel,ramp)
-                                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
-                                while self.temp_value.get() > (sp_value + 0.2) and self.running and self.heat3_thread_running:
-                                    if self.degas_var.get():
-                                        self.degas_function(sp_value)
-                                    time.sleep(self.time_sleep)
-                            else:
-                                # Start the timer for the segment
-                                t_value = self.t_values[segment].get()*60 # Convert to second time.time() returns second
-                                #print(f"Inside No Ramp")
-                                start_time = time.time()
-                                while (time.time() - start_time < t_value) and self.running and self.heat3_thread_running:
-                                    if self.degas_var.get():
-                                        start_degas_time = time.time()
-                                        self.degas_function(sp_value)
-                                        end_degas_time = time.time()
-                                        t_value = t_value + (end_degas_time - start_degas_time)
-                                    time.sleep(self.time_sleep)
-
-                    # End of the operation, reset the button and re-enable controls
-                    #print(f"Finish Heating Cycle")
-                    self.stop_heat3_master()
-
-                else:
-                    if self.heat3_thread_running:
-                        # Manual Mode
-                        # Just send run_hold_control and skip ramp/setpoint logic
-                        self.send_command(self.heat3.set_work_mode, self.heat3_channel, self.mode_value.get())
-                        self.send_command(self.heat3.set_heating_mode, self.heating_value.get())
-                        self.send_command(self.heat3.set_Ic_target_value,self.heat3_channel, float(self.ic_value.get()))
-                        if self.heating_value.get() == "EB":
-                            self.send_command(self.heat3.set_Ue_target_value, float(self.ue_value.get()))
-                        self.send_command(self.heat3.operate_control, self.heat3_channel, 1)
-                        self.send_command(self.heat3.run_hold_control, self.heat3_channel, 1)
-                    while self.running:
-                        time.sleep(self.time_sleep)
-
-            except CommunicationError:
-                return
-            # Exit loop if stopped during the run
-            #if not self.running:
-            #    break
-
-    def save_data(self):
-        filename = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("TXT files", "*.txt")])
-        if filename:
-            # Write the x_data (time) and y_data (temperature) to a TXT file
-            try:
-                with open(filename, mode='w') as file:
-                    # Write the data points, tab-separated (no header)
-                    for x, y, w, z in zip_longest(self.x_temp, self.y_temp, self.x_pressure, self.y_pressure, fillvalue=-1):
-                        file.write(f"{x:.2f}\t{y:.1f}\t{w:.2f}\t{z:.2e}\n")
-
-            except Exception as e:
-                print(f"Error saving data: {e}")
-
-    def get_temp(self):
-        temp_source = self.temp_input_value.get()
-
-        if temp_source in ["Tc1", "Tc2"]:
-            # Read temperature from thermocouple
-            temperature = self.send_command(self.heat3.r_temperature_from_thermocouple, temp_source)
-            return temperature
-        elif temp_source in ["D1", "D2"]:
-            # Read temperature from diode
-            temperature = self.send_command(self.heat3.r_temperature_from_diode, temp_source)
-            return temperature
-        elif temp_source == "RTD":
-            # Read temperature from resistance (RTD)
-            temperature = self.send_command(self.heat3.r_temperature_from_resistance)
-            return temperature
-        elif temp_source in ["Ain1", "Ain2"]:
-            # Read process value from Ain1 or Ain2
-            temperature = self.send_command(self.heat3.r_actual_process_value, self.heat3_channel)
-            return temperature
-        else:
-            # Handle unexpected input source if needed
-            print(f"Unknown temperature source: {temp_source}")
-            return 0.0
-
-    def read_heat3_data(self):
-        # Run continuously until heat3_thread_running is set to False
-        temperature = 0
-        uc_actual = 0
-        ic_actual = 0
-        ue_actual = 0
-        ie_actual = 0
-        
-        while self.heat3_connected and self.heat3_thread_running:
-            try:
-                # Read temperature from HEAT3-PS (or any other data)
-                # Check the value of temp_input_value and call the corresponding function
-                temperature = self.get_temp()
-                self.temp_value.set(f"{self.kelvin_to_celsius(temperature):.1f}")
-
-                # Read Uc and Ic values and update in a thread-safe way
-                uc_actual = self.send_command(self.heat3.r_actual_value_Uc, self.heat3_channel)
-                self.uc_value.set(f"{uc_actual:.2f}")
-                if self.mode_value.get() == "Auto":
-                    if self.heating_value.get() == "RES" or self.ic_ue_value.get() == "Ic":
-                        ic_actual = self.send_command(self.heat3.r_actual_value_Ic, self.heat3_channel)
-                        self.ic_value.set(f"{ic_actual:.2f}")
-                    if self.ic_ue_value.get() == "Ue":
-                        ue_actual = self.send_command(self.heat3.r_actual_value_Ue)
-                        self.ue_value.set(f"{ue_actual:.1f}")
-                if self.heating_value.get() == "EB":
-                    ie_actual = self.send_command(self.heat3.r_actual_value_Ie)*1000
-                    self.ie_value.set(f"{ie_actual:.1f}")
-                #self.root.after(0, self.update_uc_ic_display)
-                
-                # Start updating the plot continuously
-                self.root.after(0, self.update_plot_temp)
-
-                # Sleep for a short period (e.g., 0.3 seconds) before the next read
-                time.sleep(self.time_interval)
-
-            except CommunicationError:
-                return
-
-            #finally:
-                # Re-schedule the next data read
-                #self.schedule_read_heat3_data()
-
-    def read_mg15_data(self):
-        vacuum_value = 0
-        while self.mg15_thread_running:
-            try:
-                vacuum_input_str = self.vacuum_input_value.get()
-                vacuum_value = self.mg15.read_vacuum(vacuum_input_str)
-                self.pressure_value.set(f"{vacuum_value:.2e}")
-                self.root.after(0, self.update_plot_pressure)
-                time.sleep(self.time_interval)
-
-            except Exception as e:
-                print(f"Error reading from MG15: {e}")
-                # Stop the MG15 thread
-                self.mg15_stop()
-                break
-            except TimeoutError:
-                print(f"Error reading from MG15 Timeout")
-                # Stop the MG15 thread
-                self.mg15_stop()
-                break
-
-    def read_xgs600_data(self):
-        vacuum_value = 0
-        while self.xgs600_thread_running:
-            try:
-                vacuum_input_str = self.vacuum_input_value.get()
-                vacuum_value = self.xgs600.read_pressure(vacuum_input_str)
-                self.pressure_value.set(f"{vacuum_value:.2e}")
-                self.root.after(0, self.update_plot_pressure)
-                time.sleep(self.time_interval)
-
-            except Exception as e:
-                print(f"Error reading from XGS-600: {e}")
-                # Stop the XGS-600 thread
-                self.xgs600_stop()
-                break
-            except TimeoutError:
-                print(f"Error reading from XGS-600 Timeout")
-                # Stop the XGS-600 thread
-                self.xgs600_stop()
-                break
-
-    def mg15_stop(self):
-        # Stop the MG15 thread
-        self.mg15_thread_running = False
-        self.mg15_connected = False
-        self.mg15_product_label.config(text="")
-        self.mg15_serial_label.config(text="")
-        self.toggle_buttons["MG15         IP:"].config(text="Disconnect", bg="red")
-        self.toggle_buttons["XGS-600 Add:"].config(state="normal")
-
-    def xgs600_stop(self):
-        # Stop the XGS-600 thread
-        self.xgs600_thread_running = False
-        self.xgs600_connected = False
-        self.xgs600_sw_version_label.config(text="")
-        self.toggle_buttons["XGS-600 Add:"].config(text="Disconnect", bg="red")
-        self.toggle_buttons["MG15         IP:"].config(state="normal")
-
-    def degas_function(self, set_temp):
-        sp_value = set_temp
-        current_pressure = self.pressure_value.get()
-        while current_pressure > float(self.pressure_base_value.get()) and self.running and self.heat3_thread_running and self.mg15_thread_running:
-            degas_nominal_pressure = (float(self.pressure_base_value.get()) + float(self.pressure_limit_value.get()))/2
-            if current_pressure > degas_nominal_pressure:
-                # Adjust the setpoint downward to maintain pressure below the limit
-                sp_value -= self.temp_step                                                                              
-                self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
-            else:
-                if set_temp > sp_value:
-                    sp_value += 1  # Return setpoint incrementally (adjust as needed)
-                    self.send_command(self.heat3.set_setpoint_t_mode,self.heat3_channel,self.celsius_to_kelvin(sp_value))
-            time.sleep(self.time_sleep)
-
-    def kelvin_to_celsius(self, temp):
-        if self.unit_value.get() == "C":
-            return (temp - 273.15)  # Convert Kelvin to Celsius
-        else:
-            return temp  # Keep Kelvin
+    def r_actual_value_Ic(self, channel, plan=False):
+        return self._read("actual_Ic", channel, plan)
 
-    def celsius_to_kelvin(self, temp):
-        if self.unit_value.get() == "C":
-            return (temp + 273.15)  # Convert Celsius to Kelvin
-        else:
-            return temp  # Keep Kelvin
+    def r_actual_value_Ue(self, plan=False):
+        return self._read("actual_Ue", plan=plan)
+
+    def r_actual_value_Ie(self, plan=False):
+        return self._read("actual_Ie", plan=plan)
+
+    # Outputs and limits
+
+    def set_Ic_target_value(self, channel, value):
+        """Manual filament current (A)."""
+        self.write("target_Ic", value, channel)
+
+    def set_Ue_target_value(self, value):
+        """Manual high voltage (V), EB mode."""
+        self.write("target_Ue", value)
+
+    def set_Uc_limit_res_mode(self, channel, value):
+        self.write("limit_Uc_res", value, channel)
+
+    def set_Ic_limit_res_mode(self, channel, value):
+        self.write("limit_Ic_res", value, channel)
+
+    def set_Uc_limit_eb_mode(self, value):
+        self.write("limit_Uc_eb", value)
+
+    def set_Ic_limit_eb_mode(self, value):
+        self.write("limit_Ic_eb", value)
+
+    def set_Ue_limit_eb_mode(self, value):
+        self.write("limit_Ue_eb", value)
+
+    def set_Ie_limit_eb_mode(self, value):
+        """
+        Emission current limit, sent as given: the GUI and recipes enter it in mA.
+        The unit the device expects is not verified against the manual.
+        """
+        self.write("limit_Ie_eb", value)
+
+    # Temperature mode
+
+    def set_setpoint_t_mode(self, channel, value):
+        """Temperature setpoint (K)."""
+        self.write("setpoint_t", value, channel)
+
+    def r_setpoint_t_mode(self, channel, plan=False):
+        """Temperature setpoint (K)."""
+        return self._read("setpoint_t", channel, plan)
+
+    def set_ramp_rate_t_mode(self, channel, value):
+        """Ramp rate in the unit chosen with set_ramp_rate_unit_t_mode."""
+        self.write("ramp_rate_t", value, channel)
+
+    def set_ramp_rate_unit_t_mode(self, channel, unit):
+        """
+        :param unit: 0 = K/s, 1 = K/min
+        """
+        if unit not in (0, 1):
+            raise ValueError("Ramp rate unit must be 0 (K/s) or 1 (K/min)")
+        self.write("ramp_rate_unit_t", unit, channel)
+
+    def set_p_parameter_t_mode(self, channel, value):
+        self.write("p_t", value, channel)
 
-# Create the main window and run the app
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = HeatingControlApp(root)
-    root.protocol("WM_DELETE_WINDOW", on_closing)
-    root.mainloop()
+    def set_i_parameter_t_mode(self, channel, value):
+        self.write("i_t", value, channel)
 
+    def set_d_parameter_t_mode(self, channel, value):
+        self.write("d_t", value, channel)
@@ -0,0 +1,241 @@
+import threading
+import time
+
+class Step:
+    def __init__(self, kind, setpoint, rate=None, minutes=0.0, profile="firmware"):
+        """
+        One step of a heating program.
+
+        :param kind: "ramp" sends rate and setpoint and ends when the setpoint is reached,
+                     "hold" keeps the setpoint for the given minutes
+        :param rate: Ramp rate in degrees per minute. None computes it when the step starts
+                     from the live temperature so that the ramp takes the given minutes.
+        :param profile: "firmware" lets HEAT3 ramp; "linear", "s-curve" or "log" streams
+                        the setpoint trajectory from the host (see trajectory.py)
+        """
+        self.kind = kind
+        self.setpoint = setpoint
+        self.rate = rate
+        self.minutes = minutes
+        self.profile = profile
+
+    def __repr__(self):
+        return (f"Step({self.kind!r}, {self.setpoint!r}, rate={self.rate!r}, "
+                f"minutes={self.minutes!r}, profile={self.profile!r})")
+
+def steps_from_segments(segments, repeat=0, profile="firmware"):
+    """
+    Expand the GUI segment table into steps. Each pass starts with a ramp from the
+    measured temperature; a segment with the setpoint of the previous one is a hold.
+
+    :param segments: List of (setpoint, minutes)
+    :param repeat: Number of extra passes over the segments
+    """
+    steps = []
+    for _ in range(repeat + 1):
+        for index, (setpoint, minutes) in enumerate(segments):
+            if index == 0:
+                steps.append(Step("ramp", setpoint, None, minutes, profile))
+                continue
+            diff = setpoint - segments[index - 1][0]
+            if diff == 0:
+                steps.append(Step("hold", setpoint, minutes=minutes))
+            else:
+                # A ramp of 0 minutes is a setpoint jump, see RampSoakProgram._start_step
+                steps.append(Step("ramp", setpoint, abs(diff) / minutes if minutes else None, minutes, profile))
+    return steps
+
+class RampSoakProgram:
+    def __init__(self, steps, send_ramp=None, send_setpoint=None, hold=None,
+                 keep_running=None, on_finish=None, tolerance=0.2, channel="temperature",
+                 stream_ramp=None, on_progress=None):
+        """
+        Heating program stepped by the ProgramExecutor on every new sample.
+
+        :param steps: List of Step, see steps_from_segments and recipe.compile_recipe
+        :param send_ramp: Function sending a ramp rate (degrees per minute)
+        :param send_setpoint: Function sending a setpoint
+        :param hold: Function(setpoint) -> True while the program must wait (e.g. degas)
+        :param keep_running: Function -> False to abort the program
+        :param on_finish: Function(program) called once when the program ends
+        :param stream_ramp: Function(profile, start, end, seconds) streaming a host-side
+                            ramp; without it every ramp uses the firmware ramp
+        :param on_progress: Function(position) called after every tick, see position()
+        """
+        self.steps = steps
+        self.send_ramp = send_ramp
+        self.send_setpoint = send_setpoint
+        self.hold = hold
+        self.keep_running = keep_running
+        self.on_finish = on_finish
+        self.tolerance = tolerance
+        self.channel = channel
+        self.stream_ramp = stream_ramp
+        self.on_progress = on_progress
+
+        self.index = 0
+        self.phase = "start"        # start, up, down, soak, done
+        self.setpoint = None
+        self.soak_elapsed = 0.0
+        self.last_tick = None
+        self.finished = False
+        self.completed = False      # True if every segment ran to the end
+        self.error = None
+        self.finish_lock = threading.Lock()
+
+    def tick(self, now, store):
+        """
+        Advance the program with the latest samples.
+        Return the monotonic time of the next deadline, or None to wait for samples only.
+        """
+        if self.keep_running and not self.keep_running():
+            self.finish()
+            return None
+        dt = 0.0 if self.last_tick is None else now - self.last_tick
+        self.last_tick = now
+
+        if self.phase == "start":
+            self._start_step(store)
+        if self.hold and self.setpoint is not None and self.hold(self.setpoint):
+            return None   # Time does not advance while held, as with the old degas loop
+
+        temperature = store.get(self.channel)
+        if self.phase == "up" and temperature >= self.setpoint - self.tolerance:
+            self._next_step(store)
+        elif self.phase == "down" and temperature <= self.setpoint + self.tolerance:
+            self._next_step(store)
+        elif self.phase == "soak":
+            self.soak_elapsed += dt
+            if self.soak_elapsed >= self.steps[self.index].minutes * 60:
+                self._next_step(store)
+
+        if self.on_progress and not self.finished:
+            self.on_progress(self.position())
+        if self.phase == "soak":
+            return now + self.steps[self.index].minutes * 60 - self.soak_elapsed
+        return None
+
+    def position(self):
+        """Where the program is, as a dict that restore() accepts (see journal.py)."""
+        return {"index": self.index, "phase": self.phase, "setpoint": self.setpoint,
+                "soak_elapsed": self.soak_elapsed}
+
+    def restore(self, position, downtime=0.0):
+        """
+        Continue from a saved position instead of the first step. A soak goes on where
+        it was, counting the downtime since HEAT3 kept the setpoint meanwhile; a ramp
+        starts its step again from the live temperature, as a streamed ramp cannot be
+        picked up halfway.
+        """
+        self.index = position["index"]
+        if position["phase"] == "soak":
+            self.phase = "soak"
+            self.setpoint = position["setpoint"]
+            self.soak_elapsed = position["soak_elapsed"] + downtime
+        else:
+            self.phase = "start"
+            self.setpoint = None
+
+    def _start_step(self, store):
+        if self.index == len(self.steps):
+            self.completed = True
+            self.finish()
+            return
+        step = self.steps[self.index]
+        temperature = store.get(self.channel)
+        previous = temperature if self.setpoint is None else self.setpoint
+        self.setpoint = step.setpoint
+        self.soak_elapsed = 0.0
+        diff = step.setpoint - temperature
+        if step.kind == "hold" or (step.rate is None and diff == 0):
+            self.phase = "soak"
+            return
+        self.phase = "up" if diff > 0 else "down"
+        if step.rate is None and not step.minutes:
+            # No time for a ramp: send the setpoint at once and wait until it is reached
+            self.send_setpoint(step.setpoint)
+            return
+        rate = abs(diff) / step.minutes if step.rate is None else step.rate
+        if step.profile != "firmware" and self.stream_ramp:
+            # Start from the previous setpoint, like the firmware ramp does
+            start = temperature if step.rate is None else previous
+            self.stream_ramp(step.profile, start, step.setpoint, abs(step.setpoint - start) / rate * 60)
+        else:
+            self.send_ramp(rate)
+            self.send_setpoint(step.setpoint)
+
+    def _next_step(self, store):
+        self.index += 1
+        self._start_step(store)
+
+    def finish(self, error=None):
+        # stop() and the executor thread may both finish the program; only the first
+        # one calls on_finish
+        with self.finish_lock:
+            if self.finished:
+                return
+            self.finished = True
+        self.phase = "done"
+        self.error = error
+        if self.on_finish:
+            self.on_finish(self)
+
+class ProgramExecutor:
+    def __init__(self, store, max_wait=1.0):
+        """
+        Run any number of programs from one thread, woken by new samples or deadlines.
+
+        :param store: SampleStore providing the samples and the new-sample notification
+        :param max_wait: Longest sleep without samples, so keep_running is still polled
+        """
+        self.store = store
+        self.max_wait = max_wait
+        self.programs = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self, program):
+        with self.lock:
+            self.programs.append(program)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        self.store.notify()
+
+    def stop(self, program):
+        """Abort a program; its on_finish is called with completed False."""
+        with self.lock:
+            if program in self.programs:
+                self.programs.remove(program)
+        program.finish()
+
+    def _run(self):
+        seq = self.store.seq
+        deadline = None
+        while True:
+            now = time.monotonic()
+            timeout = self.max_wait if deadline is None else min(self.max_wait, max(0.0, deadline - now))
+            seq = self.store.wait(seq, timeout)
+
+            with self.lock:
+                programs = list(self.programs)
+            now = time.monotonic()
+            deadline = None
+            for program in programs:
+                try:
+                    next_deadline = program.tick(now, self.store)
+                except Exception as e:
+                    print(f"Program stopped: {e}")
+                    program.finish(e)
+                    next_deadline = None
+                if program.finished:
+                    with self.lock:
+                        if program in self.programs:
+                            self.programs.remove(program)
+                elif next_deadline is not None and (deadline is None or next_deadline < deadline):
+                    deadline = next_deadline
+
+            with self.lock:
+                if not self.programs:
+                    self.thread = None
+                    return
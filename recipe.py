@@ -0,0 +1,368 @@
+import argparse
+import math
+from program import Step
+from trajectory import PROFILES, peak_rate_factor
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+HEATING_MODES = ["RES", "EB"]
+TEMP_INPUTS = ["Tc1", "Tc2", "D1", "D2", "RTD", "Ain1", "Ain2"]
+EB_OUTPUTS = ["Ic", "Ue"]
+UNITS = ["K", "C"]
+
+DEFAULT_LIMITS = {"max_temperature": None, "min_temperature": None, "max_ramp_rate": None,
+                  "ic": 4.00, "uc": 5.00, "ie": 20.0, "ue": 1000.0}
+DEFAULT_PID = {"p": 100.0, "i": 20.0, "d": 3.0}
+MAX_REPEAT = 1000     # Largest repeat / count
+MAX_STEPS = 10000     # Largest expanded program, nested repeats included
+
+EXAMPLE = """\
+# Heating recipe. Temperatures in the recipe unit, times in minutes, rates in degrees/minute.
+name = "Bakeout 200 C"
+unit = "C"
+start = 25            # Optional: temperature assumed before the first ramp
+repeat = 0            # Extra passes over all segments
+
+[heating]
+mode = "RES"          # RES or EB
+input = "Tc1"         # Tc1, Tc2, D1, D2, RTD, Ain1, Ain2
+output = "Ic"         # EB only: Ic or Ue
+profile = "firmware"  # Default ramp: firmware, or host-streamed linear, s-curve, log
+stream_rate = 2       # Setpoint updates per second for streamed ramps
+
+[pid]
+p = 100
+i = 20
+d = 3
+
+[limits]
+max_temperature = 300
+max_ramp_rate = 10
+ic = 4.0
+uc = 5.0
+
+[degas]
+limit = 1e-7          # mbar
+base = 1e-9
+
+[[segment]]
+type = "ramp"
+setpoint = 200
+rate = 5              # or: time = 35
+
+[[segment]]
+type = "hold"
+time = 120
+
+[[segment]]
+type = "repeat"
+count = 3
+segment = [
+    { type = "ramp", setpoint = 150, time = 10 },
+    { type = "ramp", setpoint = 200, time = 10, profile = "s-curve" },
+]
+
+[[segment]]
+type = "ramp"
+setpoint = 25
+rate = 5
+"""
+
+class RecipeError(ValueError):
+    pass
+
+class CompiledRecipe:
+    def __init__(self, name, unit, steps, heating, pid, limits, degas, schedule):
+        """
+        Validated recipe with the full step list and command schedule precomputed.
+
+        :param steps: List of program.Step for RampSoakProgram
+        :param schedule: List of (minute, command, value) with estimated start times
+        """
+        self.name = name
+        self.unit = unit
+        self.steps = steps
+        self.heating = heating
+        self.pid = pid
+        self.limits = limits
+        self.degas = degas
+        self.schedule = schedule
+
+    @property
+    def total_minutes(self):
+        """Estimated run time; None if a ramp rate depends on the live temperature."""
+        if any(step.kind == "ramp" and step.rate is None for step in self.steps):
+            return None
+        return self.schedule[-1][0] if self.schedule else 0.0
+
+    def init_commands(self, channel, to_device_unit=lambda temp: temp):
+        """
+        HEAT3 commands that prepare an Auto (PID) run, as (method name, args).
+        Same sequence as HeatingControlApp.run_control.
+        """
+        heating = self.heating
+        limits = self.limits
+        commands = [
+            ("set_heating_mode", (heating["mode"],)),
+            ("set_p_parameter_t_mode", (channel, self.pid["p"])),
+            ("set_i_parameter_t_mode", (channel, self.pid["i"])),
+            ("set_d_parameter_t_mode", (channel, self.pid["d"])),
+            ("set_work_mode", (channel, "PID")),
+            ("set_ramp_rate_unit_t_mode", (channel, 1)),
+        ]
+        if heating["mode"] == "EB":
+            commands += [
+                ("set_Ic_limit_eb_mode", (limits["ic"],)),
+                ("set_Uc_limit_eb_mode", (limits["uc"],)),
+                ("set_Ie_limit_eb_mode", (limits["ie"],)),
+                ("set_Ue_limit_eb_mode", (limits["ue"],)),
+                ("set_output_signal_Ue_UcIc", (heating["output"],)),
+            ]
+            if heating["output"] == "Ue":
+                commands.append(("set_Ic_target_value", (channel, heating["ic_target"])))
+            else:
+                commands.append(("set_Ue_target_value", (heating["ue_target"],)))
+        else:
+            commands += [
+                ("set_Ue_target_value", (0,)),
+                ("set_Ic_limit_res_mode", (channel, limits["ic"])),
+                ("set_Uc_limit_res_mode", (channel, limits["uc"])),
+            ]
+        commands += [
+            ("set_input_selection_for_process_value", (channel, heating["input"])),
+            ("operate_control", (channel, 1)),
+            ("run_hold_control", (channel, 1)),
+        ]
+        return commands
+
+    def describe(self):
+        lines = [f"Recipe: {self.name} ({len(self.steps)} steps, unit {self.unit})"]
+        for minute, command, value in self.schedule:
+            lines.append(f"{minute:9.1f} min  {command:<10} {value}")
+        total = self.total_minutes
+        lines.append("Estimated time: " + ("depends on start temperature" if total is None else f"{total:.1f} min"))
+        return "\n".join(lines)
+
+def load_recipe(path):
+    """Read a recipe file (.toml, or .yaml/.yml if PyYAML is installed) into a dict."""
+    if path.lower().endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise RecipeError("YAML recipes need PyYAML (pip install pyyaml)")
+        with open(path, "r") as file:
+            try:
+                return yaml.safe_load(file) or {}
+            except yaml.YAMLError as e:
+                raise RecipeError(f"{path}: {e}")
+    if tomllib is None:
+        raise RecipeError("TOML recipes need Python 3.11 or the tomli package")
+    with open(path, "rb") as file:
+        try:
+            return tomllib.load(file)
+        except tomllib.TOMLDecodeError as e:
+            raise RecipeError(f"{path}: {e}")
+
+def compile_file(path):
+    return compile_recipe(load_recipe(path))
+
+def _number(where, value, minimum=None, maximum=None, positive=False):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RecipeError(f"{where}: expected a number, got {value!r}")
+    value = float(value)
+    if math.isnan(value):
+        raise RecipeError(f"{where}: expected a number, got nan")
+    if positive and value <= 0:
+        raise RecipeError(f"{where}: must be greater than 0")
+    if minimum is not None and value < minimum:
+        raise RecipeError(f"{where}: {value:g} is below the limit {minimum:g}")
+    if maximum is not None and value > maximum:
+        raise RecipeError(f"{where}: {value:g} is above the limit {maximum:g}")
+    return value
+
+def _choice(where, value, options):
+    if value not in options:
+        raise RecipeError(f"{where}: {value!r} is not one of {', '.join(options)}")
+    return value
+
+def _section(recipe, key):
+    section = recipe.get(key, {})
+    if not isinstance(section, dict):
+        raise RecipeError(f"{key}: expected a table, got {section!r}")
+    return section
+
+def _segments(where, segments):
+    if not isinstance(segments, list):
+        raise RecipeError(f"{where}: expected a list of segments, got {segments!r}")
+    if not segments:
+        raise RecipeError(f"{where}: no segments")
+    return segments
+
+def compile_recipe(recipe):
+    """Validate a recipe dict and expand it into steps and a command schedule."""
+    if not isinstance(recipe, dict):
+        raise RecipeError("A recipe must be a table of settings")
+    name = str(recipe.get("name", "Recipe"))
+    unit = _choice("unit", recipe.get("unit", "C"), UNITS)
+
+    heating_section = _section(recipe, "heating")
+    heating = {
+        "mode": _choice("heating.mode", heating_section.get("mode", "RES"), HEATING_MODES),
+        "input": _choice("heating.input", heating_section.get("input", "Tc1"), TEMP_INPUTS),
+        "output": _choice("heating.output", heating_section.get("output", "Ic"), EB_OUTPUTS),
+        "ic_target": _number("heating.ic_target", heating_section.get("ic_target", 0.0), minimum=0),
+        "ue_target": _number("heating.ue_target", heating_section.get("ue_target", 0.0), minimum=0),
+        "profile": _choice("heating.profile", heating_section.get("profile", "firmware"), PROFILES),
+        "stream_rate": _number("heating.stream_rate", heating_section.get("stream_rate", 2.0), maximum=20, positive=True),
+    }
+
+    pid_section = _section(recipe, "pid")
+    pid = {key: _number(f"pid.{key}", pid_section.get(key, default), minimum=0)
+           for key, default in DEFAULT_PID.items()}
+
+    limits_section = _section(recipe, "limits")
+    unknown = set(limits_section) - set(DEFAULT_LIMITS)
+    if unknown:
+        raise RecipeError(f"limits: unknown keys {', '.join(sorted(unknown))}")
+    limits = {}
+    for key, default in DEFAULT_LIMITS.items():
+        value = limits_section.get(key, default)
+        limits[key] = None if value is None else _number(f"limits.{key}", value, minimum=0 if key != "min_temperature" else None)
+
+    degas = None
+    degas_section = _section(recipe, "degas")
+    if "degas" in recipe and degas_section.get("enabled", True):
+        degas = {
+            "limit": _number("degas.limit", degas_section.get("limit"), positive=True),
+            "base": _number("degas.base", degas_section.get("base"), positive=True),
+        }
+        if degas["base"] >= degas["limit"]:
+            raise RecipeError("degas: base pressure must be below the limit pressure")
+
+    start = recipe.get("start")
+    if start is not None:
+        start = _number("start", start)
+    repeat = int(_number("repeat", recipe.get("repeat", 0), minimum=0, maximum=MAX_REPEAT))
+
+    if not recipe.get("segment"):
+        raise RecipeError("The recipe has no [[segment]]")
+    segments = _segments("segment", recipe["segment"])
+
+    steps = []
+    setpoint = start
+    for _ in range(repeat + 1):
+        setpoint = _expand(segments, "segment", limits, heating["profile"], steps, setpoint)
+
+    return CompiledRecipe(name, unit, steps, heating, pid, limits, degas, _schedule(steps, start))
+
+def _expand(segments, where, limits, profile, steps, setpoint):
+    """Append the steps of a segment list; return the setpoint reached at its end."""
+    for index, segment in enumerate(segments):
+        here = f"{where}[{index + 1}]"
+        if not isinstance(segment, dict):
+            raise RecipeError(f"{here}: expected a table")
+        kind = _choice(f"{here}.type", segment.get("type", "ramp"), ["ramp", "hold", "repeat"])
+
+        if kind == "repeat":
+            count = int(_number(f"{here}.count", segment.get("count", 1), minimum=1, maximum=MAX_REPEAT))
+            inner = _segments(f"{here}.segment", segment.get("segment", []))
+            for _ in range(count):
+                setpoint = _expand(inner, f"{here}.segment", limits, profile, steps, setpoint)
+
+        elif kind == "hold":
+            minutes = _number(f"{here}.time", segment.get("time"), positive=True)
+            target = segment.get("setpoint", setpoint)
+            if target is None:
+                raise RecipeError(f"{here}: a hold needs a setpoint or a preceding ramp")
+            target = _number(f"{here}.setpoint", target, limits["min_temperature"], limits["max_temperature"])
+            if setpoint is not None and target != setpoint:
+                raise RecipeError(f"{here}: hold setpoint {target:g} differs from the current setpoint {setpoint:g}, use a ramp")
+            steps.append(Step("hold", target, minutes=minutes))
+            setpoint = target
+
+        else:
+            target = _number(f"{here}.setpoint", segment.get("setpoint"), limits["min_temperature"], limits["max_temperature"])
+            if ("rate" in segment) == ("time" in segment):
+                raise RecipeError(f"{here}: give either rate or time for a ramp")
+            if "rate" in segment:
+                rate = _number(f"{here}.rate", segment["rate"], maximum=limits["max_ramp_rate"], positive=True)
+                minutes = None if setpoint is None else abs(target - setpoint) / rate
+            else:
+                minutes = _number(f"{here}.time", segment["time"], positive=True)
+                # Without a known start the rate is computed from the live temperature
+                rate = None if setpoint is None else abs(target - setpoint) / minutes
+                if rate is not None:
+                    if rate == 0:
+                        raise RecipeError(f"{here}: ramp to the current setpoint, use a hold")
+                    _number(f"{here} ramp rate", rate, maximum=limits["max_ramp_rate"])
+            ramp_profile = _choice(f"{here}.profile", segment.get("profile", profile), PROFILES)
+            if rate is not None and ramp_profile != "firmware":
+                # A curved profile is steeper than its average rate somewhere
+                _number(f"{here} peak {ramp_profile} rate", rate * peak_rate_factor(ramp_profile), maximum=limits["max_ramp_rate"])
+            steps.append(Step("ramp", target, rate, minutes or 0.0, ramp_profile))
+            setpoint = target
+        if len(steps) > MAX_STEPS:
+            raise RecipeError(f"{here}: the program expands to more than {MAX_STEPS} steps")
+    return setpoint
+
+def _schedule(steps, start):
+    schedule = []
+    minute = 0.0
+    setpoint = start
+    for step in steps:
+        if step.kind == "hold":
+            schedule.append((minute, "hold", f"{step.minutes:g} min at {step.setpoint:g}"))
+            minute += step.minutes
+        else:
+            rate = "from live temperature" if step.rate is None else f"{step.rate:g}"
+            if step.profile == "firmware":
+                schedule.append((minute, "ramp_rate", rate))
+                schedule.append((minute, "setpoint", f"{step.setpoint:g}"))
+            else:
+                schedule.append((minute, "stream", f"{step.profile} to {step.setpoint:g}, average rate {rate}"))
+            if step.rate is None:
+                minute += step.minutes
+            elif setpoint is not None:
+                minute += abs(step.setpoint - setpoint) / step.rate
+        setpoint = step.setpoint
+    schedule.append((minute, "end", ""))
+    return schedule
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or run a heating recipe.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("check", help="Validate a recipe and print its schedule")
+    check.add_argument("recipe")
+    sub.add_parser("example", help="Print an example recipe")
+    run = sub.add_parser("run", help="Run a recipe without the GUI")
+    run.add_argument("recipe")
+    run.add_argument("--heat3", required=True, help="HEAT3-PS address as IP[:PORT]")
+    run.add_argument("--mg15", help="MG15 address as IP[:PORT] for pressure readings")
+    run.add_argument("--xgs600", help="XGS-600 serial port for pressure readings, e.g. COM4")
+    run.add_argument("--gauge", default="IG2", help="Gauge channel (default IG2)")
+    args = parser.parse_args()
+
+    if args.command == "example":
+        print(EXAMPLE, end="")
+        return
+    try:
+        compiled = compile_file(args.recipe)
+    except (RecipeError, OSError) as e:
+        raise SystemExit(f"Invalid recipe: {e}")
+    print(compiled.describe())
+    if args.command == "run":
+        from headless import HeadlessRunner
+        runner = HeadlessRunner(args.heat3, mg15=args.mg15, xgs600=args.xgs600, gauge=args.gauge)
+        runner.run(compiled)
+
+if __name__ == "__main__":
+    main()
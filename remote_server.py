@@ -0,0 +1,314 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import math
+import struct
+import threading
+import codec
+from urllib.parse import urlparse, parse_qs
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+BATCH_MAGIC = b"PVS2"
+
+# HEAT3 driver methods a remote client may call: reads at any time, and setpoint, ramp
+# and PID changes only while a locally started run is armed (see RemoteServer.writable).
+# Switching the output, master mode and the raw Ic/Ue targets stay local.
+READ_COMMANDS = {"r_setpoint_t_mode", "r_actual_process_value", "r_serial_number"}
+RUN_COMMANDS = {
+    "set_setpoint_t_mode", "set_ramp_rate_t_mode", "set_p_parameter_t_mode", "set_i_parameter_t_mode",
+    "set_d_parameter_t_mode",
+}
+ALLOWED_COMMANDS = READ_COMMANDS | RUN_COMMANDS
+
+def encode_batch(samples, mantissa_bits=23):
+    """
+    Binary batch of samples [(channel, timestamp, value)], grouped by channel, each
+    group compressed as one series (see codec.GorillaEncoder; timestamps to the
+    millisecond, values to mantissa_bits bits, 23 keeping the float32 readings):
+
+    "PVS2" | u16 groups | per group: u8 name length, name, u32 byte length, series.
+
+    Every batch decodes on its own, so a client that skipped batches loses nothing else.
+    """
+    groups = {}
+    for channel, timestamp, value in samples:
+        groups.setdefault(channel, ([], []))
+        groups[channel][0].append(timestamp)
+        groups[channel][1].append(value)
+    parts = [BATCH_MAGIC, struct.pack("<H", len(groups))]
+    for channel, (times, values) in groups.items():
+        encoded = codec.encode_series(times, values, mantissa_bits)
+        name = channel.encode("ascii")
+        parts.append(struct.pack("<B", len(name)) + name + struct.pack("<I", len(encoded)) + encoded)
+    return b"".join(parts)
+
+def decode_batch(data):
+    """Inverse of encode_batch: list of (channel, timestamp, value)."""
+    if data[:4] != BATCH_MAGIC:
+        raise ValueError("Not a sample batch")
+    groups, = struct.unpack_from("<H", data, 4)
+    offset = 6
+    samples = []
+    for _ in range(groups):
+        length = data[offset]
+        channel = data[offset + 1:offset + 1 + length].decode("ascii")
+        size, = struct.unpack_from("<I", data, offset + 1 + length)
+        offset += 5 + length
+        times, values = codec.decode_series(data[offset:offset + size])
+        offset += size
+        samples.extend((channel, timestamp, value) for timestamp, value in zip(times, values))
+    return samples
+
+class _Client:
+    def __init__(self, reader, writer, authorized, queue_size):
+        self.reader = reader
+        self.writer = writer
+        self.authorized = authorized
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, message):
+        """Queue a message; a full queue drops its oldest message instead of waiting."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+class RemoteServer:
+    def __init__(self, execute, host="127.0.0.1", port=8765, token=None, batch_interval=0.25,
+                 queue_size=32, allowed_commands=ALLOWED_COMMANDS, public_view=False, mantissa_bits=23,
+                 writable=None):
+        """
+        WebSocket server streaming the acquired samples and accepting control commands,
+        on asyncio from the standard library in its own thread.
+
+        Samples given to publish() (from any thread, never blocking) are collected,
+        encoded once per batch_interval (see encode_batch) and offered to every
+        client. Each client has its own bounded queue and writer task: a slow client
+        loses its oldest batches (counted in dropped), it never slows the others or
+        the acquisition.
+
+        Text messages are JSON commands {"id": 1, "command": "set_setpoint_t_mode",
+        "args": [1, 400.0]}, answered with {"id": 1, "result": ...} or {"id": 1,
+        "error": "..."}. Commands need the token, given as ?token=... in the URL;
+        the URL and the stream are not encrypted, so the server listens on localhost
+        unless host is given (e.g. "0.0.0.0" on a trusted lab network).
+
+        :param execute: Called as execute(name, args) in a worker thread, returns the result
+        :param token: Shared secret for control; without one, commands are refused
+        :param public_view: Stream samples to clients without the token too
+        :param mantissa_bits: Value precision of the batches, see encode_batch
+        :param writable: Called before every command that is not a read (name not
+            starting with "r_"); the command is refused unless it returns True.
+            Without it, only reads are accepted.
+        """
+        self.execute = execute
+        self.host = host
+        self.port = port
+        self.token = token
+        self.batch_interval = batch_interval
+        self.queue_size = queue_size
+        self.allowed_commands = set(allowed_commands)
+        self.public_view = public_view
+        self.mantissa_bits = mantissa_bits
+        self.writable = writable
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self._ready = threading.Event()
+
+    def publish(self, channel, timestamp, value):
+        """Add a sample to the next batch (wall-clock timestamp). Thread-safe."""
+        with self.pending_lock:
+            self.pending.append((channel, timestamp, value))
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self._ready.wait(5)
+        return self.server is not None
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.thread = None
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        except OSError as e:
+            print(f"Remote server: cannot listen on {self.host}:{self.port}: {e}")
+            self._ready.set()
+            return
+        self._ready.set()
+        batcher = self.loop.create_task(self._batch())
+        try:
+            self.loop.run_forever()
+        finally:
+            batcher.cancel()
+            self.server.close()
+            for client in list(self.clients):
+                client.writer.close()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+            self.server = None
+
+    async def _batch(self):
+        while True:
+            await asyncio.sleep(self.batch_interval)
+            with self.pending_lock:
+                samples, self.pending = self.pending, []
+            if samples and self.clients:
+                self._broadcast(OP_BINARY, encode_batch(samples, self.mantissa_bits))
+
+    def _broadcast(self, opcode, payload):
+        frame = _frame(opcode, payload)   # Encoded once for all clients
+        for client in self.clients:
+            if client.authorized or self.public_view:
+                client.offer(frame)
+
+    async def _handle(self, reader, writer):
+        try:
+            path = await self._handshake(reader, writer)
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            print(f"Remote server: handshake failed ({e})")
+            writer.close()
+            return
+        token = parse_qs(urlparse(path).query).get("token", [""])[0]
+        authorized = bool(self.token) and hmac.compare_digest(token, self.token)
+        client = _Client(reader, writer, authorized, self.queue_size)
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self._send(client))
+        try:
+            await self._receive(client)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            writer.close()
+
+    async def _handshake(self, reader, writer):
+        request = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        lines = request.split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if method != "GET" or headers.get("upgrade", "").lower() != "websocket" or not key:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            raise ValueError("not a WebSocket request")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+        return path
+
+    async def _send(self, client):
+        try:
+            while True:
+                frame = await client.queue.get()
+                client.writer.write(frame)
+                await client.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    async def _receive(self, client):
+        while True:
+            opcode, payload = await _read_frame(client.reader)
+            if opcode == OP_CLOSE:
+                client.offer(_frame(OP_CLOSE, payload[:2]))
+                return
+            if opcode == OP_PING:
+                client.offer(_frame(OP_PONG, payload))
+            elif opcode == OP_TEXT:
+                reply = await self._command(client, payload)
+                try:
+                    text = json.dumps(reply)
+                except (TypeError, ValueError) as e:
+                    text = json.dumps({"id": reply.get("id"), "error": f"Result not serializable: {e}"})
+                client.offer(_frame(OP_TEXT, text.encode()))
+
+    async def _command(self, client, payload):
+        try:
+            request = json.loads(payload)
+            request_id = request.get("id")
+            name = request["command"]
+            args = list(request.get("args", []))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return {"error": "Expected {\"id\": ..., \"command\": ..., \"args\": [...]}"}
+        if not client.authorized:
+            return {"id": request_id, "error": "Not authorized"}
+        if name not in self.allowed_commands:
+            return {"id": request_id, "error": f"Command '{name}' not allowed"}
+        if not name.startswith("r_") and not (self.writable and self.writable()):
+            return {"id": request_id, "error": f"Command '{name}' needs a running, armed program"}
+        try:
+            result = await self.loop.run_in_executor(None, self.execute, name, args)
+        except Exception as e:
+            return {"id": request_id, "error": str(e)}
+        return {"id": request_id, "result": _json_safe(result)}
+
+def _json_safe(value):
+    """A driver result as JSON types: numpy values as Python numbers, bytes as text."""
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("latin-1")
+    if hasattr(value, "tolist"):   # numpy scalar or array
+        return _json_safe(value.tolist())
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def _frame(opcode, payload):
+    """Unmasked server frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+async def _read_frame(reader, max_size=1 << 20):
+    """Read one (unfragmented or reassembled) client frame: (opcode, payload)."""
+    message = b""
+    opcode = None
+    while True:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length, = struct.unpack("!H", await reader.readexactly(2))
+        elif length == 127:
+            length, = struct.unpack("!Q", await reader.readexactly(8))
+        if len(message) + length > max_size:
+            raise ConnectionError("message too large")
+        mask = await reader.readexactly(4) if second & 0x80 else b"\0\0\0\0"
+        data = bytearray(await reader.readexactly(length))
+        for index in range(length):
+            data[index] ^= mask[index % 4]
+        frame_opcode = first & 0x0F
+        if frame_opcode >= OP_CLOSE:
+            return frame_opcode, bytes(data)   # Control frames are never fragmented
+        if frame_opcode:
+            opcode = frame_opcode
+        message += data
+        if first & 0x80:
+            return opcode, message
@@ -0,0 +1,233 @@
+import argparse
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+MAGIC = b"PVB1"
+HEADER = struct.Struct("<4sII")        # magic, capacity, channel count
+HEAD = struct.Struct("<Q")             # Number of samples ever written
+SLOT = struct.Struct("<QIxxxxdd")      # seqlock sequence, channel index, timestamp, value
+NAME_SIZE = 16
+HEAD_OFFSET = 16
+
+class SampleBus:
+    def __init__(self, name, channels=None, capacity=4096, create=False):
+        """
+        Shared-memory sample ring for one writer process and any number of reader
+        processes.
+
+        Layout: header, channel names, one "latest" slot per channel, then the ring of
+        capacity slots. Every slot is guarded by a seqlock: the writer makes its
+        sequence odd, writes the sample, then makes it even again. A reader copies
+        the slot and keeps it only if the sequence was even and unchanged, so readers
+        never block the writer and never see a torn sample.
+
+        :param name: Shared memory block name, the same in every process
+        :param channels: Channel names (writer only, readers get them from the block)
+        :param capacity: Ring size in samples; a reader that falls behind by more loses the oldest
+        :param create: True in the writer process
+        """
+        self.name = name
+        if create:
+            self.channels = list(channels)
+            self.capacity = capacity
+            size = self._ring_offset(len(self.channels)) + capacity * SLOT.size
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Left over from a writer that did not unlink it
+                old = shared_memory.SharedMemory(name=name)
+                old.close()
+                old.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, capacity, len(self.channels))
+            for index, channel in enumerate(self.channels):
+                encoded = channel.encode("ascii")[:NAME_SIZE]
+                offset = HEAD_OFFSET + HEAD.size + index * NAME_SIZE
+                self.shm.buf[offset:offset + len(encoded)] = encoded
+        else:
+            self.shm = _attach(name)
+            magic, self.capacity, count = HEADER.unpack_from(self.shm.buf, 0)
+            if magic != MAGIC:
+                self.shm.close()
+                raise ValueError(f"Shared memory '{name}' is not a sample bus")
+            self.channels = []
+            for index in range(count):
+                offset = HEAD_OFFSET + HEAD.size + index * NAME_SIZE
+                self.channels.append(bytes(self.shm.buf[offset:offset + NAME_SIZE]).rstrip(b"\0").decode("ascii"))
+        self.owner = create
+        self.index = {channel: index for index, channel in enumerate(self.channels)}
+        self.latest_offset = HEAD_OFFSET + HEAD.size + len(self.channels) * NAME_SIZE
+        self.ring_offset = self._ring_offset(len(self.channels))
+        self.head = HEAD.unpack_from(self.shm.buf, HEAD_OFFSET)[0]
+        self.lost = 0
+
+    @staticmethod
+    def _ring_offset(count):
+        return HEAD_OFFSET + HEAD.size + count * NAME_SIZE + count * SLOT.size
+
+    def publish(self, channel, value, timestamp=None):
+        """Write one sample (writer process only)."""
+        index = self.index[channel]
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        value = float(value)
+        self._write_slot(self.latest_offset + index * SLOT.size, index, timestamp, value)
+        self._write_slot(self.ring_offset + (self.head % self.capacity) * SLOT.size, index, timestamp, value)
+        self.head += 1
+        HEAD.pack_into(self.shm.buf, HEAD_OFFSET, self.head)
+
+    def _write_slot(self, offset, index, timestamp, value):
+        buf = self.shm.buf
+        sequence = HEAD.unpack_from(buf, offset)[0]
+        HEAD.pack_into(buf, offset, sequence + 1)   # Odd: write in progress
+        SLOT.pack_into(buf, offset, sequence + 1, index, timestamp, value)
+        HEAD.pack_into(buf, offset, sequence + 2)
+
+    def _read_slot(self, offset, retries=100):
+        buf = self.shm.buf
+        for _ in range(retries):
+            sequence, index, timestamp, value = SLOT.unpack_from(buf, offset)
+            if sequence & 1 == 0 and HEAD.unpack_from(buf, offset)[0] == sequence:
+                return sequence, index, timestamp, value
+        return None
+
+    def latest(self, channel):
+        """Latest (timestamp, value) of a channel, or None if it was never written."""
+        slot = self._read_slot(self.latest_offset + self.index[channel] * SLOT.size)
+        if slot is None or slot[0] == 0:
+            return None
+        return slot[2], slot[3]
+
+    def written(self):
+        """Number of samples written since the bus was created."""
+        return HEAD.unpack_from(self.shm.buf, HEAD_OFFSET)[0]
+
+    def read(self, cursor):
+        """
+        Return (samples, new cursor) with the samples written since cursor as
+        (channel, timestamp, value). A reader more than capacity samples behind skips
+        to the oldest sample still in the ring; the skipped count is added to lost.
+        """
+        head = self.written()
+        if head - cursor > self.capacity:
+            self.lost += head - self.capacity - cursor
+            cursor = head - self.capacity
+        samples = []
+        while cursor < head:
+            slot = self._read_slot(self.ring_offset + (cursor % self.capacity) * SLOT.size)
+            # A slot already overwritten by a newer lap is dropped as lost
+            if slot is None or slot[0] != 2 * (cursor // self.capacity + 1):
+                self.lost += 1
+            else:
+                samples.append((self.channels[slot[1]], slot[2], slot[3]))
+            cursor += 1
+        return samples, cursor
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass   # Already removed, e.g. by a crashed reader's resource tracker
+
+_attach_lock = threading.Lock()
+
+def _attach(name):
+    """
+    Open an existing segment without registering it with the resource tracker,
+    which would otherwise unlink the owner's bus when the reader exits.
+
+    Before Python 3.13 attaching always registers. Unregistering afterwards is not
+    enough: processes started by multiprocessing share their parent's tracker, so
+    that would also drop the owner's registration. Registration is skipped instead.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)   # Python 3.13+
+    except TypeError:
+        pass
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+class BusReader:
+    def __init__(self, bus, on_sample, poll_interval=0.005):
+        """
+        Thread handing every new sample of a bus to a callback, e.g. to publish it
+        into the SampleStore of the reading process.
+
+        :param on_sample: Called as on_sample(channel, timestamp, value) from the reader thread
+        """
+        self.bus = bus
+        self.on_sample = on_sample
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.thread = None
+
+    def _run(self):
+        cursor = self.bus.written()
+        while not self._stop.wait(self.poll_interval):
+            samples, cursor = self.bus.read(cursor)
+            for channel, timestamp, value in samples:
+                self.on_sample(channel, timestamp, value)
+
+def log_bus(name, directory=None):
+    """Append every sample of a bus to the archive until interrupted."""
+    from archive import TimeSeriesArchive, DEFAULT_DIRECTORY
+    bus = SampleBus(name)
+    archive = TimeSeriesArchive(directory or DEFAULT_DIRECTORY)
+    # Bus timestamps are monotonic, the archive keeps wall-clock time
+    offset = time.time() - time.monotonic()
+    cursor = bus.written()
+    try:
+        while True:
+            time.sleep(0.1)
+            samples, cursor = bus.read(cursor)
+            for channel, timestamp, value in samples:
+                archive.append(channel, value, timestamp + offset)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Lost samples: {bus.lost}")
+        archive.close()
+        bus.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or log a shared-memory sample bus.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show = subparsers.add_parser("show", help="Print the latest value of every channel")
+    show.add_argument("name")
+    log = subparsers.add_parser("log", help="Append all samples to the archive")
+    log.add_argument("name")
+    log.add_argument("--archive", help="Archive directory")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        bus = SampleBus(args.name)
+        now = time.monotonic()
+        for channel in bus.channels:
+            sample = bus.latest(channel)
+            print(f"{channel:16s} " + ("-" if sample is None else f"{sample[1]:.6g}  ({now - sample[0]:.2f} s ago)"))
+        bus.close()
+    else:
+        log_bus(args.name, args.archive)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import threading
+import time
+
+class SampleStore:
+    def __init__(self):
+        """
+        Latest process values shared between acquisition, control and GUI threads.
+
+        Each channel has a single writer (its acquisition thread). A sample is stored
+        as an immutable (timestamp, value) tuple, so replacing it is one atomic dict
+        assignment and readers never see a half-written sample or need a lock.
+        """
+        self._samples = {}
+        # Only waiters and the notification take this lock, readers never do
+        self._new_sample = threading.Condition()
+        self.seq = 0
+        self._listeners = ()
+
+    def subscribe(self, callback):
+        """
+        Call callback(channel, timestamp, value) for every published sample, from the
+        writer thread, so it must return quickly (e.g. append to a buffer).
+        """
+        self._listeners = self._listeners + (callback,)
+
+    def unsubscribe(self, callback):
+        self._listeners = tuple(listener for listener in self._listeners if listener is not callback)
+
+    def publish(self, channel, value, timestamp=None):
+        """Store the latest value of a channel (called by the channel's writer thread)."""
+        sample = (time.monotonic() if timestamp is None else timestamp, float(value))
+        self._samples[channel] = sample
+        for listener in self._listeners:
+            listener(channel, *sample)
+        self.notify()
+
+    def notify(self):
+        """Wake up all threads waiting for a new sample."""
+        with self._new_sample:
+            self.seq += 1
+            self._new_sample.notify_all()
+
+    def wait(self, seq, timeout=None):
+        """
+        Block until something was published after sequence number seq, or timeout.
+        Return the current sequence number to pass to the next call.
+        """
+        with self._new_sample:
+            if self.seq == seq:
+                self._new_sample.wait(timeout)
+            return self.seq
+
+    def get(self, channel, default=0.0):
+        """Return the latest value of a channel as a float."""
+        sample = self._samples.get(channel)
+        return default if sample is None else sample[1]
+
+    def sample(self, channel):
+        """Return the latest (timestamp, value) tuple of a channel, or None."""
+        return self._samples.get(channel)
+
+    def age(self, channel):
+        """Seconds since the channel was last published (inf if never)."""
+        sample = self._samples.get(channel)
+        return float("inf") if sample is None else time.monotonic() - sample[0]
+
+    def snapshot(self):
+        """Return a consistent copy of all channels as {channel: (timestamp, value)}."""
+        return dict(self._samples)
+
+    def clear(self, channel=None):
+        if channel is None:
+            self._samples = {}
+        else:
+            self._samples.pop(channel, None)
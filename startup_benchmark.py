@@ -0,0 +1,90 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Run in a fresh interpreter: builds the window and reports wall-clock times
+WINDOW_SNIPPET = """
+import time, sys
+import tkinter as tk
+import prevac_temperature as gui
+root = tk.Tk()
+gui.app = app = gui.HeatingControlApp(root)
+root.update()
+window = time.time()
+while not hasattr(app, "canvas"):
+    root.update()
+    time.sleep(0.001)
+root.update()
+print(window, time.time())
+root.destroy()
+"""
+
+def parse_importtime(stderr):
+    """Return {module: (self us, cumulative us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def import_times(module, runs):
+    """Import module in fresh interpreters; return the runs' module tables."""
+    results = []
+    for _ in range(runs):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                 cwd=HERE, capture_output=True, text=True)
+        if process.returncode != 0:
+            raise RuntimeError(process.stderr.strip().splitlines()[-1])
+        results.append(parse_importtime(process.stderr))
+    return results
+
+def window_times(runs):
+    """Launch-to-window and launch-to-plot seconds, or None without a display."""
+    windows, plots = [], []
+    for _ in range(runs):
+        start = time.time()
+        process = subprocess.run([sys.executable, "-c", WINDOW_SNIPPET], cwd=HERE, capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f"Window timing skipped: {process.stderr.strip().splitlines()[-1]}")
+            return None
+        window, plot = (float(value) for value in process.stdout.split()[-2:])
+        windows.append(window - start)
+        plots.append(plot - start)
+    return windows, plots
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the GUI startup time.")
+    parser.add_argument("--runs", type=int, default=5, help="Interpreter launches per measurement")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    parser.add_argument("--module", default="prevac_temperature", help="Module whose import is timed")
+    parser.add_argument("--no-window", action="store_true", help="Only time the imports")
+    args = parser.parse_args()
+
+    results = import_times(args.module, args.runs)
+    totals = [result[args.module][1] / 1000 for result in results]
+    print(f"import {args.module}: median {statistics.median(totals):.1f} ms "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}, {args.runs} runs)")
+
+    # Slowest modules by their own import time, median over the runs
+    names = set.intersection(*(set(result) for result in results))
+    own = {name: statistics.median(result[name][0] for result in results) / 1000 for name in names}
+    print(f"\n{'self ms':>8}  module")
+    for name in sorted(own, key=own.get, reverse=True)[:args.top]:
+        print(f"{own[name]:8.1f}  {name}")
+
+    if not args.no_window:
+        times = window_times(args.runs)
+        if times:
+            windows, plots = times
+            print(f"\nlaunch to usable window: median {statistics.median(windows) * 1000:.0f} ms")
+            print(f"launch to plot ready:    median {statistics.median(plots) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
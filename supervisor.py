@@ -0,0 +1,138 @@
+import socket
+import threading
+import time
+
+# Errors that mean the link to the device is gone (or never answered) and a
+# reconnect is worth trying. Protocol errors such as ValueError are passed on.
+LINK_ERRORS = (ConnectionError, TimeoutError, OSError)
+
+class ConnectionSupervisor:
+    def __init__(self, driver, name=None, probe=None, on_reconnect=None,
+                 retry_window=10.0, backoff_initial=0.05, backoff_max=5.0,
+                 keepalive_interval=5.0):
+        """
+        Keep a driver connected and retry requests across short outages.
+
+        :param driver: Object with connect() and close() or disconnect()
+        :param name: Name used in log messages
+        :param probe: Cheap read called when the link is idle (keepalive)
+        :param on_reconnect: Called after every successful reconnect, e.g. to re-register the host
+        :param retry_window: Seconds a request keeps retrying before the error is raised
+        :param backoff_initial: First reconnect delay in seconds, doubled after every failure
+        :param backoff_max: Upper bound of the reconnect delay in seconds
+        :param keepalive_interval: Idle seconds before the probe is sent (0 disables keepalive)
+        """
+        self.driver = driver
+        self.name = name or type(driver).__name__
+        self.probe = probe
+        self.on_reconnect = on_reconnect
+        self.retry_window = retry_window
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.keepalive_interval = keepalive_interval
+
+        self.lock = threading.RLock()
+        self.connected = False
+        self.reconnects = 0
+        self.last_activity = time.monotonic()
+        self._stop = threading.Event()
+        self._keepalive_thread = None
+
+    def connect(self):
+        """Open the driver connection and start the keepalive thread."""
+        with self.lock:
+            self._stop.clear()
+            self.connected = bool(self.driver.connect())
+        if self.connected and self.keepalive_interval > 0 and self._keepalive_thread is None:
+            self._keepalive_thread = threading.Thread(target=self._keepalive, daemon=True)
+            self._keepalive_thread.start()
+        return self.connected
+
+    def close(self):
+        """Stop supervising and close the driver connection."""
+        self._stop.set()
+        with self.lock:
+            self._close_driver()
+            self.connected = False
+        # The keepalive sees _stop as soon as it has the lock, so it ends without reconnecting
+        thread, self._keepalive_thread = self._keepalive_thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Run func under the link lock. Link errors trigger a reconnect with
+        exponential backoff and the request is sent again, until retry_window expires.
+        """
+        deadline = time.monotonic() + self.retry_window
+        delay = self.backoff_initial
+        while True:
+            with self.lock:
+                try:
+                    if not self.connected:
+                        if self._stop.is_set():
+                            raise ConnectionError(f"{self.name}: supervisor closed")
+                        self._reconnect()
+                    result = func(*args, **kwargs)
+                    self.last_activity = time.monotonic()
+                    return result
+                except LINK_ERRORS as e:
+                    self.connected = False
+                    if self._stop.is_set() or time.monotonic() + delay > deadline:
+                        raise ConnectionError(f"{self.name}: link lost ({e})") from e
+                    print(f"{self.name}: {e}, retrying in {delay:.2f} s")
+            # Sleep outside the lock so other threads can give up early
+            if self._stop.wait(delay):
+                raise ConnectionError(f"{self.name}: supervisor closed")
+            delay = min(delay * 2, self.backoff_max)
+
+    def _reconnect(self):
+        self._close_driver()
+        if not self.driver.connect():
+            raise ConnectionError(f"{self.name}: reconnect failed")
+        self.connected = True
+        self.reconnects += 1
+        print(f"{self.name}: reconnected ({self.reconnects})")
+        if self.on_reconnect:
+            self.on_reconnect()
+
+    def _close_driver(self):
+        close = getattr(self.driver, "close", None) or getattr(self.driver, "disconnect", None)
+        try:
+            close()
+        except Exception:
+            pass
+
+    def _keepalive(self):
+        """Probe the device when the link is idle and reconnect in the background."""
+        delay = self.backoff_initial
+        while not self._stop.wait(self.keepalive_interval if self.connected else delay):
+            if self.connected and time.monotonic() - self.last_activity < self.keepalive_interval:
+                continue
+            with self.lock:
+                if self._stop.is_set():
+                    return   # close() ran while this thread waited for the lock
+                try:
+                    if not self.connected:
+                        self._reconnect()
+                    elif self.probe:
+                        self.probe()
+                    self.last_activity = time.monotonic()
+                    delay = self.backoff_initial
+                except LINK_ERRORS as e:
+                    self.connected = False
+                    delay = min(delay * 2, self.backoff_max)
+                    print(f"{self.name}: keepalive failed ({e}), next attempt in {delay:.2f} s")
+
+def enable_tcp_keepalive(sock, idle=5, interval=2, count=3):
+    """Turn on SO_KEEPALIVE so a dead peer is detected by the OS within seconds."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Tuning options are platform specific (Linux/macOS names, Windows ioctl)
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+    if hasattr(socket, "TCP_KEEPCNT"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+    if hasattr(socket, "SIO_KEEPALIVE_VALS"):
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
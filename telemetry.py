@@ -0,0 +1,80 @@
+from ticker import JitterStats
+
+ELECTRICAL_CHANNELS = ["uc", "ic", "ue", "ie"]   # HEAT3 readings: Uc (V), Ic (A), Ue (V), Ie (mA)
+
+def derive_power(columns):
+    """
+    Add the derived power channels to a dict of equal-length columns, in one NumPy
+    pass over the whole run instead of per sample:
+    power_c = Uc * Ic (filament) and power_e = Ue * Ie (emission), both in W.
+    A missing reading (NaN) gives NaN power.
+    """
+    import numpy as np  # Only needed when a run is saved, not at GUI startup
+    uc, ic, ue, ie = (np.asarray(columns[channel], dtype=float) for channel in ELECTRICAL_CHANNELS)
+    columns["power_c"] = uc * ic
+    columns["power_e"] = ue * ie / 1000.0
+    return columns
+
+# Seconds between reads of each HEAT3 signal; None never reads it in the loop
+DEFAULT_INTERVALS = {
+    "temperature": 0.25,
+    "uc": 1.0,
+    "ic": 1.0,
+    "ue": 1.0,
+    "ie": 1.0,
+    "identity": None,   # Read once on connect, see DeviceMetadataCache
+}
+
+class TelemetryPlan:
+    def __init__(self, intervals=None):
+        """
+        Per-signal read schedule for the HEAT3 acquisition loop.
+
+        Each signal is read when its own interval has elapsed, so slow signals do not
+        cost a bus round trip on every temperature read. Due times stay on each
+        signal's grid; a late cycle reads the signal once, it does not catch up,
+        and the deadlines it missed are counted in the signal's JitterStats.
+
+        :param intervals: {signal: seconds or None}, overrides DEFAULT_INTERVALS
+        """
+        self.intervals = dict(DEFAULT_INTERVALS)
+        if intervals:
+            self.intervals.update(intervals)
+        self.next_due = {}
+        self.deadline = {}   # Grid time of each signal's last read, its sample timestamp
+        self.stats = {}
+
+    def set_interval(self, signal, interval):
+        self.intervals[signal] = interval
+        self.next_due.pop(signal, None)
+
+    def due(self, now, signals):
+        """Return the signals among `signals` to read now and schedule their next read."""
+        due = []
+        for signal in signals:
+            interval = self.intervals.get(signal)
+            if interval is None:
+                continue
+            next_due = self.next_due.get(signal, now)
+            if now >= next_due:
+                due.append(signal)
+                missed = int((now - next_due) // interval)
+                deadline = next_due + missed * interval
+                self.deadline[signal] = deadline
+                self.next_due[signal] = deadline + interval
+                self.stats.setdefault(signal, JitterStats()).record(now - deadline, missed)
+        return due
+
+    def wait_time(self, now, signals):
+        """Seconds until the next of `signals` is due (0 if one is already due)."""
+        times = [self.next_due.get(signal, now) for signal in signals if self.intervals.get(signal) is not None]
+        return max(min(times) - now, 0.0) if times else 1.0
+
+    def report(self):
+        """One line of jitter statistics per signal read so far."""
+        return "\n".join(f"{signal}: {stats.report()}" for signal, stats in self.stats.items())
+
+    def reset(self):
+        self.next_due = {}
+        self.deadline = {}
+        self.stats = {}
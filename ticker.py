@@ -0,0 +1,79 @@
+import math
+import time
+
+class JitterStats:
+    """Running lateness statistics of a periodic loop (Welford, O(1) per tick)."""
+    def __init__(self):
+        self.ticks = 0
+        self.missed = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.max = 0.0
+
+    def record(self, lateness, missed=0):
+        """Add one executed tick woken lateness seconds after its deadline, after missed skipped ticks."""
+        self.ticks += 1
+        self.missed += missed
+        delta = lateness - self.mean
+        self.mean += delta / self.ticks
+        self.m2 += delta * (lateness - self.mean)
+        self.max = max(self.max, lateness)
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.ticks - 1)) if self.ticks > 1 else 0.0
+
+    def summary(self):
+        return {"ticks": self.ticks, "missed": self.missed, "mean_late": self.mean,
+                "jitter": self.std(), "max_late": self.max}
+
+    def report(self):
+        return (f"{self.ticks} ticks, {self.missed} missed, lateness mean {self.mean * 1000:.2f} ms, "
+                f"jitter {self.std() * 1000:.2f} ms, max {self.max * 1000:.2f} ms")
+
+class TickScheduler:
+    def __init__(self, period, start=None):
+        """
+        Absolute-deadline loop timing: tick k is due at start + k * period on the
+        monotonic clock, whatever the time spent in the loop body, so the sample
+        rate does not drift with the device latency. When the body overruns one or
+        more deadlines, those ticks are skipped (and counted), never caught up.
+
+        Use the deadline of a tick, not the wake-up time, as the sample timestamp to
+        get an exactly periodic time axis.
+
+        :param period: Seconds between ticks
+        :param start: Monotonic time of tick 0 (default: now)
+        """
+        self.period = period
+        self.start = time.monotonic() if start is None else start
+        self.tick = -1
+        self.stats = JitterStats()
+
+    def deadline(self, tick=None):
+        """Monotonic time tick is due (default: the current tick)."""
+        return self.start + (self.tick if tick is None else tick) * self.period
+
+    def next(self, now=None):
+        """Advance to the next tick that is not already past, and return its deadline."""
+        now = time.monotonic() if now is None else now
+        tick = self.tick + 1
+        late = math.floor((now - self.deadline(tick)) / self.period)
+        if late > 0:
+            tick += late   # Deadlines missed while the loop body ran
+        self.tick = tick
+        return self.deadline(), max(late, 0)
+
+    def wait(self, stop=None):
+        """
+        Sleep until the next deadline and return it, or None if the stop event
+        (a threading.Event) was set while waiting.
+        """
+        deadline, missed = self.next()
+        delay = deadline - time.monotonic()
+        if stop is not None:
+            if stop.wait(max(delay, 0.0)):
+                return None
+        elif delay > 0:
+            time.sleep(delay)
+        self.stats.record(max(time.monotonic() - deadline, 0.0), missed)
+        return deadline
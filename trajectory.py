@@ -0,0 +1,105 @@
+import math
+import threading
+import time
+
+PROFILES = ["firmware", "linear", "s-curve", "log"]
+LOG_SHAPE = 9.0   # Curvature of the log profile: 1 + LOG_SHAPE is the ratio of start to end slope
+
+def profile_fraction(profile, x):
+    """Normalised profile: maps elapsed fraction x in [0, 1] to the covered fraction of the ramp."""
+    import numpy as np  # Imported on first use, the GUI only needs PROFILES at startup
+    x = np.clip(x, 0.0, 1.0)
+    if profile == "linear":
+        return x
+    if profile == "s-curve":
+        return 0.5 - 0.5 * np.cos(np.pi * x)
+    if profile == "log":
+        return np.log1p(LOG_SHAPE * x) / np.log1p(LOG_SHAPE)
+    raise ValueError(f"Unknown profile '{profile}'. Must be one of {', '.join(PROFILES[1:])}.")
+
+def peak_rate_factor(profile):
+    """Steepest slope of a profile relative to the linear ramp over the same time."""
+    return {"linear": 1.0, "s-curve": math.pi / 2, "log": LOG_SHAPE / math.log1p(LOG_SHAPE)}[profile]
+
+def make_trajectory(profile, start, end, duration, update_rate=2.0):
+    """
+    Precompute a setpoint trajectory.
+
+    :param duration: Ramp time in seconds
+    :param update_rate: Setpoint updates per second
+    :return: (times in seconds, setpoints) as NumPy arrays, ending exactly at end
+    """
+    import numpy as np
+    count = max(int(np.ceil(duration * update_rate)), 1) + 1
+    times = np.linspace(0.0, duration, count)
+    setpoints = start + (end - start) * profile_fraction(profile, times / duration if duration > 0 else 1.0)
+    return times, setpoints
+
+class SetpointStreamer:
+    def __init__(self, send_setpoint, update_rate=2.0, resolution=0.1, min_interval=0.25):
+        """
+        Stream a precomputed setpoint trajectory to the device from a background thread.
+
+        Ticks follow a fixed grid of 1/update_rate seconds. Writes are coalesced: a point
+        closer than resolution to the last value sent is skipped, writes are never closer
+        than min_interval seconds, and a slow write simply makes the next tick send the
+        current point instead of a backlog. The final setpoint is always sent.
+
+        :param send_setpoint: Function sending one setpoint (may block)
+        """
+        self.send_setpoint = send_setpoint
+        self.update_rate = update_rate
+        self.resolution = resolution
+        self.min_interval = min_interval
+        self.thread = None
+        self._stop = threading.Event()
+        self.writes = 0
+        self.skipped = 0
+
+    def start(self, profile, start, end, duration):
+        """Start streaming a new ramp, replacing the one in progress."""
+        self.stop()
+        times, setpoints = make_trajectory(profile, start, end, duration, self.update_rate)
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(times, setpoints, self._stop), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.thread = None
+
+    @property
+    def active(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self, times, setpoints, stop):
+        import numpy as np
+        t0 = time.monotonic()
+        last_value = None
+        last_write = -np.inf
+        period = 1.0 / self.update_rate
+        tick = 0
+        while not stop.is_set():
+            now = time.monotonic() - t0
+            index = min(int(np.searchsorted(times, now, side="right")) - 1, len(times) - 1)
+            value = float(setpoints[index])
+            final = index == len(times) - 1
+            if final or ((last_value is None or abs(value - last_value) >= self.resolution)
+                         and now - last_write >= self.min_interval):
+                try:
+                    self.send_setpoint(value)
+                except Exception as e:
+                    print(f"Setpoint streaming stopped: {e}")
+                    return
+                self.writes += 1
+                last_value = value
+                last_write = now
+                if final:
+                    return
+            else:
+                self.skipped += 1
+            # Next tick on the fixed grid; ticks missed during a slow write are skipped
+            tick = max(tick + 1, int(now / period) + 1)
+            stop.wait(max(0.0, t0 + tick * period - time.monotonic()))
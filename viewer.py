@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import shutil
+import itertools
+import tkinter as tk
+from tkinter import ttk, filedialog
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.ticker import FuncFormatter
+from archive import TimeSeriesArchive, DEFAULT_DIRECTORY
+import codec
+
+LOG_COLUMNS = ["time", "temperature", "time_pressure", "pressure"]   # Old save_data logs without a header
+IMPORT_MARKER = ".imported"
+
+def import_text_log(path, directory=None, chunk_lines=200000):
+    """
+    Convert a tab-separated log written by save_data into an archive next to it
+    (<log>.archive), reading it in chunks so memory use does not grow with the file.
+    The archive is reused as long as the log is not newer.
+
+    The header names the columns; each value column uses the nearest "time" column
+    on its left as time base. Missing values are NaN (or -1 in old logs).
+
+    :return: The archive directory
+    """
+    directory = directory or path + ".archive"
+    marker = os.path.join(directory, IMPORT_MARKER)
+    if os.path.exists(marker) and os.path.getmtime(marker) >= os.path.getmtime(path):
+        return directory
+    shutil.rmtree(directory, ignore_errors=True)
+    archive = TimeSeriesArchive(directory)
+    with open(path, "r") as file:
+        first = file.readline()
+        if first.startswith("#"):
+            names = first.lstrip("# ").split()
+        else:
+            names = LOG_COLUMNS
+            file.seek(0)
+        pairs = []
+        for index, name in enumerate(names):
+            if name.startswith("time"):
+                time_index = index
+            else:
+                pairs.append((name, time_index, index))
+        while True:
+            lines = list(itertools.islice(file, chunk_lines))
+            if not lines:
+                break
+            data = np.loadtxt(lines, delimiter="\t", ndmin=2)
+            for channel, time_index, index in pairs:
+                times, values = data[:, time_index], data[:, index]
+                valid = np.isfinite(times) & np.isfinite(values) & (times != -1) & (values != -1)
+                if valid.any():
+                    archive.extend(channel, times[valid], values[valid])
+    archive.close()
+    open(marker, "w").close()
+    return directory
+
+def import_compressed_log(path, directory=None):
+    """Convert a compressed series file (codec.save_series) into an archive next to it, like import_text_log."""
+    directory = directory or path + ".archive"
+    marker = os.path.join(directory, IMPORT_MARKER)
+    if os.path.exists(marker) and os.path.getmtime(marker) >= os.path.getmtime(path):
+        return directory
+    shutil.rmtree(directory, ignore_errors=True)
+    archive = TimeSeriesArchive(directory)
+    for channel, (times, values) in codec.load_series(path).items():
+        times, values = np.array(times), np.array(values)
+        valid = np.isfinite(times) & np.isfinite(values)
+        if valid.any():
+            archive.extend(channel, times[valid], values[valid])
+    archive.close()
+    open(marker, "w").close()
+    return directory
+
+class HistoryViewer:
+    def __init__(self, master, directory=DEFAULT_DIRECTORY, title=None, refine_delay_ms=80):
+        """
+        Window plotting an archive without loading it: every zoom or pan requests the
+        visible time range at the width of the plot in pixels from the archive's
+        min/max pyramid, so only a few thousand points are ever drawn.
+
+        :param directory: Archive directory, see archive.py and import_text_log
+        """
+        self.archive = TimeSeriesArchive(directory, readonly=True)
+        self.refine_delay_ms = refine_delay_ms
+        self.refine_job = None
+        self.artists = []
+        self.origin = 0.0
+
+        self.window = tk.Toplevel(master) if master is not None else tk.Tk()
+        self.window.title(title or f"History - {directory}")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        names = self.archive.names()
+        pressures = [name for name in names if name.startswith("pressure")]
+        self.left_value = tk.StringVar(value="temperature" if "temperature" in names else (names[0] if names else ""))
+        self.right_value = tk.StringVar(value=pressures[0] if pressures else "")
+        controls = tk.Frame(self.window)
+        controls.pack(side=tk.TOP, fill=tk.X)
+        tk.Label(controls, text="Left:").pack(side=tk.LEFT, padx=5)
+        left = ttk.Combobox(controls, values=names, textvariable=self.left_value, width=16, state="readonly")
+        left.pack(side=tk.LEFT)
+        tk.Label(controls, text="Right:").pack(side=tk.LEFT, padx=5)
+        right = ttk.Combobox(controls, values=[""] + names, textvariable=self.right_value, width=16, state="readonly")
+        right.pack(side=tk.LEFT)
+        left.bind("<<ComboboxSelected>>", lambda event: self.show_all())
+        right.bind("<<ComboboxSelected>>", lambda event: self.show_all())
+
+        self.fig, self.ax = plt.subplots(figsize=(12, 6))
+        self.ax_right = self.ax.twinx()
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.window)
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        NavigationToolbar2Tk(self.canvas, self.window).update()
+        self.ax.callbacks.connect("xlim_changed", self.schedule_refine)
+        self.show_all()
+
+    def channels(self):
+        return [(self.ax, self.left_value.get(), "tomato"), (self.ax_right, self.right_value.get(), "cornflowerblue")]
+
+    def show_all(self):
+        """Plot the full span of the selected channels."""
+        spans = [self.archive.span(name) for _, name, _ in self.channels() if name]
+        spans = [span for span in spans if span]
+        if not spans:
+            return
+        self.origin = min(span[0] for span in spans)
+        end = max(span[1] for span in spans)
+        self.set_time_format(end - self.origin)
+        if self.origin > 1e8:   # Archive timestamps are seconds since the epoch, logs start at 0
+            self.ax.set_title(f"Start {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.origin))}")
+        for axis, name, color in self.channels():
+            axis.set_ylabel(name, color=color)
+            axis.set_yscale("log" if name.startswith("pressure") else "linear")
+        self.ax.set_xlim(0, max(end - self.origin, 1.0))   # Triggers the refine
+
+    def set_time_format(self, span):
+        """Seconds, minutes or hours on the time axis, as in the live plot."""
+        for limit, label, scale in ((100, "secs", 1), (100 * 60, "mins", 60), (np.inf, "hrs", 3600)):
+            if span < limit:
+                self.ax.set_xlabel(f"Time ({label})")
+                self.ax.xaxis.set_major_formatter(FuncFormatter(lambda x, pos, scale=scale: f"{x / scale:.1f}"))
+                return
+
+    def schedule_refine(self, axis=None):
+        """Coalesce the limit changes of one zoom or pan into a single reload."""
+        if self.refine_job is not None:
+            self.window.after_cancel(self.refine_job)
+        self.refine_job = self.window.after(self.refine_delay_ms, self.refine)
+
+    def refine(self):
+        self.refine_job = None
+        xmin, xmax = self.ax.get_xlim()
+        self.set_time_format(xmax - xmin)
+        # Load a little on each side so short pans do not show empty edges
+        margin = (xmax - xmin) * 0.25
+        start, end = self.origin + xmin - margin, self.origin + xmax + margin
+        max_points = max(self.canvas.get_tk_widget().winfo_width(), 400)
+        for artist in self.artists:
+            artist.remove()
+        self.artists = []
+        for axis, name, color in self.channels():
+            if not name:
+                continue
+            times, low, high, mean = self.archive.plot_data(name, start, end, int(max_points * 1.5))
+            if not len(times):
+                continue
+            x = times - self.origin
+            if low is not mean:
+                self.artists.append(axis.fill_between(x, low, high, color=color, alpha=0.3, linewidth=0, step="post"))
+            self.artists.extend(axis.plot(x, mean, color=color))
+            axis.relim()
+            axis.autoscale_view(scalex=False)
+        self.canvas.draw_idle()
+
+    def close(self):
+        if self.refine_job is not None:
+            self.window.after_cancel(self.refine_job)
+        plt.close(self.fig)
+        self.window.destroy()
+
+def open_history(master=None, path=None):
+    """Open an archive directory or a save_data log in a viewer window."""
+    if path is None:
+        path = filedialog.askopenfilename(filetypes=[("Logs", "*.txt"), ("Compressed", "*.pvz"), ("Archive", "*.time")])
+        if not path:
+            return None
+    if path.endswith(".time"):
+        path = os.path.dirname(path)
+    elif path.endswith(".pvz"):
+        path = import_compressed_log(path)
+    elif os.path.isfile(path):
+        path = import_text_log(path)
+    return HistoryViewer(master, path)
+
+def main():
+    viewer = open_history(None, sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DIRECTORY)
+    viewer.window.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -33,7 +33,7 @@ class XGS600Controller:
     def send_command(self, command):
         """Send a command to the XGS-600 controller."""
         if not self.serial_conn or not self.serial_conn.is_open:
-            raise Exception("Serial connection is not open.")
+            raise ConnectionError("Serial connection is not open.")
 
         full_command = f"{command}\r"  # Commands must end with a carriage return
         #print(full_command)
@@ -41,6 +41,8 @@ class XGS600Controller:
         time.sleep(0.01)  # Wait for the device to process the command
         response = self.serial_conn.read_until(b'\r')
         #print(response) 
+        if not response:
+            raise TimeoutError(f"No response from XGS-600 on {self.port}")
         response_str = response.decode('ascii').strip()
         if response_str.startswith(">"):
             response_str = response_str[1:]